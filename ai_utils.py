@@ -1,75 +1,397 @@
-from sentence_transformers import SentenceTransformer
-import chromadb
-from config import CHROMA_DIR, COLLECTION_FILES, COLLECTION_FOLDERS, TOP_K_DEFAULT, SNIPPET_BEFORE, SNIPPET_AFTER, MODEL_NAME
+import os
+import time
+import atexit
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from config import COLLECTION_FILES, COLLECTION_FOLDERS, TOP_K_DEFAULT, SNIPPET_BEFORE, SNIPPET_AFTER
+from config import COLLECTION_CONTENT, CHUNK_OVERSAMPLE, LEXICAL_ENABLED, RRF_K
+from config import EMBED_CACHE_ENABLED, EMBED_CACHE_PATH, EMBED_CACHE_MEMORY_MB, EMBED_BACKEND
+from embed_cache import EmbeddingCache
+from embedder import EmbeddingEngine
+from config import METRICS_PATH, METRICS_FORMAT, COMPACT_STORAGE
+from extractors import read_chunk
+from highlight import posicoes_dos_termos, marcar
+from lexical import LexicalIndex, parece_identificador, regex_do_filtro, termos_do_filtro
+from metrics import METRICS
+from shards import search_shards, ShardedCollection, ShardedLexicalIndex
 
 # ---------------- INICIALIZAÇÃO ----------------
-# Conecta com ChromaDB persistente
-client = chromadb.PersistentClient(path=CHROMA_DIR)
+# ChromaDB e o modelo são carregados sob demanda (ou em segundo plano por
+# `aquecer`), então importar este módulo é instantâneo.
+colecoes = None       # {"conteudo": ..., "arquivo": ..., "pasta": ...}
+engine = None
+embed_cache = None
+lexico = None
+query_batcher = None  # QueryBatcher do servidor (server.py): junta consultas simultâneas em uma chamada ao modelo
+tempos_inicializacao = {}  # segundos gastos em cada etapa da inicialização
+_db_lock = threading.Lock()
+_model_lock = threading.Lock()
 
-# Cria/pega coleções de arquivos e pastas
-col_files = client.get_or_create_collection(COLLECTION_FILES)
-col_folders = client.get_or_create_collection(COLLECTION_FOLDERS)
+# Coleção vetorial de cada origem de resultado (também é o tipo no índice léxico)
+COLECAO_POR_ORIGEM = {"conteudo": COLLECTION_CONTENT, "arquivo": COLLECTION_FILES, "pasta": COLLECTION_FOLDERS}
 
-# Carrega modelo de embeddings
-sbert = SentenceTransformer(MODEL_NAME)
+# Pool para consultar as coleções em paralelo (vetorial e léxica de conteúdo, nomes e pastas)
+query_pool = ThreadPoolExecutor(max_workers=6)
+
+def abrir_colecoes(chroma_dir, sqlite_path, lexical_path=None):
+    """
+    Abre as coleções de um índice no ChromaDB persistente.
+    Se o Chroma falhar, usa o banco vetorial SQLite do fallback, que tem a
+    mesma interface de consulta. Com COMPACT_STORAGE, o índice está só no
+    SQLite, com trechos resumidos: o filtro por texto usa o índice léxico.
+    """
+    from vector_store import SQLiteVectorStore
+    if COMPACT_STORAGE:
+        client = SQLiteVectorStore(sqlite_path, lexical_path=lexical_path if LEXICAL_ENABLED else None)
+        return {origem: client.get_or_create_collection(nome) for origem, nome in COLECAO_POR_ORIGEM.items()}
+    try:
+        import chromadb
+        client = chromadb.PersistentClient(path=chroma_dir)
+    except Exception as e:
+        print(f"AVISO: Falha ao abrir o ChromaDB ({e}); usando o fallback SQLite em '{sqlite_path}'.")
+        client = SQLiteVectorStore(sqlite_path)
+        return {origem: client.get_or_create_collection(nome) for origem, nome in COLECAO_POR_ORIGEM.items()}
+    return {origem: ColecaoChroma(client.get_or_create_collection(nome)) for origem, nome in COLECAO_POR_ORIGEM.items()}
+
+class ColecaoChroma:
+    """
+    Coleção do Chroma com o filtro por texto igual ao do SQLite e do índice
+    léxico: o $contains do Chroma diferencia maiúsculas e acentos e casa
+    pedaços de palavras, então vira a expressão regular da mesma frase.
+    """
+    def __init__(self, colecao):
+        self.colecao = colecao
+
+    def __getattr__(self, nome):
+        return getattr(self.colecao, nome)
+
+    def query(self, *args, where_document=None, **kwargs):
+        if where_document and "$contains" in where_document:
+            where_document = {"$regex": regex_do_filtro(where_document["$contains"])}
+        return self.colecao.query(*args, where_document=where_document, **kwargs)
+
+def get_colecoes():
+    """
+    Abre as coleções (uma vez) e as retorna por origem. Com mais de um shard,
+    cada origem é uma `ShardedCollection`, que consulta os shards em paralelo
+    e junta o top-k pela distância.
+    """
+    global colecoes
+    with _db_lock:
+        if colecoes is None:
+            inicio = time.perf_counter()
+            por_shard = [abrir_colecoes(paths["chroma"], paths["sqlite"], paths["lexical"]) for _, paths in search_shards()]
+            if len(por_shard) == 1:
+                colecoes = por_shard[0]
+            else:
+                colecoes = {origem: ShardedCollection(nome, [cols[origem] for cols in por_shard])
+                            for origem, nome in COLECAO_POR_ORIGEM.items()}
+            tempos_inicializacao["chroma"] = time.perf_counter() - inicio
+    return colecoes
+
+def get_lexico():
+    """Abre o índice léxico (uma vez, um por shard); retorna None se a busca híbrida estiver desligada."""
+    global lexico
+    if LEXICAL_ENABLED:
+        with _db_lock:
+            if lexico is None:
+                indices = [LexicalIndex(paths["lexical"]) for _, paths in search_shards()]
+                lexico = indices[0] if len(indices) == 1 else ShardedLexicalIndex(indices)
+    return lexico
+
+def get_engine():
+    """Carrega o modelo de embeddings (uma vez, mesmo backend usado na indexação)."""
+    global engine, embed_cache
+    with _model_lock:
+        if engine is None:
+            inicio = time.perf_counter()
+            modelo = EmbeddingEngine(EMBED_BACKEND)
+            if EMBED_CACHE_ENABLED:
+                embed_cache = EmbeddingCache(EMBED_CACHE_PATH, modelo.name, EMBED_CACHE_MEMORY_MB)
+            engine = modelo
+            tempos_inicializacao["modelo"] = time.perf_counter() - inicio
+    return engine
+
+def aquecer():
+    """Carrega banco e modelo em paralelo, em segundo plano. Retorna as threads."""
+    threads = [threading.Thread(target=f, daemon=True) for f in (get_colecoes, get_engine)]
+    for t in threads:
+        t.start()
+    return threads
+
+if METRICS_PATH:
+    # métricas de pesquisa acumuladas na sessão, exportadas ao fechar o aplicativo
+    atexit.register(lambda: METRICS.write(METRICS_PATH, METRICS_FORMAT, run="search"))
+
+def esta_pronto() -> bool:
+    """Indica se banco e modelo já foram carregados."""
+    return colecoes is not None and engine is not None
 
 # ---------------- FUNÇÕES ----------------
+def embed_queries(textos):
+    """Embeddings de várias consultas em uma chamada ao modelo; consultas repetidas vêm do cache de embeddings."""
+    modelo = get_engine()
+    if embed_cache is not None:
+        return embed_cache.encode(textos, modelo.encode)
+    return modelo.encode(textos)
+
 def embed_query(texto: str):
     """
     Recebe uma string e retorna o embedding vetorial correspondente.
+    Consultas repetidas vêm do cache de embeddings. No servidor, consultas
+    simultâneas são embeddadas juntas pelo `query_batcher`.
     """
-    emb = sbert.encode([texto], show_progress_bar=False, convert_to_tensor=False)[0]
-    # Garante que o embedding seja uma lista de floats
-    return emb.tolist() if hasattr(emb, "tolist") else list(map(float, emb))
+    with METRICS.timer("search_embed_seconds"):
+        if query_batcher is not None:
+            return query_batcher.encode(texto)
+        return embed_queries([texto])[0]
 
-def extract_snippet(texto: str, consulta: str, before=SNIPPET_BEFORE, after=SNIPPET_AFTER):
+def recortar_snippet(texto: str, consulta: str, before=SNIPPET_BEFORE, after=SNIPPET_AFTER):
     """
-    Retorna um trecho do texto com o termo da consulta destacado (**term**),
-    com 'before' caracteres antes e 'after' depois do termo.
+    Recorta o texto em volta da melhor ocorrência da consulta, com 'before'
+    caracteres antes e 'after' depois. Retorna (trecho, destaques), onde
+    destaques são os intervalos (inicio, fim) do trecho com termos da
+    consulta, sem diferenciar maiúsculas e acentos; ou None sem texto.
     """
     if not texto:
         return None
-    texto_str = str(texto)
-    idx = texto_str.lower().find(consulta.lower())  # busca case-insensitive
-    if idx == -1:
+    texto_str = unicodedata.normalize("NFC", str(texto))
+    posicoes = posicoes_dos_termos(texto_str, consulta)
+    if not posicoes:
         # se termo não encontrado, retorna início do texto
         snippet = texto_str[:after].replace("\n", " ")
-        return snippet + ("..." if len(texto_str) > after else "")
-    start = max(idx - before, 0)
-    end = min(idx + len(consulta) + after, len(texto_str))
-    raw = texto_str[start:end].replace("\n", " ")
-    highlight_start = idx - start
-    highlight_end = highlight_start + len(consulta)
-    # adiciona ** para destacar o termo
-    return raw[:highlight_start] + "**" + raw[highlight_start:highlight_end] + "**" + raw[highlight_end:]
+        return snippet + ("..." if len(texto_str) > after else ""), []
+    inicio, fim = max(posicoes, key=lambda p: p[1] - p[0])  # a frase inteira, se aparece
+    start = max(inicio - before, 0)
+    end = min(fim + after, len(texto_str))
+    visiveis = [(max(a, start) - start, min(b, end) - start) for a, b in posicoes if a < end and b > start]
+    return texto_str[start:end].replace("\n", " "), visiveis
+
+def extract_snippet(texto: str, consulta: str, before=SNIPPET_BEFORE, after=SNIPPET_AFTER):
+    """
+    Retorna um trecho do texto com os termos da consulta destacados (**termo**).
+    Só para exibição em texto puro: um ** do próprio documento fica igual a
+    uma marcação. A interface usa os intervalos de `recortar_snippet`.
+    """
+    recorte = recortar_snippet(texto, consulta, before, after)
+    return marcar(*recorte) if recorte else None
+
+def texto_do_trecho(documento, metadata, consulta=None, id_val=None):
+    """
+    Texto do trecho para o snippet. No armazenamento compacto o banco guarda
+    só o começo do trecho (metadata "excerpt"); se a consulta não aparece
+    nele, o trecho completo vem do índice léxico ou é relido do arquivo de
+    origem, sem OCR e só no intervalo do trecho quando há offsets. Se o
+    arquivo mudou ou não pode ser lido, fica o começo guardado no banco.
+    """
+    if not metadata.get("excerpt") or (consulta and posicoes_dos_termos(documento or "", consulta)):
+        return documento
+    lex = get_lexico()
+    texto = lex.texto(id_val) if lex is not None and id_val else None
+    if texto:
+        return texto
+    path, chunk = metadata.get("path", ""), metadata.get("chunk", 0)
+    texto = read_chunk(path, chunk, use_ocr=False, start=metadata.get("start"), end=metadata.get("end"))
+    if not texto or (documento and not texto.startswith(documento)):
+        return documento  # arquivo alterado, ilegível ou com texto de OCR
+    return texto
+
+def carregar_snippet(resultado, consulta):
+    """
+    Snippet de um resultado, calculado só quando ele é exibido: busca pelo id
+    o texto do trecho (ou nome) na coleção da origem e localiza a consulta.
+    Resultados sem id (versões antigas) usam o nome ou caminho.
+    Retorna {"texto", "destaques"} (intervalos [inicio, fim] do texto), ou None.
+    """
+    with METRICS.timer("search_snippet_seconds"):
+        origem = resultado.get("origem", "conteudo")
+        texto = None
+        if resultado.get("id"):
+            r = get_colecoes()[origem].get(ids=[resultado["id"]], include=["documents", "metadatas"])
+            if r["ids"]:
+                texto = texto_do_trecho(r["documents"][0], r["metadatas"][0] or {}, consulta, resultado["id"])
+        if texto is None:
+            path = resultado.get("path", "")
+            texto = path if origem == "pasta" else os.path.basename(path)
+        recorte = recortar_snippet(texto, consulta)
+        return {"texto": recorte[0], "destaques": [list(d) for d in recorte[1]]} if recorte else None
+
+def agrupar_por_arquivo(ids, metadatas, distancias, top_k=TOP_K_DEFAULT):
+    """
+    Agrupa trechos retornados pela busca em resultados por arquivo.
+    Cada arquivo aparece uma vez, com a menor distância entre seus trechos;
+    o id do trecho permite montar o snippet depois (`carregar_snippet`).
+    """
+    melhores = {}
+    for i, m, s in zip(ids, metadatas, distancias):
+        path = m.get("path") or m.get("nome", "sem caminho")
+        if path not in melhores or s < melhores[path][2]:
+            melhores[path] = (i, m, s)
+    ordenados = sorted(melhores.items(), key=lambda item: item[1][2])[:top_k]
+    return [{"id": i, "path": path, "score": s, "offset": m.get("start"), "origem": "conteudo"}
+            for path, (i, m, s) in ordenados]
+
+def consultar_colecao(colecao, query_emb, n_results, filtro=None):
+    """
+    Consulta uma coleção e retorna (ids, metadatas, distâncias), sem os
+    documentos: o texto só é lido para os resultados exibidos.
+    `filtro` restringe a busca a documentos que contêm as palavras do texto
+    informado, em sequência; um filtro sem palavras não encontra nada.
+    """
+    if filtro and not termos_do_filtro(filtro):
+        return [], [], []
+    extra = {"where_document": {"$contains": filtro}} if filtro else {}
+    with METRICS.timer("search_vector_seconds", colecao=getattr(colecao, "name", "")):
+        r = colecao.query(query_embeddings=[query_emb], n_results=n_results,
+                          include=["metadatas","distances"], **extra)
+    return r["ids"][0], r["metadatas"][0], r["distances"][0]
+
+def montar_resultados(ids, metadatas, distancias, origem):
+    """Converte a resposta de uma coleção de nomes/pastas em lista de resultados."""
+    return [{"id": i, "path": m.get("path") or m.get("nome","sem caminho"), "score": s, "origem": origem}
+            for i,m,s in zip(ids, metadatas, distancias)]
+
+def normalizar_distancia(distancia):
+    """
+    Converte a distância L2² do Chroma em distância de cosseno (0 = idêntico).
+    Os embeddings do all-MiniLM-L6-v2 são normalizados, então L2² = 2 - 2·cos
+    e as distâncias das três coleções ficam na mesma escala.
+    """
+    return max(distancia / 2.0, 0.0)
+
+def mesclar_resultados(listas, top_k=TOP_K_DEFAULT):
+    """
+    Junta listas de resultados de coleções diferentes em uma única lista
+    ordenada pela distância normalizada, mantendo a melhor ocorrência de cada caminho.
+    """
+    melhores = {}
+    for origem, lista in listas.items():
+        for res in lista:
+            item = dict(res, score=normalizar_distancia(res["score"]), origem=origem)
+            atual = melhores.get(item["path"])
+            if atual is None or item["score"] < atual["score"]:
+                melhores[item["path"]] = item
+    return sorted(melhores.values(), key=lambda r: r["score"])[:top_k]
 
-def pesquisar_chroma(consulta, top_k=TOP_K_DEFAULT, tipo="both"):
+def fundir_rrf(listas, top_k=TOP_K_DEFAULT, k=RRF_K):
+    """
+    Funde listas ranqueadas (cada uma da melhor para a pior) por reciprocal
+    rank fusion: cada caminho soma 1 / (k + posição) em cada lista em que
+    aparece. O score resultante é o RRF (maior é melhor). Entre as
+    ocorrências, o trecho achado pelo índice léxico (que contém os termos)
+    tem preferência para o snippet.
+    """
+    fundidos = {}
+    for origem, lista in listas:
+        for posicao, res in enumerate(lista, start=1):
+            contrib = 1.0 / (k + posicao)
+            item = fundidos.get(res["path"])
+            if item is None:
+                fundidos[res["path"]] = dict(res, score=contrib, origem=res.get("origem", origem))
+                continue
+            item["score"] += contrib
+            if res.get("lexico") and not item.get("lexico"):
+                item.update({campo: res[campo] for campo in ("id", "offset") if campo in res}, lexico=True)
+    ordenados = sorted(fundidos.values(), key=lambda r: -r["score"])[:top_k]
+    for item in ordenados:
+        item.pop("lexico", None)
+    return ordenados
+
+def buscar_lexico(consulta, origem, top_k=TOP_K_DEFAULT, filtro=None):
+    """Busca no índice léxico, com um resultado por caminho."""
+    with METRICS.timer("search_lexical_seconds", origem=origem):
+        hits = get_lexico().buscar(consulta, COLECAO_POR_ORIGEM[origem], top_k * CHUNK_OVERSAMPLE, filtro)
+    por_caminho = {}
+    for hit in hits:
+        por_caminho.setdefault(hit["path"], dict(hit, origem=origem, lexico=True))  # já vem ordenado por BM25
+    return list(por_caminho.values())[:top_k]
+
+def pesquisar_conteudo(consulta, top_k=TOP_K_DEFAULT, query_emb=None, filtro=None):
+    """
+    Pesquisa nos trechos do conteúdo dos arquivos (`files_content`) e
+    retorna os `top_k` arquivos mais similares, um resultado por arquivo.
+    """
+    if query_emb is None:
+        query_emb = embed_query(consulta)
+    return agrupar_por_arquivo(*consultar_colecao(get_colecoes()["conteudo"], query_emb, top_k * CHUNK_OVERSAMPLE, filtro),
+                               top_k)
+
+def pesquisar_chroma(consulta, top_k=TOP_K_DEFAULT, tipo="both", filtro=None):
     """
     Pesquisa no ChromaDB os documentos e pastas mais similares à consulta.
-    Retorna um dicionário com resultados:
+    `tipo` pode ser "arquivo", "pasta", "both" (arquivos e pastas em listas
+    separadas), "conteudo" (conteúdo dos arquivos) ou "tudo" (conteúdo, nomes
+    e pastas mesclados em uma única lista ordenada).
+    As coleções são consultadas em paralelo com um único embedding da consulta.
+    `filtro` (opcional) mantém só documentos que contêm as palavras daquele
+    texto, em sequência, sem diferenciar maiúsculas e acentos.
+
+    Com o índice léxico ligado (LEXICAL_ENABLED), cada lista vetorial é
+    fundida com a busca BM25 por RRF e o score passa a ser o RRF (maior é
+    melhor). Consultas com cara de identificador (CPF/CNPJ, nº de nota,
+    códigos) que têm resultado léxico voltam sem gerar embedding.
+    Retorna um dicionário com resultados, sem texto (o snippet de cada um é
+    montado ao exibir, por `carregar_snippet`):
     {
-        "Arquivos": [{"path": ..., "snippet": ..., "score": ...}, ...],
-        "Pastas": [{"path": ..., "snippet": ..., "score": ...}, ...]
+        "Arquivos": [{"id": ..., "path": ..., "score": ..., "origem": ...}, ...],
+        "Pastas": [{"id": ..., "path": ..., "score": ..., "origem": ...}, ...]
     }
     """
-    query_emb = embed_query(consulta)
+    with METRICS.timer("search_seconds", tipo=tipo):
+        origens = [origem for origem, tipos in (("conteudo", ["conteudo", "tudo"]),
+                                                ("arquivo", ["arquivo", "both", "tudo"]),
+                                                ("pasta", ["pasta", "both", "tudo"]))
+                   if tipo in tipos]
+        hibrido = get_lexico() is not None
+
+        lexicas = {}
+        if hibrido and parece_identificador(consulta):
+            lexicas = {origem: buscar_lexico(consulta, origem, top_k, filtro) for origem in origens}
+            if any(lexicas.values()):
+                METRICS.inc("search_id_shortcut")
+                return agrupar_resultados({origem: fundir_rrf([(origem, lista)], top_k)
+                                           for origem, lista in lexicas.items()}, tipo, top_k, lexicas)
+
+        query_emb = embed_query(consulta)
+        cols = get_colecoes()
+        futures = {}
+        for origem in origens:
+            if origem == "conteudo":
+                futures[origem] = query_pool.submit(pesquisar_conteudo, consulta, top_k, query_emb, filtro)
+            else:
+                futures[origem] = query_pool.submit(consultar_colecao, cols[origem], query_emb, top_k, filtro)
+        futures_lex = {origem: query_pool.submit(buscar_lexico, consulta, origem, top_k, filtro)
+                       for origem in origens if hibrido and origem not in lexicas}
+
+        listas = {}
+        for origem, future in futures.items():
+            r = future.result()
+            listas[origem] = r if origem == "conteudo" else montar_resultados(*r, origem)
+        for origem, future in futures_lex.items():
+            lexicas[origem] = future.result()
+
+        if hibrido:
+            vetoriais = listas
+            listas = {origem: fundir_rrf([(origem, vetoriais[origem]), (origem, lexicas.get(origem, []))], top_k)
+                      for origem in origens}
+            if tipo == "tudo":
+                todas = [(origem, vetoriais[origem]) for origem in origens] + \
+                        [(origem, lexicas.get(origem, [])) for origem in origens]
+                return {"Resultados": fundir_rrf(todas, top_k)}
+        return agrupar_resultados(listas, tipo, top_k)
+
+def agrupar_resultados(listas, tipo, top_k=TOP_K_DEFAULT, originais=None):
+    """Monta o dicionário de resposta de `pesquisar_chroma` a partir das listas por origem."""
+    if tipo == "tudo":
+        if originais is not None:
+            return {"Resultados": fundir_rrf(list(originais.items()), top_k)}
+        return {"Resultados": mesclar_resultados(listas, top_k)}
     resultados = {}
-    if tipo in ["arquivo", "both"]:
-        r_files = col_files.query(query_embeddings=[query_emb], n_results=top_k,
-                                  include=["documents","metadatas","distances"])
-        resultados["Arquivos"] = [{"path": m.get("path") or m.get("nome","sem caminho"),
-                                    "snippet": extract_snippet(d, consulta),
-                                    "score": s}
-                                   for d,m,s in zip(r_files["documents"][0],
-                                                    r_files["metadatas"][0],
-                                                    r_files["distances"][0])]
-    if tipo in ["pasta", "both"]:
-        r_folders = col_folders.query(query_embeddings=[query_emb], n_results=top_k,
-                                      include=["documents","metadatas","distances"])
-        resultados["Pastas"] = [{"path": m.get("path") or m.get("nome","sem caminho"),
-                                 "snippet": extract_snippet(d, consulta),
-                                 "score": s}
-                                for d,m,s in zip(r_folders["documents"][0],
-                                                 r_folders["metadatas"][0],
-                                                 r_folders["distances"][0])]
+    if "conteudo" in listas:
+        resultados["Conteúdo"] = listas["conteudo"]
+    if "arquivo" in listas:
+        resultados["Arquivos"] = listas["arquivo"]
+    if "pasta" in listas:
+        resultados["Pastas"] = listas["pasta"]
     return resultados
@@ -1,8 +1,11 @@
+import time
+inicio = time.perf_counter()
+
 import tkinter as tk
 from gui import GuardianApp
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = GuardianApp(root)
+    app = GuardianApp(root, inicio=inicio)
+    print(f"Janela pronta em {app.window_ms:.0f} ms")
     root.mainloop()
-
@@ -0,0 +1,170 @@
+"""
+Benchmark do armazenamento compacto: gera um corpus sintético, calcula os
+embeddings dos trechos uma vez e grava os mesmos dados no Chroma, no SQLite
+float32 e no armazenamento compacto (float16 e int8 com re-rank). Para cada
+um mede o tamanho em disco, a latência da consulta e o recall@k contra a
+busca exata em float32 sobre os embeddings originais. O tamanho inclui o
+índice léxico, gravado junto em toda indexação: é nele que fica o texto
+completo dos trechos que o armazenamento compacto resume.
+
+Uso (na raiz do repositório):
+    python -m bench.bench_compact --files 300 --size-kb 20 --out compact_results.json
+    python -m bench.bench_compact --out novo.json --compare compact_results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+import index
+from index import DatabaseManager, build_content_batch, get_engine
+from lexical import LexicalIndex
+from config import COLLECTION_CONTENT, EMBED_BACKEND
+from embedder import BACKENDS
+from bench.corpus import generate_corpus
+from bench.common import peak_rss_mb, run_meta, report_regressions
+from bench.bench_index import WorkDir, bench_walk, bench_extract
+from bench.bench_query import percentis
+
+# nome -> (Chroma?, tipo do vetor no SQLite, trechos resumidos?)
+STORES = {
+    "chroma": (True, None, False),
+    "sqlite_float32": (False, "float32", False),
+    "compact_float16": (False, "float16", True),
+    "compact_int8": (False, "int8", True),
+}
+
+def dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+    return total
+
+def open_store(nome, batches):
+    """
+    Grava os lotes em um armazenamento novo (pasta atual), junto com o índice
+    léxico como na indexação, e retorna a coleção de conteúdo, o tempo de
+    gravação e o caminho do índice léxico.
+    """
+    use_chroma, dtype, compact = STORES[nome]
+    index.COMPACT_DTYPE = dtype  # lido por DatabaseManager ao abrir o SQLite compacto
+    db_manager = DatabaseManager(use_chroma=use_chroma, compact=compact)
+    lexical = LexicalIndex(db_manager.lexical_path)
+    start = time.perf_counter()
+    for data in batches:
+        db_manager.store_batch(COLLECTION_CONTENT, data)
+        lexical.upsert(COLLECTION_CONTENT, data)
+    seconds = time.perf_counter() - start
+    # o WAL é transitório: mede os bancos depois do checkpoint
+    lexical.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    lexical.close()
+    if db_manager.using_chroma:
+        return db_manager.collections[COLLECTION_CONTENT], seconds, db_manager.lexical_path
+    db_manager.sqlite_store.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return db_manager.sqlite_store.get_or_create_collection(COLLECTION_CONTENT), seconds, db_manager.lexical_path
+
+def exact_top_ids(ids, matrix, query_emb, k):
+    dist = np.einsum("ij,ij->i", matrix, matrix) - 2.0 * (matrix @ query_emb)
+    return set(ids[np.argpartition(dist, k - 1)[:k]].tolist())
+
+def run(args):
+    base = tempfile.mkdtemp(prefix="guardian_compact_")
+    corpus = os.path.join(base, "corpus")
+    resultado = {"meta": run_meta(embed_backend=args.embed_backend, top_k=args.top_k, queries=args.num_queries),
+                 "stores": {}}
+    try:
+        resultado["corpus"] = generate_corpus(corpus, args.files, args.size_kb, args.seed, args.ext.split(","))
+        with WorkDir(base, "model"):
+            engine = get_engine(args.embed_backend)
+            engine.encode(["aquecimento"])
+        files, _ = bench_walk(corpus)
+        with WorkDir(base, "extract"):
+            results, _ = bench_extract(files)
+        batches = [build_content_batch(results[i:i+args.batch_size]) for i in range(0, len(results), args.batch_size)]
+        rows = [row for data in batches for row in data]
+        ids = np.asarray([row["id"] for row in rows])
+        matrix = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+        k = min(args.top_k, len(rows))
+        print(f"{len(rows)} trechos de {len(files)} arquivos")
+
+        # consultas de 3 a 6 palavras tiradas dos próprios trechos
+        rng = random.Random(args.seed)
+        consultas = []
+        for _ in range(args.num_queries if rows else 0):
+            palavras = rng.choice(rows)["document"].split()
+            tamanho = min(len(palavras), rng.randint(3, 6))
+            inicio = rng.randint(0, len(palavras) - tamanho)
+            consultas.append(" ".join(palavras[inicio:inicio + tamanho]))
+        query_embs = np.asarray(engine.encode(consultas), dtype=np.float32)
+        esperados = [exact_top_ids(ids, matrix, q, k) for q in query_embs]
+
+        for nome in args.stores.split(","):
+            with WorkDir(base, nome) as path:
+                colecao, seconds, lexical_path = open_store(nome, batches)
+                latencias, recall = [], []
+                colecao.query(query_embeddings=[query_embs[0].tolist()], n_results=k)  # carrega os vetores
+                for q, exatos in zip(query_embs, esperados):
+                    t0 = time.perf_counter()
+                    r = colecao.query(query_embeddings=[q.tolist()], n_results=k, include=["distances"])
+                    latencias.append((time.perf_counter() - t0) * 1000)
+                    recall.append(len(set(r["ids"][0]) & exatos) / len(exatos))
+                tamanho = dir_size(path)
+                lexico = os.path.getsize(lexical_path)
+            resultado["stores"][nome] = {"disk_mb": round(tamanho / 1e6, 3), "vectors_mb": round((tamanho - lexico) / 1e6, 3),
+                                         "lexical_mb": round(lexico / 1e6, 3), "store_seconds": round(seconds, 4),
+                                         "recall": round(float(np.mean(recall)), 4), "query": percentis(latencias)}
+        if "chroma" in resultado["stores"]:
+            referencia = resultado["stores"]["chroma"]["disk_mb"]
+            for m in resultado["stores"].values():
+                m["size_ratio_vs_chroma"] = round(referencia / max(m["disk_mb"], 1e-9), 2)
+        resultado["memory"] = peak_rss_mb()
+    finally:
+        if args.keep:
+            print(f"Arquivos do benchmark mantidos em '{base}'.")
+        else:
+            shutil.rmtree(base, ignore_errors=True)
+    return resultado
+
+def print_summary(resultado):
+    print(f"{'armazenamento':<17} {'disco MB':>9} {'vetores':>8} {'léxico':>8} {'x menor':>8} {'recall':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8}")
+    for nome, m in resultado["stores"].items():
+        print(f"{nome:<17} {m['disk_mb']:9.2f} {m.get('vectors_mb', 0):8.2f} {m.get('lexical_mb', 0):8.2f} "
+              f"{m.get('size_ratio_vs_chroma', 0):8.2f} {m['recall']:7.4f} "
+              f"{m['query'].get('p50_ms', 0):8.2f} {m['query'].get('p95_ms', 0):8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Tamanho e recall do armazenamento compacto contra o Chroma.")
+    parser.add_argument("--files", type=int, default=300, help="Número de arquivos do corpus.")
+    parser.add_argument("--size-kb", type=float, default=20, help="Tamanho médio do texto de cada arquivo (KB).")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do corpus e das consultas.")
+    parser.add_argument("--ext", default="txt,csv,docx,pptx,pdf", help="Extensões do corpus, separadas por vírgula.")
+    parser.add_argument("--stores", default=",".join(STORES), help="Armazenamentos medidos, separados por vírgula.")
+    parser.add_argument("--num-queries", type=int, default=200, help="Consultas sorteadas dos trechos.")
+    parser.add_argument("--top-k", type=int, default=10, help="k do recall@k.")
+    parser.add_argument("--batch-size", type=int, default=32, help="Arquivos por lote gravado.")
+    parser.add_argument("--embed-backend", choices=BACKENDS, default=EMBED_BACKEND, help="Backend do modelo de embeddings.")
+    parser.add_argument("--out", default="compact_results.json", help="Arquivo JSON de saída.")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para detectar regressões.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Piora relativa tolerada antes de acusar regressão.")
+    parser.add_argument("--keep", action="store_true", help="Mantém o corpus e os bancos gerados.")
+    args = parser.parse_args()
+
+    resultado = run(args)
+    print_summary(resultado)
+    if args.compare:
+        report_regressions(resultado, args.compare, args.threshold, ("stores",))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em '{args.out}'.")
+    sys.exit(1 if resultado.get("regressions") else 0)
+
+if __name__ == "__main__":
+    main()
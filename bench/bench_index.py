@@ -0,0 +1,214 @@
+"""
+Benchmark de indexação: gera um corpus sintético e mede cada estágio
+(varredura, extração, embeddings, gravação) e a indexação completa.
+
+Cada medição roda em uma pasta de trabalho nova (os bancos do indexador são
+caminhos relativos), então caches de execuções anteriores não interferem.
+O resultado vai para um JSON; com --compare, métricas que pioraram mais que
+--threshold em relação a outro JSON são marcadas como regressão (código de
+saída 1). Tudo roda offline e na CPU, desde que o modelo de embeddings já
+esteja no cache local do sentence-transformers.
+
+Uso (na raiz do repositório):
+    python -m bench.bench_index --files 300 --size-kb 20 --out bench_results.json
+    python -m bench.bench_index --out novo.json --compare bench_results.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import index
+from index import (DatabaseManager, build_content_batch, process_file_worker, index_folder,
+                   get_engine, MAX_PROCESS_WORKERS)
+from config import COLLECTION_CONTENT, EMBED_BACKEND, EMBED_CACHE_MEMORY_MB, LEXICAL_ENABLED, LEXICAL_DB_PATH
+from manifest import scan_tree
+from embed_cache import EmbeddingCache
+from embedder import BACKENDS
+from lexical import LexicalIndex
+from ocr import PendingPDF
+from chunking import chunk_text
+from bench.corpus import generate_corpus, EXTENSIONS
+from bench.common import peak_rss_mb, run_meta, report_regressions
+
+def rates(seconds, files, nbytes):
+    seconds = max(seconds, 1e-9)
+    return {"seconds": round(seconds, 4), "files_per_sec": round(files / seconds, 2),
+            "mb_per_sec": round(nbytes / 1e6 / seconds, 3)}
+
+class WorkDir:
+    """Pasta de trabalho nova como diretório atual (os bancos do indexador são relativos)."""
+    def __init__(self, base, name):
+        self.path = os.path.join(base, name)
+
+    def __enter__(self):
+        os.makedirs(self.path, exist_ok=True)
+        self.previous = os.getcwd()
+        os.chdir(self.path)
+        # o Chroma reaproveita clientes pelo caminho informado: usa o absoluto de cada pasta
+        index.CHROMA_PERSIST_DIRECTORY = os.path.join(self.path, "chroma_db")
+        return self.path
+
+    def __exit__(self, *exc):
+        os.chdir(self.previous)
+
+def timed_extract(path):
+    """Extração de um arquivo no worker, com o tempo gasto (o OCR de PDFs é feito aqui mesmo)."""
+    start = time.perf_counter()
+    path, _, chunks, _, _ = process_file_worker(path)
+    if isinstance(chunks, PendingPDF):
+        chunks = chunk_text(chunks.run_ocr())
+    return path, chunks, time.perf_counter() - start
+
+# ---------- estágios ----------
+def bench_walk(corpus):
+    start = time.perf_counter()
+    files = [entry for _, entries in scan_tree(corpus) for entry in entries or []]
+    elapsed = time.perf_counter() - start
+    return files, rates(elapsed, len(files), sum(size for _, size, _ in files))
+
+def bench_extract(files):
+    sizes = {path: size for path, size, _ in files}
+    por_extensao = {}
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=MAX_PROCESS_WORKERS) as executor:
+        for path, chunks, seconds in executor.map(timed_extract, list(sizes), chunksize=4):
+            results.append({"path": path, "chunks": chunks})
+            ext = os.path.splitext(path)[1].lower()
+            stats = por_extensao.setdefault(ext, {"files": 0, "bytes": 0, "worker_seconds": 0.0, "chunks": 0})
+            stats["files"] += 1
+            stats["bytes"] += sizes[path]
+            stats["worker_seconds"] += seconds
+            stats["chunks"] += len(chunks)
+    elapsed = time.perf_counter() - start
+    for stats in por_extensao.values():
+        stats["worker_seconds"] = round(stats["worker_seconds"], 4)
+    metrics = rates(elapsed, len(files), sum(sizes.values()))
+    metrics["chunks"] = sum(len(r["chunks"]) for r in results)
+    metrics["per_extension"] = por_extensao
+    return results, metrics
+
+def bench_embed(engine, results):
+    texts = [chunk[2] for r in results for chunk in r["chunks"]]
+    engine.stats = {"docs": 0, "tokens": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    engine.encode(texts)  # sem o cache de embeddings: mede só o modelo
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    return {"seconds": round(elapsed, 4), "chunks": len(texts),
+            "chunks_per_sec": round(len(texts) / elapsed, 2),
+            "tokens_per_sec": round(engine.stats["tokens"] / elapsed, 1)}
+
+def bench_store(results, batch_size):
+    db_manager = DatabaseManager(use_chroma=True)
+    lexical = LexicalIndex(LEXICAL_DB_PATH) if LEXICAL_ENABLED else None
+    # embeddings calculados fora da medição
+    index.embed_cache = None
+    batches = [build_content_batch(results[i:i+batch_size]) for i in range(0, len(results), batch_size)]
+    rows = sum(len(b) for b in batches)
+    start = time.perf_counter()
+    for data in batches:
+        db_manager.store_batch(COLLECTION_CONTENT, data)
+        if lexical:
+            lexical.upsert(COLLECTION_CONTENT, data)
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    if lexical:
+        lexical.close()
+    return {"seconds": round(elapsed, 4), "rows": rows, "rows_per_sec": round(rows / elapsed, 2),
+            "backend": "chroma" if db_manager.using_chroma else "sqlite"}
+
+def bench_e2e(corpus, engine, batch_size, total_files, total_bytes):
+    # cache de embeddings novo, nesta pasta de trabalho: a indexação começa fria
+    index.embed_cache = EmbeddingCache(os.path.abspath("embedding_cache.db"), engine.name, EMBED_CACHE_MEMORY_MB)
+    start = time.perf_counter()
+    index_folder(corpus, batch_size=batch_size, resume=False)
+    elapsed = time.perf_counter() - start
+    index.embed_cache.close()
+    index.embed_cache = None
+    return rates(elapsed, total_files, total_bytes)
+
+def run(args):
+    base = tempfile.mkdtemp(prefix="guardian_bench_")
+    corpus = os.path.join(base, "corpus")
+    resultado = {
+        "meta": run_meta(process_workers=MAX_PROCESS_WORKERS, embed_backend=args.embed_backend,
+                         batch_size=args.batch_size),
+        "stages": {},
+    }
+    try:
+        start = time.perf_counter()
+        resultado["corpus"] = generate_corpus(corpus, args.files, args.size_kb, args.seed, args.ext.split(","))
+        resultado["corpus"].update({"seed": args.seed, "size_kb": args.size_kb,
+                                    "generate_seconds": round(time.perf_counter() - start, 2)})
+        print(f"Corpus: {resultado['corpus']['files']} arquivos, {resultado['corpus']['bytes'] / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        with WorkDir(base, "model"):  # o cache de embeddings criado aqui não é usado nas medições
+            engine = get_engine(args.embed_backend)
+            engine.encode(["aquecimento"])
+        resultado["stages"]["model_load"] = {"seconds": round(time.perf_counter() - start, 4)}
+
+        stages = args.stages.split(",")
+        files, resultado["stages"]["walk"] = bench_walk(corpus)
+        total_bytes = sum(size for _, size, _ in files)
+        if {"extract", "embed", "store"} & set(stages):
+            with WorkDir(base, "extract"):
+                results, resultado["stages"]["extract"] = bench_extract(files)
+            if "embed" in stages:
+                resultado["stages"]["embed"] = bench_embed(engine, results)
+            if "store" in stages:
+                with WorkDir(base, "store"):
+                    resultado["stages"]["store"] = bench_store(results, args.batch_size)
+        if "e2e" in stages:
+            with WorkDir(base, "e2e"):
+                resultado["e2e"] = bench_e2e(corpus, engine, args.batch_size, len(files), total_bytes)
+        resultado["memory"] = peak_rss_mb()
+    finally:
+        if args.keep:
+            print(f"Arquivos do benchmark mantidos em '{base}'.")
+        else:
+            shutil.rmtree(base, ignore_errors=True)
+    return resultado
+
+def print_summary(resultado):
+    for nome, m in resultado["stages"].items():
+        extras = " ".join(f"{k}={v}" for k, v in m.items() if k not in ("seconds", "per_extension"))
+        print(f"{nome:<11} {m['seconds']:9.3f}s  {extras}")
+    if "e2e" in resultado:
+        m = resultado["e2e"]
+        print(f"{'e2e':<11} {m['seconds']:9.3f}s  files_per_sec={m['files_per_sec']} mb_per_sec={m['mb_per_sec']}")
+    if resultado.get("memory"):
+        print("memória    " + " ".join(f"{k}={v}" for k, v in resultado["memory"].items()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de indexação com corpus sintético.")
+    parser.add_argument("--files", type=int, default=300, help="Número de arquivos do corpus.")
+    parser.add_argument("--size-kb", type=float, default=20, help="Tamanho médio do texto de cada arquivo (KB).")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do corpus.")
+    parser.add_argument("--ext", default=",".join(EXTENSIONS), help="Extensões do corpus, separadas por vírgula.")
+    parser.add_argument("--stages", default="walk,extract,embed,store,e2e", help="Estágios medidos, separados por vírgula.")
+    parser.add_argument("--batch-size", type=int, default=32, help="Arquivos por lote de embeddings.")
+    parser.add_argument("--embed-backend", choices=BACKENDS, default=EMBED_BACKEND, help="Backend do modelo de embeddings.")
+    parser.add_argument("--out", default="bench_results.json", help="Arquivo JSON de saída.")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para detectar regressões.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Piora relativa tolerada antes de acusar regressão.")
+    parser.add_argument("--keep", action="store_true", help="Mantém o corpus e os bancos gerados.")
+    args = parser.parse_args()
+
+    resultado = run(args)
+    print_summary(resultado)
+
+    if args.compare:
+        report_regressions(resultado, args.compare, args.threshold, ("stages", "e2e", "memory"))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em '{args.out}'.")
+    sys.exit(1 if resultado.get("regressions") else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Benchmark de consultas: abre um índice já construído, repete um conjunto de
+consultas com a concorrência pedida e mede a latência (p50/p95/p99) de cada
+etapa — embedding da consulta, consulta vetorial e montagem dos resultados
+com o snippet do primeiro (o que a interface exibe ao mostrar a lista) —
+e de `pesquisar_chroma` completo. Também mede o recall@k da busca vetorial
+contra uma busca exata por força bruta sobre todos os vetores da coleção,
+para validar mudanças de parâmetros do ANN, cache ou backend.
+
+As consultas vêm de um arquivo (uma por linha) ou são sorteadas dos próprios
+trechos indexados (--queries omitido), de forma determinística pela semente.
+
+Uso (na pasta onde estão chroma_db/, embedding_cache.db etc.):
+    python -m bench.bench_query --top-k 10 --concurrency 4 --out query_results.json
+    python -m bench.bench_query --queries consultas.txt --compare query_results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import ai_utils
+from ai_utils import (get_colecoes, get_engine, consultar_colecao, agrupar_por_arquivo, montar_resultados,
+                      carregar_snippet, pesquisar_chroma)
+from config import TOP_K_DEFAULT, CHUNK_OVERSAMPLE
+from bench.common import peak_rss_mb, run_meta, report_regressions
+
+ORIGENS_POR_TIPO = {"arquivo": ["arquivo"], "pasta": ["pasta"], "both": ["arquivo", "pasta"],
+                    "conteudo": ["conteudo"], "tudo": ["conteudo", "arquivo", "pasta"]}
+PAGE_SIZE = 5000  # entradas lidas por chamada ao carregar os vetores
+
+def percentis(valores_ms):
+    if not valores_ms:
+        return {}
+    arr = np.asarray(valores_ms)
+    return {"p50_ms": round(float(np.percentile(arr, 50)), 3), "p95_ms": round(float(np.percentile(arr, 95)), 3),
+            "p99_ms": round(float(np.percentile(arr, 99)), 3), "mean_ms": round(float(arr.mean()), 3)}
+
+def ler_colecao(colecao, include):
+    """Lê a coleção inteira em páginas (ids e os campos pedidos)."""
+    resposta = {"ids": []}
+    offset = 0
+    while True:
+        page = colecao.get(limit=PAGE_SIZE, offset=offset, include=list(include))
+        if not page["ids"]:
+            return resposta
+        resposta["ids"].extend(page["ids"])
+        for campo in include:
+            resposta.setdefault(campo, []).extend(page[campo])
+        offset += len(page["ids"])
+
+def sortear_consultas(colecao, n, seed):
+    """Consultas de 3 a 6 palavras tiradas de trechos indexados sorteados."""
+    docs = [d for d in ler_colecao(colecao, ["documents"]).get("documents", []) if d]
+    rng = random.Random(seed)
+    consultas = []
+    for _ in range(n if docs else 0):
+        palavras = rng.choice(docs).split()
+        tamanho = min(len(palavras), rng.randint(3, 6))
+        inicio = rng.randint(0, len(palavras) - tamanho)
+        consultas.append(" ".join(palavras[inicio:inicio + tamanho]))
+    return consultas
+
+class ForcaBruta:
+    """Busca exata (L2²) sobre todos os vetores de uma coleção, como referência de recall."""
+    def __init__(self, colecao):
+        dados = ler_colecao(colecao, ["embeddings"])
+        self.ids = np.asarray(dados["ids"])
+        self.matrix = np.asarray(dados.get("embeddings", []), dtype=np.float32).reshape(len(self.ids), -1)
+        self.norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+
+    def top_ids(self, query_emb, k):
+        k = min(k, len(self.ids))
+        if k == 0:
+            return set()
+        q = np.asarray(query_emb, dtype=np.float32)
+        dist = self.norms - 2.0 * (self.matrix @ q)
+        return set(self.ids[np.argpartition(dist, k - 1)[:k]].tolist())
+
+def n_resultados(origem, top_k):
+    return top_k * CHUNK_OVERSAMPLE if origem == "conteudo" else top_k
+
+def consulta_por_etapas(consulta, origens, top_k, encode):
+    """Executa o caminho vetorial de `pesquisar_chroma` cronometrando cada etapa (ms)."""
+    cols = get_colecoes()
+    t0 = time.perf_counter()
+    query_emb = encode([consulta])[0]
+    t1 = time.perf_counter()
+    respostas = {origem: consultar_colecao(cols[origem], query_emb, n_resultados(origem, top_k)) for origem in origens}
+    t2 = time.perf_counter()
+    for origem, r in respostas.items():
+        resultados = agrupar_por_arquivo(*r, top_k) if origem == "conteudo" else montar_resultados(*r, origem)
+        if resultados:
+            carregar_snippet(resultados[0], consulta)
+    t3 = time.perf_counter()
+    return {"embed": (t1 - t0) * 1000, "vector": (t2 - t1) * 1000, "snippet": (t3 - t2) * 1000,
+            "total": (t3 - t0) * 1000}
+
+def repetir(func, consultas, concurrency, rounds):
+    """Roda `func(consulta)` para cada consulta, `rounds` vezes, com `concurrency` threads."""
+    itens = [c for _ in range(rounds) for c in consultas]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        resultados = list(pool.map(func, itens))
+    return resultados, time.perf_counter() - inicio
+
+def medir_recall(consultas, origens, top_k, encode):
+    """recall@k da consulta vetorial de cada coleção contra a força bruta."""
+    cols = get_colecoes()
+    recall = {}
+    for origem in origens:
+        exata = ForcaBruta(cols[origem])
+        if not len(exata.ids):
+            continue
+        k = n_resultados(origem, top_k)
+        valores = []
+        for consulta in consultas:
+            query_emb = encode([consulta])[0]
+            ids = consultar_ids(cols[origem], query_emb, k)
+            esperados = exata.top_ids(query_emb, k)
+            valores.append(len(ids & esperados) / len(esperados))
+        recall[origem] = {"k": k, "recall": round(float(np.mean(valores)), 4), "vectors": len(exata.ids)}
+    return recall
+
+def consultar_ids(colecao, query_emb, k):
+    r = colecao.query(query_embeddings=[query_emb], n_results=k, include=["distances"])
+    return set(r["ids"][0])
+
+def run(args):
+    if args.workdir:
+        os.chdir(args.workdir)
+    inicio = time.perf_counter()
+    cols = get_colecoes()
+    engine = get_engine()
+    engine.encode(["aquecimento"])
+    carga = time.perf_counter() - inicio
+    if args.no_cache:
+        encode = engine.encode  # mede o modelo, não o cache de embeddings
+    else:
+        encode = lambda textos: [ai_utils.embed_query(t) for t in textos]
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            consultas = [linha.strip() for linha in f if linha.strip()]
+    else:
+        consultas = sortear_consultas(cols["conteudo"], args.num_queries, args.seed)
+    if not consultas:
+        print("Nenhuma consulta disponível (índice vazio?).")
+        sys.exit(2)
+
+    origens = ORIGENS_POR_TIPO[args.tipo]
+    print(f"{len(consultas)} consultas x {args.rounds} rodadas, concorrência {args.concurrency}, "
+          f"tipo '{args.tipo}', top_k {args.top_k}")
+
+    etapas, segundos = repetir(lambda c: consulta_por_etapas(c, origens, args.top_k, encode),
+                               consultas, args.concurrency, args.rounds)
+    latency = {nome: percentis([e[nome] for e in etapas]) for nome in ("embed", "vector", "snippet", "total")}
+    latency["total"]["qps"] = round(len(etapas) / max(segundos, 1e-9), 2)
+
+    _, segundos = repetir(lambda c: pesquisar_chroma(c, args.top_k, args.tipo), consultas, args.concurrency, 1)
+    # latência individual de pesquisar_chroma (inclui busca léxica e RRF), sem concorrência
+    completas = []
+    for consulta in consultas:
+        t0 = time.perf_counter()
+        pesquisar_chroma(consulta, args.top_k, args.tipo)
+        completas.append((time.perf_counter() - t0) * 1000)
+    latency["pesquisar_chroma"] = dict(percentis(completas), qps=round(len(consultas) / max(segundos, 1e-9), 2))
+
+    return {
+        "meta": run_meta(tipo=args.tipo, top_k=args.top_k, concurrency=args.concurrency, rounds=args.rounds,
+                         queries=len(consultas), embed_cache=not args.no_cache, engine=engine.name,
+                         backend=type(cols["conteudo"]).__module__.split(".")[0]),
+        "load_seconds": round(carga, 3),
+        "latency": latency,
+        "recall": medir_recall(consultas, origens, args.top_k, encode),
+        "memory": peak_rss_mb(),
+    }
+
+def print_summary(resultado):
+    print(f"{'etapa':<17} {'p50':>9} {'p95':>9} {'p99':>9}  (ms)")
+    for nome, m in resultado["latency"].items():
+        qps = f"  {m['qps']} consultas/s" if "qps" in m else ""
+        print(f"{nome:<17} {m['p50_ms']:9.2f} {m['p95_ms']:9.2f} {m['p99_ms']:9.2f}{qps}")
+    for origem, r in resultado["recall"].items():
+        print(f"recall@{r['k']} {origem:<10} {r['recall']:.4f} ({r['vectors']} vetores)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência e recall das consultas em um índice já construído.")
+    parser.add_argument("--workdir", help="Pasta onde estão os bancos do índice (padrão: a atual).")
+    parser.add_argument("--queries", help="Arquivo com uma consulta por linha (padrão: sorteadas do índice).")
+    parser.add_argument("--num-queries", type=int, default=100, help="Consultas sorteadas quando --queries é omitido.")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do sorteio das consultas.")
+    parser.add_argument("--top-k", type=int, default=TOP_K_DEFAULT, help="Resultados por consulta.")
+    parser.add_argument("--tipo", choices=list(ORIGENS_POR_TIPO), default="tudo", help="Coleções consultadas.")
+    parser.add_argument("--concurrency", type=int, default=1, help="Consultas simultâneas.")
+    parser.add_argument("--rounds", type=int, default=3, help="Repetições do conjunto de consultas.")
+    parser.add_argument("--no-cache", action="store_true", help="Gera o embedding da consulta sem o cache de embeddings.")
+    parser.add_argument("--out", default="query_results.json", help="Arquivo JSON de saída.")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para detectar regressões.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Piora relativa tolerada antes de acusar regressão.")
+    args = parser.parse_args()
+
+    out = os.path.abspath(args.out)
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    resultado = run(args)
+    print_summary(resultado)
+    if compare_path:
+        report_regressions(resultado, compare_path, args.threshold, ("latency", "recall"))
+
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em '{out}'.")
+    sys.exit(1 if resultado.get("regressions") else 0)
+
+if __name__ == "__main__":
+    main()
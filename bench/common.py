@@ -0,0 +1,79 @@
+"""Utilitários compartilhados pelos benchmarks: ambiente, memória e comparação de resultados."""
+import os
+import time
+import platform
+import subprocess
+
+try:
+    import resource  # só Unix
+except ImportError:
+    resource = None
+
+# Sufixos das métricas comparadas: maior é melhor / menor é melhor
+HIGHER_IS_BETTER = ("_per_sec", "qps", "recall")
+LOWER_IS_BETTER = ("seconds", "_mb", "_ms")
+IGNORED_METRICS = ("worker_seconds", "generate_seconds")
+
+def peak_rss_mb():
+    """Pico de memória residente deste processo e dos workers já encerrados (MB)."""
+    if resource is None:
+        return {}
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {"peak_rss_mb": round(self_kb / 1024, 1), "peak_rss_workers_mb": round(children_kb / 1024, 1)}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_meta(**extra):
+    """Dados da máquina e do código de uma execução."""
+    meta = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(),
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()}
+    meta.update(extra)
+    return meta
+
+def flatten(data, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}, só com valores numéricos."""
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(atual, base, threshold, secoes):
+    """Lista as métricas das `secoes` que pioraram mais que `threshold` (fração) em relação à base."""
+    a = flatten({k: atual.get(k, {}) for k in secoes})
+    b = flatten({k: base.get(k, {}) for k in secoes})
+    regressoes = []
+    for name, old in b.items():
+        new = a.get(name)
+        if new is None or not old or name.endswith(IGNORED_METRICS):
+            continue
+        if name.endswith(HIGHER_IS_BETTER):
+            worse = (old - new) / abs(old)
+        elif name.endswith(LOWER_IS_BETTER):
+            worse = (new - old) / abs(old)
+        else:
+            continue
+        if worse > threshold:
+            regressoes.append({"metric": name, "base": old, "atual": new, "piora": round(worse, 3)})
+    return regressoes
+
+def report_regressions(resultado, baseline_path, threshold, secoes):
+    """Compara com um JSON anterior, imprime e guarda as regressões no resultado."""
+    import json
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        regressoes = compare(resultado, json.load(f), threshold, secoes)
+    resultado["regressions"] = regressoes
+    for r in regressoes:
+        print(f"REGRESSÃO {r['metric']}: {r['base']} -> {r['atual']} ({r['piora']:+.0%})")
+    if not regressoes:
+        print(f"Nenhuma regressão acima de {threshold:.0%} em relação a '{baseline_path}'.")
+    return regressoes
@@ -0,0 +1,162 @@
+"""
+Gerador de corpus sintético e determinístico para os benchmarks.
+
+Cria uma árvore de pastas com arquivos txt/csv/docx/pptx/pdf/png cujo
+conteúdo depende só da semente, da quantidade e do tamanho pedidos, então
+duas execuções com os mesmos parâmetros geram os mesmos arquivos.
+
+Uso:
+    python -m bench.corpus <pasta_destino> --files 300 --size-kb 20 --seed 42
+"""
+import os
+import random
+import argparse
+import datetime
+
+EXTENSIONS = ["txt", "csv", "docx", "pptx", "pdf", "png"]
+FILES_PER_FOLDER = 25
+FIXED_DATE = datetime.datetime(2020, 1, 1)  # datas fixas nas propriedades de docx/pptx
+
+# Vocabulário ASCII (o PDF gerado usa a fonte padrão Helvetica, sem acentos)
+WORDS = (
+    "contrato nota fiscal pagamento cliente fornecedor relatorio anual mensal projeto reuniao ata "
+    "proposta orcamento servico produto entrega prazo valor total imposto recibo boleto banco conta "
+    "saldo extrato empresa filial matriz endereco telefone cadastro pedido compra venda estoque "
+    "auditoria balanco receita despesa custo margem lucro meta indicador equipe gerente diretor "
+    "documento arquivo versao revisao aprovado pendente cancelado urgente importante confidencial"
+).split()
+
+def sentence(rng, min_words=6, max_words=16):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), f"NF-{rng.randint(2015, 2024)}-{rng.randint(1, 99999):05d}")
+    return " ".join(words).capitalize() + "."
+
+def paragraphs(rng, size_bytes):
+    """Parágrafos com ~`size_bytes` caracteres no total."""
+    result, total = [], 0
+    while total < size_bytes:
+        par = " ".join(sentence(rng) for _ in range(rng.randint(3, 7)))
+        result.append(par)
+        total += len(par) + 1
+    return result
+
+# ---------- escritores por formato ----------
+def write_txt(path, rng, size_bytes):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(paragraphs(rng, size_bytes)))
+
+def write_csv(path, rng, size_bytes):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("id,data,cliente,descricao,valor\n")
+        total, i = 0, 0
+        while total < size_bytes:
+            line = (f"{i},2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d},"
+                    f"{rng.choice(WORDS)} {rng.choice(WORDS)},{sentence(rng, 3, 8)},{rng.randint(1, 100000) / 100:.2f}\n")
+            f.write(line)
+            total += len(line)
+            i += 1
+
+def write_docx(path, rng, size_bytes):
+    from docx import Document
+    doc = Document()
+    for par in paragraphs(rng, size_bytes):
+        doc.add_paragraph(par)
+    doc.core_properties.created = doc.core_properties.modified = FIXED_DATE
+    doc.save(path)
+
+def write_pptx(path, rng, size_bytes):
+    from pptx import Presentation
+    from pptx.util import Inches
+    prs = Presentation()
+    for par in paragraphs(rng, size_bytes):
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6))
+        box.text_frame.text = par
+    prs.core_properties.created = prs.core_properties.modified = FIXED_DATE
+    prs.save(path)
+
+def pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path, rng, size_bytes, chars_per_line=90, lines_per_page=50):
+    """PDF mínimo com camada de texto (Helvetica), escrito à mão para não depender de bibliotecas."""
+    text = " ".join(paragraphs(rng, size_bytes))
+    lines = [text[i:i+chars_per_line] for i in range(0, len(text), chars_per_line)] or [""]
+    pages = [lines[i:i+lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+    n_pages = len(pages)
+    font_id = 3 + 2 * n_pages
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{3 + 2 * i} 0 R" for i in range(n_pages)), n_pages)).encode("ascii"),
+    ]
+    for i, page_lines in enumerate(pages):
+        stream = "BT /F1 10 Tf 40 800 Td 14 TL\n" + "\n".join(f"({pdf_escape(l)}) '" for l in page_lines) + "\nET"
+        stream = stream.encode("latin-1")
+        objects.append((f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                        f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>").encode("ascii"))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+def write_png(path, rng, size_bytes):
+    """Imagem com linhas de texto (para o OCR); o tamanho da imagem acompanha `size_bytes`."""
+    from PIL import Image, ImageDraw
+    lines = [sentence(rng) for _ in range(max(3, min(size_bytes // 400, 60)))]
+    img = Image.new("L", (1200, 40 + 24 * len(lines)), color=255)
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(lines):
+        draw.text((20, 20 + 24 * i), line, fill=0)
+    img.save(path, optimize=False)
+
+WRITERS = {"txt": write_txt, "csv": write_csv, "docx": write_docx,
+           "pptx": write_pptx, "pdf": write_pdf, "png": write_png}
+
+def generate_corpus(root, files=300, size_kb=20, seed=42, extensions=EXTENSIONS):
+    """
+    Gera `files` arquivos em `root`, alternando as extensões e distribuindo-os
+    em pastas de até FILES_PER_FOLDER arquivos (dois níveis).
+    Retorna {"files", "bytes", "por_extensao": {ext: quantidade}}.
+    """
+    rng = random.Random(seed)
+    resumo = {"files": 0, "bytes": 0, "por_extensao": {}}
+    for i in range(files):
+        ext = extensions[i % len(extensions)]
+        folder = i // FILES_PER_FOLDER
+        dir_path = os.path.join(root, f"grupo_{folder // 10:03d}", f"pasta_{folder:04d}")
+        os.makedirs(dir_path, exist_ok=True)
+        path = os.path.join(dir_path, f"{rng.choice(WORDS)}_{i:06d}.{ext}")
+        # tamanho varia entre 50% e 150% do pedido, com a mesma semente
+        size_bytes = int(size_kb * 1024 * rng.uniform(0.5, 1.5))
+        WRITERS[ext](path, random.Random(f"{seed}:{i}"), size_bytes)
+        resumo["files"] += 1
+        resumo["bytes"] += os.path.getsize(path)
+        resumo["por_extensao"][ext] = resumo["por_extensao"].get(ext, 0) + 1
+    return resumo
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um corpus sintético determinístico para benchmarks.")
+    parser.add_argument("root", help="Pasta de destino.")
+    parser.add_argument("--files", type=int, default=300, help="Número de arquivos.")
+    parser.add_argument("--size-kb", type=float, default=20, help="Tamanho médio do texto de cada arquivo (KB).")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador.")
+    parser.add_argument("--ext", default=",".join(EXTENSIONS), help="Extensões geradas, separadas por vírgula.")
+    args = parser.parse_args()
+    resumo = generate_corpus(args.root, args.files, args.size_kb, args.seed, args.ext.split(","))
+    print(f"{resumo['files']} arquivos, {resumo['bytes'] / 1e6:.1f} MB: {resumo['por_extensao']}")
+
+if __name__ == "__main__":
+    main()
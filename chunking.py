@@ -0,0 +1,36 @@
+from config import CHUNK_SIZE, CHUNK_OVERLAP, MAX_CHUNKS_PER_FILE
+
+# ---------------- DIVISÃO EM TRECHOS ----------------
+
+def _last_space(texto, lo, hi):
+    """Posição do último espaço/quebra de linha em texto[lo:hi], ou -1."""
+    return max(texto.rfind(" ", lo, hi), texto.rfind("\n", lo, hi))
+
+def chunk_text(texto, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, max_chunks=MAX_CHUNKS_PER_FILE):
+    """
+    Divide um texto em janelas de até `size` caracteres com `overlap` caracteres
+    de sobreposição, cortando preferencialmente em espaços.
+    Retorna uma lista de (inicio, fim, trecho), com offsets no texto original.
+    """
+    if not texto:
+        return []
+    overlap = min(overlap, size // 2 - 1) if size > 2 else 0
+    chunks = []
+    n = len(texto)
+    start = 0
+    while start < n and len(chunks) < max_chunks:
+        end = min(start + size, n)
+        if end < n:
+            cut = _last_space(texto, start + size // 2, end)
+            if cut > start:
+                end = cut
+        trecho = texto[start:end].strip()
+        if trecho:
+            chunks.append((start, end, trecho))
+        if end >= n:
+            break
+        next_start = max(end - overlap, start + 1)
+        # começa o próximo trecho no início de uma palavra
+        cut = _last_space(texto, next_start - overlap // 2 if overlap else next_start, next_start)
+        start = cut + 1 if cut >= start + 1 else next_start
+    return chunks
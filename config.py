@@ -2,6 +2,9 @@
 # Pasta onde o ChromaDB vai ser salvo / lido
 CHROMA_DIR = "./chroma_db"
 
+# Banco de fallback (SQLite) usado quando o ChromaDB não está disponível
+SQLITE_DB_PATH = "embeddings_fallback.db"
+
 # Nomes das coleções no ChromaDB
 COLLECTION_FILES = "files_name"   # coleção de arquivos
 COLLECTION_FOLDERS = "folders"    # coleção de pastas
@@ -13,3 +16,89 @@ SNIPPET_AFTER = 200     # número de caracteres depois do termo encontrado
 
 # Modelo para embeddings
 MODEL_NAME = "all-MiniLM-L6-v2"   # modelo SentenceTransformer
+
+# Coleção com os trechos (chunks) do conteúdo dos arquivos
+COLLECTION_CONTENT = "files_content"
+
+# Divisão do conteúdo em trechos (em caracteres). O all-MiniLM-L6-v2 corta
+# a entrada em 256 word pieces, então cada trecho precisa caber nesse limite.
+CHUNK_SIZE = 800            # tamanho da janela de cada trecho
+CHUNK_OVERLAP = 160         # sobreposição entre trechos consecutivos
+MAX_CHUNKS_PER_FILE = 1000  # limite de trechos indexados por arquivo
+CHUNK_OVERSAMPLE = 5        # trechos buscados por resultado (vários trechos podem ser do mesmo arquivo)
+
+# Cache de embeddings em disco (compartilhado entre index.py e ai_utils.py)
+EMBED_CACHE_ENABLED = True
+EMBED_CACHE_PATH = "./embedding_cache.db"
+EMBED_CACHE_MEMORY_MB = 64  # limite da camada LRU em memória
+
+# Motor de embeddings: "torch" (SentenceTransformer padrão), "onnx" ou
+# "onnx-int8" (ONNX Runtime na CPU com o modelo quantizado em int8)
+EMBED_BACKEND = "torch"
+EMBED_TOKEN_BUDGET = 8192   # tokens (com padding) por lote enviado ao modelo
+ONNX_QUANTIZED_FILE = "onnx/model_quint8_avx2.onnx"  # arquivo int8 do repositório do modelo
+
+# Histórico dos tempos de inicialização do aplicativo (uma linha JSON por execução)
+STARTUP_LOG_PATH = "./startup_times.jsonl"
+
+# Busca híbrida: índice léxico (SQLite FTS5/BM25) fundido com a busca
+# vetorial por reciprocal rank fusion (RRF)
+LEXICAL_ENABLED = True
+LEXICAL_DB_PATH = "./lexical_index.db"
+RRF_K = 60  # constante do RRF: 1 / (RRF_K + posição)
+
+# Modo observador (python index.py watch <pasta>): eventos do sistema de
+# arquivos (watchdog) com debounce; sem watchdog, varredura incremental periódica
+WATCH_DEBOUNCE_S = 2.0      # segundos sem novos eventos antes de reindexar um caminho
+WATCH_TICK_S = 0.5          # intervalo de verificação da fila de eventos
+WATCH_POLL_INTERVAL_S = 30  # intervalo da varredura quando o watchdog não está instalado
+
+# OCR (PDFs escaneados e imagens)
+# (Opcional, apenas para Windows) Caminho para o executável do Tesseract OCR.
+TESSERACT_CMD_PATH = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+OCR_DPI = 200                   # resolução da rasterização de cada página
+OCR_MIN_PAGE_CHARS = 10         # páginas com menos texto que isso são tratadas como escaneadas
+OCR_MAX_PAGES_PER_FILE = 200    # páginas reconhecidas por arquivo, no máximo
+OCR_MAX_SECONDS_PER_FILE = 300  # tempo máximo de OCR por arquivo
+OCR_CACHE_PATH = "./ocr_cache.db"  # texto reconhecido, por hash do conteúdo da página
+
+# Planilhas e CSV: lidos em fluxo, linha a linha, com limites por arquivo
+SHEET_MAX_ROWS = 200000      # linhas lidas por arquivo, no máximo
+SHEET_MAX_CHARS = 20000000   # caracteres de células lidos por arquivo, no máximo
+
+# Métricas da indexação e da pesquisa (tempo por etapa, contadores, falhas).
+# METRICS_PATH = None desliga a exportação; formato "jsonl" (uma linha JSON
+# por execução) ou "prom" (arquivo texto do Prometheus, substituído a cada exportação)
+METRICS_PATH = None
+METRICS_FORMAT = "jsonl"
+
+# Shards: cada shard (conjunto de pastas raiz) tem seus próprios bancos em
+# SHARDS_DIR/<nome>; o registro dos shards fica em SHARDS_PATH. A pesquisa
+# consulta todos os shards registrados (e o índice sem shard, se existir).
+SHARDS_PATH = "./shards.json"
+SHARDS_DIR = "./shards"
+
+# Armazenamento compacto: em vez do Chroma, grava no banco vetorial SQLite
+# (SQLITE_DB_PATH, ou o do shard) com vetores float16 ou int8 e guarda só os
+# primeiros COMPACT_DOC_CHARS caracteres de cada trecho; o texto completo é
+# relido do arquivo de origem quando preciso. O filtro por texto da pesquisa
+# usa o índice léxico, que tem o texto completo (sem ele, só vê o começo de
+# cada trecho). float16: vetores ~4x menores que o Chroma em disco, ~3x
+# contando o índice léxico (bench/bench_compact.py); int8: também ~4x menos
+# memória na busca, que reordena os melhores candidatos com uma cópia float16
+# (ocupa um pouco mais de disco que float16).
+COMPACT_STORAGE = False
+COMPACT_DTYPE = "float16"   # "float16" ou "int8"
+COMPACT_DOC_CHARS = 300
+
+# Servidor local de pesquisa (server.py): mantém modelo e índice carregados
+# e atende vários clientes. SEARCH_SERVER_URL faz a interface gráfica usar o
+# servidor em vez de carregar o modelo (ex.: "http://127.0.0.1:8765").
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_WORKERS = 8              # pesquisas executadas ao mesmo tempo
+SERVER_CACHE_SIZE = 1000        # resultados guardados (LRU)
+SERVER_CACHE_TTL_S = 300        # validade de um resultado no cache
+QUERY_BATCH_WINDOW_MS = 5       # espera por outras consultas para embeddar juntas
+QUERY_BATCH_MAX = 64            # consultas por chamada ao modelo
+SEARCH_SERVER_URL = None
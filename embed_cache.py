@@ -0,0 +1,112 @@
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+# ---------------- CACHE DE EMBEDDINGS ----------------
+# Chave: SHA-1 de (modelo, texto normalizado). Valor: vetor float32 empacotado
+# (384 floats = 1536 bytes). Uma camada LRU em memória, limitada em bytes,
+# fica na frente do SQLite para os textos mais repetidos.
+
+ENTRY_OVERHEAD = 100  # bytes estimados por entrada do LRU além do vetor
+
+def normalize_text(texto: str) -> str:
+    """Normaliza o texto para a chave do cache (Unicode NFC e espaços colapsados)."""
+    return " ".join(unicodedata.normalize("NFC", texto).split())
+
+def pack_vector(vetor) -> bytes:
+    """Empacota um vetor como float32 binário."""
+    return array("f", vetor).tobytes()
+
+def unpack_vector(blob: bytes) -> list:
+    """Desempacota um vetor float32 binário em lista de floats."""
+    vetor = array("f")
+    vetor.frombytes(blob)
+    return vetor.tolist()
+
+class EmbeddingCache:
+    """
+    Cache persistente de embeddings com camada LRU em memória.
+    Seguro para uso por várias threads; vários processos podem abrir o mesmo arquivo.
+    """
+    def __init__(self, db_path, model_name, max_memory_mb=64):
+        self.model_name = model_name
+        self.max_memory = max_memory_mb * 1024 * 1024
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB NOT NULL, created REAL)")
+        self.conn.commit()
+
+    def key(self, texto: str) -> bytes:
+        return hashlib.sha1(f"{self.model_name}\0{normalize_text(texto)}".encode("utf-8")).digest()
+
+    def _remember(self, key, blob):
+        """Coloca um vetor no LRU, removendo os mais antigos se passar do limite."""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return
+        self.memory[key] = blob
+        self.memory_size += len(blob) + ENTRY_OVERHEAD
+        while self.memory_size > self.max_memory and self.memory:
+            _, old = self.memory.popitem(last=False)
+            self.memory_size -= len(old) + ENTRY_OVERHEAD
+
+    def get_many(self, texts) -> list:
+        """Retorna a lista de vetores (ou None quando não está no cache) para os textos."""
+        keys = [self.key(t) for t in texts]
+        found = {}
+        with self.lock:
+            missing = []
+            for k in keys:
+                blob = self.memory.get(k)
+                if blob is None:
+                    missing.append(k)
+                else:
+                    self.memory.move_to_end(k)
+                    found[k] = blob
+            for i in range(0, len(missing), 500):
+                part = list(dict.fromkeys(missing[i:i+500]))
+                placeholders = ",".join("?" * len(part))
+                rows = self.conn.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders})", part)
+                for k, blob in rows:
+                    found[k] = blob
+                    self._remember(k, blob)
+            hits = sum(k in found for k in keys)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return [unpack_vector(found[k]) if k in found else None for k in keys]
+
+    def put_many(self, texts, vectors):
+        """Grava vetores no cache (memória e disco)."""
+        rows = [(self.key(t), pack_vector(v), time.time()) for t, v in zip(texts, vectors)]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings (key, vec, created) VALUES (?, ?, ?)", rows)
+            self.conn.commit()
+            for k, blob, _ in rows:
+                self._remember(k, blob)
+
+    def encode(self, texts, encode_fn) -> list:
+        """
+        Retorna os embeddings dos textos, chamando `encode_fn` apenas para os
+        textos distintos que não estão no cache.
+        """
+        vectors = self.get_many(texts)
+        misses = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if misses:
+            computed = encode_fn(misses)
+            self.put_many(misses, computed)
+            by_text = dict(zip(misses, computed))
+            vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,92 @@
+import time
+from config import MODEL_NAME, EMBED_BACKEND, EMBED_TOKEN_BUDGET, ONNX_QUANTIZED_FILE
+
+# ---------------- MOTOR DE EMBEDDINGS ----------------
+# Os textos são ordenados pelo número de tokens e agrupados em lotes limitados
+# por um orçamento de tokens (tamanho do lote x maior texto do lote), então
+# textos curtos não pagam o padding dos longos.
+
+BACKENDS = ["torch", "onnx", "onnx-int8"]
+
+def load_model(backend=EMBED_BACKEND, model_name=MODEL_NAME):
+    """Carrega o SentenceTransformer com o backend escolhido (import pesado, feito só aqui)."""
+    from sentence_transformers import SentenceTransformer
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx")
+    if backend == "onnx-int8":
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs={"file_name": ONNX_QUANTIZED_FILE})
+    raise ValueError(f"Backend de embeddings desconhecido: '{backend}' (opções: {', '.join(BACKENDS)})")
+
+class EmbeddingEngine:
+    """
+    Gera embeddings com lotes por orçamento de tokens.
+    Guarda estatísticas (textos, tokens e segundos) para o benchmark.
+    """
+    def __init__(self, backend=EMBED_BACKEND, model_name=MODEL_NAME, token_budget=EMBED_TOKEN_BUDGET):
+        self.backend = backend
+        self.model_name = model_name
+        # nome usado como chave do cache: vetores de backends diferentes não se misturam
+        self.name = model_name if backend == "torch" else f"{model_name}:{backend}"
+        self.token_budget = token_budget
+        self.model = load_model(backend, model_name)
+        self.max_tokens = self.model.max_seq_length or 256
+        self.stats = {"docs": 0, "tokens": 0, "seconds": 0.0}
+
+    def token_lengths(self, texts) -> list:
+        """Número de tokens de cada texto (já limitado ao máximo do modelo)."""
+        encoded = self.model.tokenizer(list(texts), add_special_tokens=True, truncation=True,
+                                       max_length=self.max_tokens)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def batches(self, lengths):
+        """Agrupa índices (ordenados por tamanho) em lotes dentro do orçamento de tokens."""
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batch = []
+        for i in order:
+            # ordem crescente: o texto atual é o maior do lote
+            if batch and lengths[i] * (len(batch) + 1) > self.token_budget:
+                yield batch
+                batch = []
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def encode(self, texts) -> list:
+        """Gera embeddings (listas de floats) na mesma ordem dos textos."""
+        if not texts:
+            return []
+        start = time.perf_counter()
+        lengths = self.token_lengths(texts)
+        result = [None] * len(texts)
+        for batch in self.batches(lengths):
+            embs = self.model.encode([texts[i] for i in batch], batch_size=len(batch),
+                                     show_progress_bar=False, convert_to_tensor=False)
+            for i, e in zip(batch, embs):
+                # Garante que a saída seja uma lista de floats
+                result[i] = e.tolist() if hasattr(e, "tolist") else list(map(float, e))
+        self.stats["docs"] += len(texts)
+        self.stats["tokens"] += sum(lengths)
+        self.stats["seconds"] += time.perf_counter() - start
+        return result
+
+def benchmark_backends(texts, backends=BACKENDS):
+    """
+    Mede textos/s e tokens/s de cada backend sobre a mesma amostra.
+    Retorna {backend: {"docs_per_sec": ..., "tokens_per_sec": ...}}.
+    """
+    resultados = {}
+    for backend in backends:
+        try:
+            engine = EmbeddingEngine(backend)
+        except Exception as e:
+            print(f"Backend '{backend}' indisponível: {e}")
+            continue
+        engine.encode(texts[:8])  # aquecimento
+        engine.stats = {"docs": 0, "tokens": 0, "seconds": 0.0}
+        engine.encode(texts)
+        secs = engine.stats["seconds"] or 1e-9
+        resultados[backend] = {"docs_per_sec": engine.stats["docs"] / secs,
+                               "tokens_per_sec": engine.stats["tokens"] / secs}
+    return resultados
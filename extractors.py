@@ -0,0 +1,204 @@
+import os
+import csv
+
+from config import CHUNK_SIZE, MAX_CHUNKS_PER_FILE, SHEET_MAX_ROWS, SHEET_MAX_CHARS
+from chunking import chunk_text
+from ocr import read_pdf, ocr_image
+
+# ---------------- EXTRATORES DE CONTEÚDO ----------------
+# Registro de extratores por extensão. Um extrator de texto devolve uma string,
+# que depois é dividida por `chunk_text`; um extrator de trechos (planilhas e
+# CSV) já devolve os trechos (inicio, fim, texto, metadados), lendo as linhas
+# em fluxo e parando nos limites de linhas/caracteres por arquivo, sem montar
+# o arquivo inteiro em memória.
+# Os leitores (docx, pptx, openpyxl, pandas...) são importados sob demanda.
+
+EXTRACTORS = {}  # extensão -> (função(caminho, use_ocr), devolve trechos?)
+
+IMAGE_EXTS = [".png", ".jpg", ".jpeg", ".tiff", ".bmp", ".gif"]
+
+def extractor(*exts, chunked=False):
+    """Registra uma função como extratora das extensões informadas."""
+    def register(func):
+        for ext in exts:
+            EXTRACTORS[ext] = (func, chunked)
+        return func
+    return register
+
+def extract_chunks(file_path, use_ocr=True):
+    """Extrai o arquivo como lista de trechos (inicio, fim, texto[, metadados])."""
+    func, chunked = EXTRACTORS.get(os.path.splitext(file_path)[1].lower(), (None, False))
+    if func is None:
+        return []
+    result = func(file_path, use_ocr)
+    return result if chunked else chunk_text(result)
+
+def extract_text(file_path, use_ocr=True):
+    """Extrai o arquivo como texto único (trechos de planilha unidos por quebra de linha)."""
+    func, chunked = EXTRACTORS.get(os.path.splitext(file_path)[1].lower(), (None, False))
+    if func is None:
+        return ""
+    result = func(file_path, use_ocr)
+    return "\n".join(chunk[2] for chunk in result) if chunked else result
+
+def read_chunk(file_path, chunk_no, use_ocr=True, start=None, end=None):
+    """
+    Relê do arquivo de origem o texto completo do trecho `chunk_no` (usado
+    quando o banco guarda só o começo do trecho). Com os offsets do trecho
+    (`start`/`end`), um .txt é lido só até o fim do trecho e os demais
+    formatos de texto único são recortados sem dividir o arquivo em trechos.
+    O OCR sai do cache de páginas. Retorna None se o arquivo não pode mais
+    ser lido.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    try:
+        if start is not None and end is not None:
+            if ext == ".txt":
+                return read_txt_range(file_path, start, end).strip() or None
+            func, chunked = EXTRACTORS.get(ext, (None, False))
+            if func is not None and not chunked:
+                return func(file_path, use_ocr)[start:end].strip() or None
+        chunks = extract_chunks(file_path, use_ocr)
+    except Exception:
+        return None
+    return chunks[chunk_no][2] if 0 <= chunk_no < len(chunks) else None
+
+def read_txt_range(file_path, start, end):
+    """Caracteres [start, end) de um .txt, com a mesma decodificação de `read_txt`."""
+    try:
+        with open(file_path, "r", encoding="utf-8") as f: return f.read(end)[start:]
+    except UnicodeDecodeError:
+        with open(file_path, "r", encoding="latin-1") as f: return f.read(end)[start:]
+
+# ---------- texto e documentos ----------
+@extractor(".txt")
+def read_txt(file_path, use_ocr=True):
+    try:
+        with open(file_path, "r", encoding="utf-8") as f: return f.read()
+    except UnicodeDecodeError:
+        with open(file_path, "r", encoding="latin-1") as f: return f.read()
+
+@extractor(".docx")
+def read_docx(file_path, use_ocr=True):
+    from docx import Document
+    return "\n".join([p.text for p in Document(file_path).paragraphs])
+
+@extractor(".pptx")
+def read_pptx(file_path, use_ocr=True):
+    from pptx import Presentation
+    return "\n".join(shape.text for slide in Presentation(file_path).slides for shape in slide.shapes if hasattr(shape, "text"))
+
+@extractor(".pdf")
+def read_pdf_file(file_path, use_ocr=True):
+    return read_pdf(file_path, use_ocr=use_ocr)
+
+@extractor(*IMAGE_EXTS)
+def read_image(file_path, use_ocr=True):
+    return ocr_image(file_path) if use_ocr else ""
+
+# ---------- planilhas e CSV ----------
+def format_row(values):
+    """Linha compacta: células separadas por ';', sem o preenchimento do to_string()."""
+    cells = ["" if v is None else str(v).strip() for v in values]
+    while cells and not cells[-1]:
+        cells.pop()
+    return "; ".join(cells)
+
+def rows_to_chunks(tables, size=CHUNK_SIZE, max_chunks=MAX_CHUNKS_PER_FILE,
+                   max_rows=SHEET_MAX_ROWS, max_chars=SHEET_MAX_CHARS):
+    """
+    Agrupa linhas em trechos de até ~`size` caracteres, cada um começando com
+    o cabeçalho da tabela. `tables` gera (nome da planilha ou None, linhas),
+    onde linhas é um iterável de listas de valores; a primeira é o cabeçalho.
+    Os offsets são relativos ao texto formado pelos trechos em sequência.
+    """
+    chunks = []
+    offset = rows_read = chars_read = 0
+    for sheet, rows in tables:
+        rows = iter(rows)
+        header = next(rows, None)
+        if header is None:
+            continue
+        title = (f"--- {sheet} ---\n" if sheet else "") + format_row(header)[:size]
+        lines, first_row, last_row, length = [], None, None, len(title)
+
+        def flush():
+            nonlocal offset
+            text = title + "\n" + "\n".join(lines)
+            meta = {"row_start": first_row, "row_end": last_row}
+            if sheet:
+                meta["sheet"] = sheet
+            chunks.append((offset, offset + len(text), text, meta))
+            offset += len(text) + 1
+
+        for row_no, values in enumerate(rows, start=2):
+            line = format_row(values)[:size]
+            rows_read += 1
+            chars_read += len(line)
+            if not line:
+                continue
+            if lines and length + len(line) + 1 > size:
+                flush()
+                lines, length = [], len(title)
+                if len(chunks) >= max_chunks:
+                    return chunks
+            if not lines:
+                first_row = row_no
+            lines.append(line)
+            last_row = row_no
+            length += len(line) + 1
+            if rows_read >= max_rows or chars_read >= max_chars:
+                break
+        if lines:
+            flush()
+        if len(chunks) >= max_chunks or rows_read >= max_rows or chars_read >= max_chars:
+            break
+    return chunks
+
+def detect_encoding(file_path, sample_size=64 * 1024):
+    """utf-8 (com ou sem BOM) se a amostra inicial decodificar, senão latin-1."""
+    with open(file_path, "rb") as f:
+        sample = f.read(sample_size)
+    try:
+        sample.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.start < len(sample) - 4:  # erro no meio da amostra, não um caractere cortado no fim
+            return "latin-1"
+    return "utf-8-sig"
+
+@extractor(".csv", chunked=True)
+def read_csv_chunks(file_path, use_ocr=True):
+    encoding = detect_encoding(file_path)
+    with open(file_path, "r", encoding=encoding, errors="replace", newline="") as f:
+        sample = f.read(16 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        return rows_to_chunks([(None, csv.reader(f, dialect))])
+
+def iter_openpyxl_sheets(file_path):
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            yield sheet.title, sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def iter_pandas_sheets(file_path):
+    """Formatos que o openpyxl não lê (.xls, .xlsb): pandas, até SHEET_MAX_ROWS linhas por planilha."""
+    import pandas as pd
+    with pd.ExcelFile(file_path) as book:
+        for name in book.sheet_names:
+            sheet = book.parse(name, header=None, nrows=SHEET_MAX_ROWS, dtype=str, na_filter=False)
+            yield name, sheet.itertuples(index=False, name=None)
+
+@extractor(".xlsx", ".xlsm", chunked=True)
+def read_xlsx_chunks(file_path, use_ocr=True):
+    return rows_to_chunks(iter_openpyxl_sheets(file_path))
+
+@extractor(".xls", ".xlsb", chunked=True)
+def read_xls_chunks(file_path, use_ocr=True):
+    return rows_to_chunks(iter_pandas_sheets(file_path))
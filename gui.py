@@ -1,11 +1,45 @@
+import json
+import time
+import queue
+import argparse
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk
-from ai_utils import pesquisar_chroma
 from file_utils import abrir_arquivo, abrir_pasta
+from highlight import segmentos
+from config import STARTUP_LOG_PATH, SEARCH_SERVER_URL
+
+DEBOUNCE_MS = 300       # espera após a última tecla antes de pesquisar
+MIN_LIVE_CHARS = 3      # tamanho mínimo da consulta para a pesquisa ao digitar
+POLL_MS = 30            # intervalo de leitura dos resultados vindos da thread
 
 class GuardianApp:
-    def __init__(self, root):
+    def __init__(self, root, inicio=None, server_url=SEARCH_SERVER_URL):
         self.root = root
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        # Com `server_url`, as pesquisas vão para o servidor local (server.py)
+        # e este processo não carrega modelo nem índice.
+        if server_url:
+            from search_client import RemoteSearch
+            self.busca = RemoteSearch(server_url)
+        else:
+            import ai_utils
+            self.busca = ai_utils
+        # Pesquisas rodam em uma thread; cada uma recebe um número de sequência
+        # e resultados de pesquisas antigas são descartados.
+        self.search_pool = ThreadPoolExecutor(max_workers=1)
+        self.search_seq = 0
+        self.search_future = None
+        self.results_queue = queue.Queue()
+        self.debounce_id = None
+        self.last_search = None
+        self.results = {}  # id da linha da Treeview -> resultado
+        self.consulta_atual = ""
+        # Os resultados chegam sem texto: o snippet do resultado selecionado é
+        # montado em outra thread (pode reler o arquivo de origem) e guardado nele.
+        self.snippet_pool = ThreadPoolExecutor(max_workers=1)
+        self.snippet_queue = queue.Queue()
+        self.detail_res = None
         self.root.title("Guardian AI FileSearch")
         self.root.geometry("900x600")
         self.root.configure(bg="#f0f0f0")
@@ -15,6 +49,7 @@ class GuardianApp:
         self.entry = tk.Entry(root, font=("Arial", 12))
         self.entry.pack(fill="x", padx=10, pady=5)
         self.entry.bind("<Return>", lambda event: self.run_search())
+        self.entry.bind("<KeyRelease>", self.schedule_search)
 
         # ---------------- Configurações da pesquisa ----------------
         config_frame = tk.Frame(root, bg="#f0f0f0")
@@ -22,101 +57,218 @@ class GuardianApp:
 
         tk.Label(config_frame, text="Número de resultados:", bg="#f0f0f0").pack(side="left", padx=5)
         self.top_k_var = tk.IntVar(value=5)
-        tk.Spinbox(config_frame, from_=1, to=50, textvariable=self.top_k_var, width=5).pack(side="left", padx=5)
+        tk.Spinbox(config_frame, from_=1, to=500, textvariable=self.top_k_var, width=5).pack(side="left", padx=5)
 
         tk.Label(config_frame, text="Tipo de pesquisa:", bg="#f0f0f0").pack(side="left", padx=5)
         self.tipo_var = tk.StringVar(value="both")
-        ttk.Combobox(config_frame, textvariable=self.tipo_var, values=["arquivo", "pasta", "both"], width=10).pack(side="left", padx=5)
+        ttk.Combobox(config_frame, textvariable=self.tipo_var, values=["arquivo", "pasta", "both", "conteudo", "tudo"], width=10).pack(side="left", padx=5)
 
         self.btn_search = tk.Button(config_frame, text="Pesquisar", command=self.run_search)
         self.btn_search.pack(side="left", padx=10)
 
-        # ---------------- Frame para resultados com scroll ----------------
-        self.frame_container = tk.Frame(root)
-        self.frame_container.pack(fill="both", expand=True, padx=10, pady=10)
+        # Indicador de prontidão (modelo e banco carregam em segundo plano)
+        self.status_var = tk.StringVar(value="Carregando modelo e banco...")
+        self.status_label = tk.Label(config_frame, textvariable=self.status_var, bg="#f0f0f0", fg="#b45309")
+        self.status_label.pack(side="right", padx=5)
 
-        self.canvas = tk.Canvas(self.frame_container, bg="#f0f0f0")
-        self.scrollbar = tk.Scrollbar(self.frame_container, orient="vertical", command=self.canvas.yview)
-        self.scrollable_frame = tk.Frame(self.canvas, bg="#f0f0f0")
+        # ---------------- Lista de resultados (Treeview reaproveitada) ----------------
+        panes = tk.PanedWindow(root, orient="vertical", sashwidth=6, bg="#f0f0f0")
+        panes.pack(fill="both", expand=True, padx=10, pady=10)
 
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
+        list_frame = tk.Frame(panes)
+        self.tree = ttk.Treeview(list_frame, columns=("score", "tipo", "path"), show="headings", selectmode="browse")
+        self.tree.heading("score", text="Score")
+        self.tree.heading("tipo", text="Tipo")
+        self.tree.heading("path", text="Caminho")
+        self.tree.column("score", width=60, anchor="e", stretch=False)
+        self.tree.column("tipo", width=90, stretch=False)
+        self.tree.column("path", width=700)
+        self.scrollbar = tk.Scrollbar(list_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<<TreeviewSelect>>", lambda event: self.show_detail())
+        self.tree.bind("<Double-1>", lambda event: self.open_selected(abrir_arquivo))
+        panes.add(list_frame, stretch="always")
 
-        self.canvas.create_window((0,0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        # ---------------- Painel de detalhes do resultado selecionado ----------------
+        detail_frame = tk.Frame(panes, bg="#e2e8f0", pady=5, padx=5)
+        btn_frame = tk.Frame(detail_frame, bg="#e2e8f0")
+        btn_frame.pack(side="right", padx=5)
+        tk.Button(btn_frame, text="Abrir Arquivo", command=lambda: self.open_selected(abrir_arquivo)).pack(pady=2, fill="x")
+        tk.Button(btn_frame, text="Abrir Pasta", command=lambda: self.open_selected(abrir_pasta)).pack(pady=2, fill="x")
+        self.detail_path = tk.Label(detail_frame, text="", font=("Arial", 10, "bold"), bg="#e2e8f0", anchor="w", justify="left")
+        self.detail_path.pack(fill="x")
+        self.detail_text = tk.Text(detail_frame, height=6, bg="#e2e8f0", font=("Arial", 10), borderwidth=0, wrap="word")
+        self.detail_text.pack(fill="both", expand=True)
+        self.detail_text.tag_configure("highlight", foreground="red", font=("Arial", 10, "bold"))
+        self.detail_text.configure(state="disabled")
+        panes.add(detail_frame, height=150)
 
-        self.canvas.pack(side="left", fill="both", expand=True)
-        self.scrollbar.pack(side="right", fill="y")
+        # ---------------- Inicialização em segundo plano ----------------
+        self.root.update_idletasks()
+        self.window_ms = (time.perf_counter() - self.inicio) * 1000
+        self.busca.aquecer()
+        self.root.after(100, self.check_ready)
+        self.root.after(POLL_MS, self.poll_results)
+
+    # ---------------- Acompanha o carregamento do modelo/banco ----------------
+    def check_ready(self):
+        if not self.busca.esta_pronto():
+            self.root.after(100, self.check_ready)
+            return
+        ready_ms = (time.perf_counter() - self.inicio) * 1000
+        self.status_var.set(f"Pronto ({ready_ms / 1000:.1f}s)")
+        self.status_label.configure(fg="#15803d")
+        self.log_startup(ready_ms)
+
+    def log_startup(self, ready_ms):
+        """Registra os tempos de inicialização para acompanhar regressões."""
+        registro = {"ts": time.time(), "janela_ms": round(self.window_ms, 1), "pronto_ms": round(ready_ms, 1),
+                    **{f"{etapa}_s": round(segundos, 3) for etapa, segundos in self.busca.tempos_inicializacao.items()}}
+        try:
+            with open(STARTUP_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro) + "\n")
+        except OSError:
+            pass
+
+    # ---------------- Pesquisa ao digitar (com debounce) ----------------
+    def schedule_search(self, event=None):
+        if event is not None and event.keysym == "Return":
+            return
+        if self.debounce_id is not None:
+            self.root.after_cancel(self.debounce_id)
+        self.debounce_id = self.root.after(DEBOUNCE_MS, lambda: self.run_search(live=True))
 
-    # ---------------- Executa pesquisa ----------------
-    def run_search(self):
-        consulta = self.entry.get()
-        if not consulta:
+    # ---------------- Executa pesquisa (em segundo plano) ----------------
+    def run_search(self, live=False):
+        self.debounce_id = None
+        consulta = self.entry.get().strip()
+        if not consulta or (live and len(consulta) < MIN_LIVE_CHARS):
             return
         top_k = self.top_k_var.get()
         tipo = self.tipo_var.get()
-        resultados = pesquisar_chroma(consulta, top_k=top_k, tipo=tipo)
-        self.display_results(resultados, consulta)
+        if live and (consulta, top_k, tipo) == self.last_search:
+            return
+        self.last_search = (consulta, top_k, tipo)
+
+        # Cancela a pesquisa anterior se ainda não começou; se já começou, o
+        # resultado dela será descartado pelo número de sequência.
+        if self.search_future is not None:
+            self.search_future.cancel()
+        self.search_seq += 1
+        self.search_future = self.search_pool.submit(self.search_worker, self.search_seq, consulta, top_k, tipo)
+        self.status_var.set("Pesquisando..." if self.busca.esta_pronto() else "Aguardando o modelo carregar...")
+
+    def search_worker(self, seq, consulta, top_k, tipo):
+        """Roda na thread de pesquisa; o resultado volta para o Tk pela fila."""
+        if seq != self.search_seq:
+            return  # já existe uma pesquisa mais nova
+        try:
+            inicio = time.perf_counter()
+            resultados = self.busca.pesquisar_chroma(consulta, top_k=top_k, tipo=tipo)
+            self.results_queue.put((seq, consulta, resultados, time.perf_counter() - inicio, None))
+        except Exception as e:
+            self.results_queue.put((seq, consulta, None, 0, e))
 
-    # ---------------- Exibe resultados com highlight e botões ----------------
+    def poll_results(self):
+        """Lê os resultados da thread de pesquisa no loop do Tk."""
+        try:
+            while True:
+                seq, consulta, resultados, segundos, erro = self.results_queue.get_nowait()
+                if seq != self.search_seq:
+                    continue  # resultado de uma consulta antiga
+                if erro is not None:
+                    self.status_var.set(f"Erro na pesquisa: {erro}")
+                else:
+                    self.display_results(resultados, consulta)
+                    total = sum(len(lista) for lista in resultados.values())
+                    self.status_var.set(f"{total} resultados em {segundos * 1000:.0f} ms")
+        except queue.Empty:
+            pass
+        try:
+            while True:
+                res, consulta, snippet, erro = self.snippet_queue.get_nowait()
+                if erro is None and consulta == self.consulta_atual:
+                    res["snippet"] = snippet
+                if res is self.detail_res:
+                    if erro is None:
+                        self.show_snippet(snippet)
+                    else:
+                        self.create_highlight(self.detail_text, f"Trecho indisponível: {erro}")
+        except queue.Empty:
+            pass
+        self.root.after(POLL_MS, self.poll_results)
+
+    # ---------------- Exibe resultados na Treeview ----------------
     def display_results(self, resultados, consulta):
-        # Limpa resultados antigos
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
+        # Limpa resultados antigos (as linhas são itens da Treeview, não widgets)
+        self.tree.delete(*self.tree.get_children())
+        self.results = {}
+        self.consulta_atual = consulta
 
         for tipo, lista in resultados.items():
-            tk.Label(self.scrollable_frame, text=tipo, font=("Arial", 12, "bold"), bg="#f0f0f0").pack(anchor="w", pady=5)
-
             for res in lista:
                 path = res["path"] if isinstance(res, dict) else str(res)
-                snippet = res.get("snippet", "") if isinstance(res, dict) else ""
                 score = res.get("score", 0) if isinstance(res, dict) else 0
+                origem = res.get("origem", tipo) if isinstance(res, dict) else tipo
+                item = self.tree.insert("", "end", values=(f"{score:.3f}", origem, path))
+                self.results[item] = res if isinstance(res, dict) else {"path": path}
 
-                # Frame de cada resultado
-                frame = tk.Frame(self.scrollable_frame, bg="#e2e8f0", pady=5, padx=5)
-                frame.pack(fill="x", padx=5, pady=3)
-
-                # Frame do texto + snippet
-                text_frame = tk.Frame(frame, bg="#e2e8f0")
-                text_frame.pack(side="left", fill="both", expand=True)
+        children = self.tree.get_children()
+        if children:
+            self.tree.selection_set(children[0])
+        else:
+            self.show_detail()
 
-                # Path em negrito
-                tk.Label(text_frame, text=path, font=("Arial", 10, "bold"), bg="#e2e8f0").pack(anchor="w")
+    # ---------------- Painel de detalhes ----------------
+    def selected_result(self):
+        selection = self.tree.selection()
+        return self.results.get(selection[0]) if selection else None
 
-                # Snippet com highlight
-                self.create_highlight(text_frame, snippet, consulta)
+    def show_detail(self):
+        res = self.selected_result()
+        self.detail_res = res
+        self.detail_path.configure(text=res["path"] if res else "")
+        if res is None or "snippet" in res:
+            self.show_snippet((res or {}).get("snippet"))
+            return
+        self.create_highlight(self.detail_text, "Carregando trecho...")
+        self.snippet_pool.submit(self.snippet_worker, res, self.consulta_atual)
 
-                # Frame dos botões
-                btn_frame = tk.Frame(frame, bg="#e2e8f0")
-                btn_frame.pack(side="right", padx=5)
+    def snippet_worker(self, res, consulta):
+        """Monta o snippet de um resultado fora do loop do Tk."""
+        if res is not self.detail_res:
+            return  # o usuário já selecionou outro resultado
+        try:
+            self.snippet_queue.put((res, consulta, self.busca.carregar_snippet(res, consulta), None))
+        except Exception as e:
+            self.snippet_queue.put((res, consulta, None, e))
 
-                tk.Button(btn_frame, text="Abrir Arquivo", command=lambda p=path: abrir_arquivo(p)).pack(pady=2, fill="x")
-                tk.Button(btn_frame, text="Abrir Pasta", command=lambda p=path: abrir_pasta(p)).pack(pady=2, fill="x")
+    def show_snippet(self, snippet):
+        """Snippet no formato de `carregar_snippet` ({"texto", "destaques"}) no painel de detalhes."""
+        snippet = snippet or {}
+        self.create_highlight(self.detail_text, snippet.get("texto") or "", snippet.get("destaques", ()))
 
-                # Score
-                tk.Label(frame, text=f"{score:.2f}", bg="#e2e8f0", font=("Arial", 10)).pack(side="right", padx=5)
+    def open_selected(self, action):
+        res = self.selected_result()
+        if res:
+            action(res["path"])
 
     # ---------------- Função para highlight ----------------
-    def create_highlight(self, parent, texto, consulta):
-        parent_text = tk.Text(parent, height=1, bg="#e2e8f0", font=("Arial", 10), borderwidth=0)
-        parent_text.pack(fill="x", expand=True)
-        parent_text.tag_configure("highlight", foreground="red", font=("Arial", 10, "bold"))
-
-        lower_text = texto.lower()
-        lower_query = consulta.lower()
-        idx = lower_text.find(lower_query)
-        if idx == -1:
-            parent_text.insert("1.0", texto)
-        else:
-            parent_text.insert("1.0", texto[:idx])
-            parent_text.insert("end", texto[idx:idx+len(consulta)], "highlight")
-            parent_text.insert("end", texto[idx+len(consulta):])
+    def create_highlight(self, parent_text, texto, destaques=()):
+        """Mostra o texto com os intervalos (inicio, fim) de `destaques` destacados."""
+        parent_text.configure(state="normal")
+        parent_text.delete("1.0", "end")
+        for trecho, destacado in segmentos(texto, destaques):
+            parent_text.insert("end", trecho, "highlight" if destacado else ())
         parent_text.configure(state="disabled")
 
 # ---------------- Execução principal ----------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Guardian AI FileSearch")
+    parser.add_argument("--server", default=SEARCH_SERVER_URL, help="URL do servidor de pesquisa (ex.: http://127.0.0.1:8765).")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = GuardianApp(root)
+    app = GuardianApp(root, server_url=args.server)
     root.mainloop()
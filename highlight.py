@@ -0,0 +1,67 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# ---------------- DESTAQUE DOS TERMOS DA CONSULTA ----------------
+# Localiza no texto a consulta inteira e cada termo dela sem diferenciar
+# maiúsculas e acentos ("relatorio" encontra "Relatório"). A comparação é
+# feita caractere a caractere sobre a letra base, então as posições valem
+# no texto original (que deve estar em NFC). Só usa a biblioteca padrão:
+# serve também à interface gráfica ligada ao servidor de pesquisa.
+
+MIN_TERM_CHARS = 3  # termos menores ("de", "a", "em") só contam dentro da frase inteira
+MARCA = "**"
+
+@lru_cache(maxsize=4096)
+def _base(caractere):
+    """Letra base minúscula de um caractere ("Ó" -> "o"), sempre com 1 caractere."""
+    return unicodedata.normalize("NFD", caractere)[0].lower()[:1] or caractere
+
+def normalizar(texto: str) -> str:
+    """Texto sem acentos e em minúsculas, com o mesmo tamanho do original."""
+    return "".join(_base(c) for c in texto)
+
+def termos_da_consulta(consulta: str) -> list:
+    """Frase inteira e termos da consulta, normalizados, do maior para o menor."""
+    frase = normalizar(unicodedata.normalize("NFC", consulta.strip()))
+    termos = {frase} if frase else set()
+    # palavras e também tokens inteiros, para códigos como 123.456.789-00 ou NF-2023-001
+    candidatos = re.findall(r"\w+", frase) + [t.strip(".,;:!?()\"'") for t in frase.split()]
+    termos.update(t for t in candidatos if len(t) >= MIN_TERM_CHARS or any(c.isdigit() for c in t))
+    return sorted(termos, key=len, reverse=True)
+
+def posicoes_dos_termos(texto: str, consulta: str) -> list:
+    """
+    Intervalos (inicio, fim) do texto com a consulta ou algum de seus termos,
+    ordenados e sem sobreposição.
+    """
+    if not texto or not consulta:
+        return []
+    normalizado = normalizar(texto)
+    intervalos = sorted((m.start(), m.end()) for termo in termos_da_consulta(consulta)
+                        for m in re.finditer(re.escape(termo), normalizado))
+    unidos = []
+    for inicio, fim in intervalos:
+        if unidos and inicio <= unidos[-1][1]:
+            unidos[-1] = (unidos[-1][0], max(unidos[-1][1], fim))
+        else:
+            unidos.append((inicio, fim))
+    return unidos
+
+def marcar(texto: str, intervalos) -> str:
+    """Envolve cada intervalo do texto com **."""
+    partes, pos = [], 0
+    for inicio, fim in intervalos:
+        partes += [texto[pos:inicio], MARCA, texto[inicio:fim], MARCA]
+        pos = fim
+    partes.append(texto[pos:])
+    return "".join(partes)
+
+def segmentos(texto: str, destaques=()) -> list:
+    """Divide um snippet em (trecho, destacado) pelos intervalos destacados."""
+    resultado, pos = [], 0
+    for inicio, fim in destaques:
+        resultado += [(texto[pos:inicio], False), (texto[inicio:fim], True)]
+        pos = fim
+    resultado.append((texto[pos:], False))
+    return [(parte, destacado) for parte, destacado in resultado if parte]
@@ -1,60 +1,81 @@
 import os
-import json
-import sqlite3
-import platform
+import sys
 import hashlib
+import time
 import argparse
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import queue
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from tqdm import tqdm
 
-# Importações de leitores de arquivo
-import pandas as pd
-from PyPDF2 import PdfReader
-from docx import Document
-from pdf2image import convert_from_path
-import pytesseract
-from pptx import Presentation
+from config import SQLITE_DB_PATH, COLLECTION_CONTENT, EMBED_BACKEND, EMBED_CACHE_ENABLED, EMBED_CACHE_PATH, EMBED_CACHE_MEMORY_MB
+from config import LEXICAL_ENABLED, LEXICAL_DB_PATH, METRICS_PATH, METRICS_FORMAT
+from config import COMPACT_STORAGE, COMPACT_DTYPE, COMPACT_DOC_CHARS
+from manifest import FileManifest, file_hash, scan_tree
+from chunking import chunk_text
+from embed_cache import EmbeddingCache
+from lexical import LexicalIndex
+from ocr import PendingPDF, read_pdf_pages, ocr_pdf_page
+from extractors import extract_chunks, extract_text
+from metrics import METRICS
+from shards import load_registry, register_shard, shard_for, store_paths
+
+# Os leitores de arquivo (pandas, PyPDF2, docx, pptx, pdf2image, pytesseract),
+# o modelo e o ChromaDB são importados sob demanda: `index.py --help` e os
+# workers de extração não pagam por módulos que não usam.
 
 # Embedding local
-from sentence_transformers import SentenceTransformer
-
-# ChromaDB
-import chromadb
+from embedder import EmbeddingEngine, BACKENDS, benchmark_backends
 
 # ==============================================================================  
 # CONFIGURAÇÃO  
 # ==============================================================================  
 # ATENÇÃO: Configure estes caminhos antes de executar o script.  
 
-# (Opcional, apenas para Windows) Caminho para o executável do Tesseract OCR.  
-TESSERACT_CMD_PATH = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# Caminho do Tesseract OCR e parâmetros do OCR: definidos em config.py
+# (TESSERACT_CMD_PATH, OCR_*), pois os workers de OCR também leem de lá.
 
 # Diretório onde o banco de dados do ChromaDB será armazenado.
 CHROMA_PERSIST_DIRECTORY = "./chroma_db"
 
-# Diretório do banco de dados de fallback (SQLite).
-SQLITE_DB_PATH = "embeddings_fallback.db"
+# Banco de dados de fallback (SQLite): definido em config.py (SQLITE_DB_PATH),
+# pois a pesquisa também lê dele.
 
-# ==============================================================================  
+# Manifesto dos arquivos indexados (tamanho, mtime e hash) usado na reindexação incremental.
+MANIFEST_DB_PATH = "index_manifest.db"
 
-# Configura o Tesseract se o caminho foi fornecido
-if TESSERACT_CMD_PATH and os.path.exists(TESSERACT_CMD_PATH):
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD_PATH
+# ==============================================================================  
 
 # Constantes
-IMAGE_EXTS = [".png", ".jpg", ".jpeg", ".tiff", ".bmp", ".gif"]
 MAX_THREAD_WORKERS = 4
 MAX_PROCESS_WORKERS = os.cpu_count() or 2  # Usa os cores disponíveis
+DELETE_BATCH_SIZE = 500  # caminhos por chamada de remoção
+MAX_IN_FLIGHT = MAX_PROCESS_WORKERS * 4  # arquivos sendo extraídos ao mesmo tempo
+PIPELINE_QUEUE_SIZE = 8  # lotes em espera entre os estágios do pipeline
+BATCH_SIZE_NAME = 5000  # nomes de arquivos/pastas por lote de embedding
+MANIFEST_FLUSH_SIZE = 1000  # linhas do manifesto acumuladas antes de gravar
 
 # --------- Modelo de Embedding (local) ----------
-print("Carregando modelo de embeddings local (all-MiniLM-L6-v2)...")
-sbert = SentenceTransformer("all-MiniLM-L6-v2")
+engine = None
+embed_cache = None
+
+def get_engine(backend=EMBED_BACKEND):
+    """Carrega (uma vez) o motor de embeddings e o cache correspondente."""
+    global engine, embed_cache
+    if engine is None:
+        print(f"Carregando modelo de embeddings local ({backend})...")
+        engine = EmbeddingEngine(backend)
+        if EMBED_CACHE_ENABLED:
+            embed_cache = EmbeddingCache(EMBED_CACHE_PATH, engine.name, EMBED_CACHE_MEMORY_MB)
+    return engine
 
 def embed_texts(texts):
-    """Gera embeddings para uma lista de textos."""
-    embs = sbert.encode(texts, show_progress_bar=False, convert_to_tensor=False)
-    # Garante que a saída seja uma lista de listas de floats
-    return [e.tolist() if hasattr(e, "tolist") else list(map(float, e)) for e in embs]
+    """Gera embeddings para uma lista de textos, reaproveitando o cache de embeddings."""
+    encoder = get_engine()
+    if embed_cache is None:
+        return encoder.encode(texts)
+    return embed_cache.encode(texts, encoder.encode)
 
 # --------- Funções do Banco de Dados (ChromaDB e Fallback SQLite) ----------
 
@@ -65,14 +86,25 @@ def make_id(text: str) -> str:
 class DatabaseManager:
     """
     Gerencia o armazenamento em ChromaDB com fallback para SQLite.
-    Agora lida com múltiplas coleções.
+    Agora lida com múltiplas coleções. Com `shard`, usa os bancos do shard
+    (Chroma, SQLite e índice léxico em SHARDS_DIR/<shard>). Com `compact`,
+    grava direto no SQLite com vetores COMPACT_DTYPE e trechos resumidos.
     """
-    def __init__(self, use_chroma=True):
+    def __init__(self, use_chroma=True, shard=None, compact=COMPACT_STORAGE):
+        self.shard = shard
+        self.compact = compact
+        use_chroma = use_chroma and not compact
+        if shard:
+            paths = store_paths(shard)
+            self.chroma_dir, self.sqlite_path, self.lexical_path = paths["chroma"], paths["sqlite"], paths["lexical"]
+        else:
+            self.chroma_dir, self.sqlite_path, self.lexical_path = CHROMA_PERSIST_DIRECTORY, SQLITE_DB_PATH, LEXICAL_DB_PATH
         self.using_chroma = False
         if use_chroma:
             try:
-                print(f"Inicializando ChromaDB em '{CHROMA_PERSIST_DIRECTORY}'...")
-                self.chroma_client = chromadb.PersistentClient(path=CHROMA_PERSIST_DIRECTORY)
+                print(f"Inicializando ChromaDB em '{self.chroma_dir}'...")
+                import chromadb
+                self.chroma_client = chromadb.PersistentClient(path=self.chroma_dir)
                 self.collections = {
                     "files_content": self.chroma_client.get_or_create_collection("files_content"),
                     "files_name": self.chroma_client.get_or_create_collection("files_name"),
@@ -84,18 +116,20 @@ class DatabaseManager:
                 print(f"AVISO: Falha ao inicializar ChromaDB: {e}")
                 self.using_chroma = False
 
-        if not self.using_chroma:
-            print(f"Usando fallback para SQLite em '{SQLITE_DB_PATH}'.")
+        self.sqlite_store = None
+        if self.compact:
+            print(f"Armazenamento compacto ({COMPACT_DTYPE}) em '{self.sqlite_path}'.")
+            self.sqlite_init()
+        elif not self.using_chroma:
+            print(f"Usando fallback para SQLite em '{self.sqlite_path}'.")
             self.sqlite_init()
 
     def sqlite_init(self):
-        """Inicializa as tabelas no banco de dados SQLite."""
-        with sqlite3.connect(SQLITE_DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("CREATE TABLE IF NOT EXISTS files_content (id TEXT PRIMARY KEY, path TEXT, content TEXT, embedding TEXT)")
-            cur.execute("CREATE TABLE IF NOT EXISTS files_name (id TEXT PRIMARY KEY, path TEXT, name TEXT, embedding TEXT)")
-            cur.execute("CREATE TABLE IF NOT EXISTS folders (id TEXT PRIMARY KEY, path TEXT, embedding TEXT)")
-            conn.commit()
+        """Abre o banco vetorial SQLite (embeddings em BLOB float32/float16/int8, uma tabela por coleção)."""
+        if self.sqlite_store is None:
+            from vector_store import SQLiteVectorStore
+            self.sqlite_store = SQLiteVectorStore(self.sqlite_path, dtype=COMPACT_DTYPE if self.compact else None)
+        return self.sqlite_store
 
     def get_existing_ids(self, collection_name: str) -> set:
         """Obtém os IDs existentes de uma coleção/tabela."""
@@ -106,10 +140,7 @@ class DatabaseManager:
                 print(f"Erro ao buscar IDs do Chroma para '{collection_name}': {e}")
                 return set()
         else:  # SQLite
-            with sqlite3.connect(SQLITE_DB_PATH) as conn:
-                cur = conn.cursor()
-                cur.execute(f"SELECT id FROM {collection_name}")
-                return {row[0] for row in cur.fetchall()}
+            return self.sqlite_init().get_or_create_collection(collection_name).get_ids()
 
     def store_batch(self, collection_name: str, data: list):
         """Armazena um lote de dados na coleção/tabela apropriada."""
@@ -120,184 +151,785 @@ class DatabaseManager:
         embeddings = [item['embedding'] for item in data]
         documents = [item['document'] for item in data]
         metadatas = [item['metadata'] for item in data]
+        if self.compact and collection_name == COLLECTION_CONTENT:
+            # o texto completo do trecho fica no arquivo (e no índice léxico)
+            metadatas = [dict(m, excerpt=True) if len(d) > COMPACT_DOC_CHARS else m
+                         for d, m in zip(documents, metadatas)]
+            documents = [d[:COMPACT_DOC_CHARS] for d in documents]
 
         if self.using_chroma:
             try:
-                self.collections[collection_name].add(
+                self.collections[collection_name].upsert(
                     ids=ids,
                     embeddings=embeddings,
                     documents=documents,
                     metadatas=metadatas
                 )
+                return
             except Exception as e:
                 print(f"Erro ao adicionar lote no Chroma ('{collection_name}'), tentando fallback para SQLite: {e}")
-                if collection_name == "files_content":
-                     self._sqlite_store_content(ids, documents, embeddings, metadatas)
-        elif collection_name == "files_content":
-            self._sqlite_store_content(ids, documents, embeddings, metadatas)
-
-    def _sqlite_store_content(self, ids, documents, embeddings, metadatas):
-        """Lógica específica para salvar conteúdo de arquivos no SQLite."""
-        with sqlite3.connect(SQLITE_DB_PATH) as conn:
-            cur = conn.cursor()
-            rows = []
-            for id_val, doc, emb, meta in zip(ids, documents, embeddings, metadatas):
-                rows.append((id_val, meta.get('path', ''), doc, json.dumps(emb)))
-            cur.executemany("INSERT OR REPLACE INTO files_content (id, path, content, embedding) VALUES (?, ?, ?, ?)", rows)
-            conn.commit()
+                METRICS.inc("store_fallback_batches", collection=collection_name)
+        self.sqlite_init().get_or_create_collection(collection_name).upsert(ids, embeddings, documents, metadatas)
+
+    def delete_paths(self, collection_name: str, paths: list):
+        """Remove da coleção/tabela todas as entradas ligadas aos caminhos informados."""
+        if not paths:
+            return
+        if self.using_chroma:
+            for i in range(0, len(paths), DELETE_BATCH_SIZE):
+                batch = paths[i:i+DELETE_BATCH_SIZE]
+                try:
+                    self.collections[collection_name].delete(where={"path": {"$in": batch}})
+                except Exception as e:
+                    print(f"Erro ao remover entradas do Chroma ('{collection_name}'): {e}")
+        # lotes que caíram no fallback também precisam sair
+        if self.sqlite_store is not None:
+            self.sqlite_store.get_or_create_collection(collection_name).delete_paths(paths)
 
 # --------- Funções de Leitura de Arquivo e OCR ----------
 def read_file_content(file_path, use_ocr=True):
-    """Lê o conteúdo de um arquivo, com opção de usar OCR para PDFs e imagens."""
-    ext = os.path.splitext(file_path)[1].lower()
+    """Lê o conteúdo de um arquivo como texto, com opção de usar OCR para PDFs e imagens."""
     try:
-        if ext == ".txt":
-            try:
-                with open(file_path, "r", encoding="utf-8") as f: return f.read()
-            except UnicodeDecodeError:
-                with open(file_path, "r", encoding="latin-1") as f: return f.read()
-        elif ext == ".csv":
-            return pd.read_csv(file_path).to_string()
-        elif ext in [".xls", ".xlsx", ".xlsm", ".xlsb"]:
-            df = pd.read_excel(file_path, sheet_name=None)
-            return "\n".join([f"--- {name} ---\n{sheet.to_string()}" for name, sheet in df.items()])
-        elif ext == ".docx":
-            return "\n".join([p.text for p in Document(file_path).paragraphs])
-        elif ext == ".pptx":
-            return "\n".join(shape.text for slide in Presentation(file_path).slides for shape in slide.shapes if hasattr(shape, "text"))
-        elif ext == ".pdf":
-            text = ""
-            try:
-                reader = PdfReader(file_path)
-                for page in reader.pages: text += page.extract_text() or ""
-            except Exception: pass
-            if use_ocr and (not text or not text.strip()):
-                images = convert_from_path(file_path)
-                for img in images: text += pytesseract.image_to_string(img) or ""
-            return text
-        elif ext in IMAGE_EXTS and use_ocr:
-            from PIL import Image
-            return pytesseract.image_to_string(Image.open(file_path))
-        return ""
-    except Exception:
+        return extract_text(file_path, use_ocr=use_ocr)
+    except Exception as e:
+        METRICS.failure("extract", file_path, e)
         return ""
 
-def process_file_worker(path):
-    """Worker que lê o conteúdo de um arquivo e retorna o caminho e o conteúdo."""
-    content = read_file_content(path, use_ocr=True)
-    return path, content
+def process_file_worker(path, known_hash=None, use_hash=False):
+    """
+    Worker que lê o conteúdo de um arquivo, divide em trechos e retorna
+    (caminho, hash, trechos, ok, métricas), onde trechos é uma lista de
+    (inicio, fim, texto) ou, em planilhas/CSV, (inicio, fim, texto, metadados),
+    ok é False se a extração falhou (o arquivo não entra no manifesto e é
+    tentado de novo na próxima execução) e métricas é o que o worker mediu
+    (`METRICS.drain()`).
+    Se o hash calculado for igual a `known_hash`, o conteúdo não é lido e
+    os trechos voltam como None (arquivo só foi "tocado", sem mudança real).
+    PDFs com páginas sem camada de texto voltam como `PendingPDF`: o OCR de
+    cada página é distribuído pelo pipeline entre os processos.
+    """
+    h = None
+    if use_hash:
+        try:
+            with METRICS.timer("hash_seconds"):
+                h = file_hash(path)
+        except OSError as e:
+            METRICS.failure("hash", path, e)
+            h = None
+        if h is not None and h == known_hash:
+            METRICS.inc("files_unchanged_hash")
+            return path, h, None, True, METRICS.drain()
+    ext = os.path.splitext(path)[1].lower()
+    ok = True
+    with METRICS.timer("extract_seconds", ext=ext):
+        if ext == ".pdf":
+            texts, pending = read_pdf_pages(path)
+            if pending:
+                return path, h, PendingPDF(path, texts, pending), True, METRICS.drain()
+            chunks = chunk_text("\n".join(texts))
+        else:
+            try:
+                chunks = extract_chunks(path, use_ocr=True)
+            except Exception as e:
+                METRICS.failure("extract", path, e)
+                chunks, ok = [], False
+    return path, h, chunks, ok, METRICS.drain()
+
+def ocr_page_worker(path, page_no, key):
+    """
+    Worker de OCR de uma página; retorna (página, texto, início do OCR em
+    time.time(), erro?, métricas).
+    """
+    started = time.time()
+    try:
+        _, text = ocr_pdf_page(path, page_no, key)
+        error = False
+    except Exception as e:
+        METRICS.failure("ocr", f"{path}#p{page_no + 1}", e)
+        text, error = None, True
+    return page_no, text, started, error, METRICS.drain()
+
+def build_content_batch(content_batch):
+    """Gera embeddings dos trechos de um lote de arquivos e monta os dados do `files_content`."""
+    chunks = [(item['path'], i, chunk) for item in content_batch for i, chunk in enumerate(item['chunks'])]
+    embeddings = embed_texts([chunk[2] for _, _, chunk in chunks])
+    # Trechos de planilha trazem metadados extras (planilha, faixa de linhas)
+    return [{
+        'id': make_id(f"{path}#{i}"),
+        'embedding': emb,
+        'document': chunk[2],
+        'metadata': {'path': path, 'chunk': i, 'start': chunk[0], 'end': chunk[1], **(chunk[3] if len(chunk) > 3 else {})}
+    } for (path, i, chunk), emb in zip(chunks, embeddings)]
+
+def build_name_batch(paths, folders=False):
+    """
+    Gera embeddings de nomes de arquivos (basename) ou de pastas (caminho completo).
+    Cada caminho é uma entrada própria (id pelo caminho completo), mas cada
+    texto distinto é embeddado uma vez só: milhares de `relatorio.xlsx`
+    custam um embedding.
+    """
+    texts = paths if folders else [os.path.basename(p) for p in paths]
+    distinct = list(dict.fromkeys(texts))
+    by_text = dict(zip(distinct, embed_texts(distinct)))
+    METRICS.inc("names_embedded", len(distinct), kind="folders" if folders else "files_name")
+    return [{
+        'id': make_id(path),
+        'embedding': by_text[text],
+        'document': text,
+        'metadata': {'path': path}
+    } for text, path in zip(texts, paths)]
+
+# --------- Pipeline de Indexação ----------
+# varredura (gerador) -> extração (janela limitada no ProcessPool)
+#   -> embeddings (thread) -> gravação (thread)
+# As filas entre os estágios são limitadas: se um estágio atrasa, o anterior
+# espera, então a memória não cresce com o tamanho da árvore.
+
+def diff_directory(dir_path, entries, manifest, known, resume, summary):
+    """
+    Compara a listagem de uma pasta com o manifesto e gera as tarefas:
+    ("conteudo", (caminho, tamanho, mtime_ns, hash conhecido)), ("nome", caminho),
+    ("pasta", pasta) e ("remover", [caminhos]). `known` indica se a pasta já
+    está no manifesto.
+    """
+    previous = manifest.dir_entries(dir_path) if known else {}
+    summary["total"] += len(entries)
+    for path, size, mtime_ns in entries:
+        old = previous.pop(path, None)
+        if old is None or not resume:
+            yield "nome", path
+        if old is None:
+            summary["alterados"] += 1
+            yield "conteudo", (path, size, mtime_ns, None)
+        elif not resume or (old[0], old[1]) != (size, mtime_ns):
+            summary["alterados"] += 1
+            yield "conteudo", (path, size, mtime_ns, old[2])
+    if previous:
+        summary["removidos"] += len(previous)
+        yield "remover", list(previous)
+    if entries and (not known or not resume):
+        yield "pasta", dir_path
+
+def plan_changes(root_folder, manifest, resume, summary):
+    """
+    Compara a árvore com o manifesto pasta por pasta e gera as tarefas de
+    `diff_directory`, mais ("remover_pastas", [pastas]) para pastas que
+    sumiram ou ficaram vazias.
+    """
+    known_dirs = manifest.known_dirs(root_folder)
+    listed_dirs = set()
+    filled_dirs = set()     # pastas que têm pelo menos um arquivo
+    unreadable_dirs = []
+
+    for dir_path, entries in scan_tree(root_folder):
+        if entries is None:
+            unreadable_dirs.append(os.path.join(dir_path, ""))
+            continue
+        listed_dirs.add(dir_path)
+        yield from diff_directory(dir_path, entries, manifest, dir_path in known_dirs, resume, summary)
+        if entries:
+            filled_dirs.add(dir_path)
+
+    # Pastas do manifesto que sumiram ou ficaram vazias (exceto as que não puderam ser lidas)
+    stale_dirs = {d for d in known_dirs - filled_dirs
+                  if not any(os.path.join(d, "").startswith(u) for u in unreadable_dirs)}
+    for dir_path in stale_dirs - listed_dirs:
+        removed = list(manifest.dir_entries(dir_path))
+        if removed:
+            summary["removidos"] += len(removed)
+            yield "remover", removed
+    if stale_dirs:
+        yield "remover_pastas", sorted(stale_dirs)
+
+def embed_stage(in_queue, out_queue, batch_size):
+    """
+    Estágio de embeddings: agrupa trechos, nomes e pastas em lotes, gera os
+    embeddings e envia os lotes prontos para o estágio de gravação.
+    """
+    content_batch, replaced, manifest_rows = [], [], []
+    names, folders = [], []
+
+    def send(item):
+        # tempo bloqueado aqui = gravação mais lenta que os embeddings
+        with METRICS.timer("store_queue_wait_seconds"):
+            out_queue.put(item)
+
+    def flush_content():
+        nonlocal content_batch, replaced, manifest_rows
+        try:
+            with METRICS.timer("embed_seconds", kind="conteudo"):
+                data = build_content_batch(content_batch) if content_batch else []
+            send(("conteudo", data, replaced, manifest_rows))
+        except Exception as e:
+            print(f"Erro ao gerar embeddings do conteúdo: {e}")
+            for item in content_batch:
+                METRICS.failure("embed", item['path'], e)
+        content_batch, replaced, manifest_rows = [], [], []
+
+    def flush_names(paths, folders_batch):
+        kind = "folders" if folders_batch else "files_name"
+        try:
+            with METRICS.timer("embed_seconds", kind=kind):
+                data = build_name_batch(paths, folders=folders_batch)
+            send((kind, data))
+        except Exception as e:
+            print(f"Erro ao gerar embeddings de nomes: {e}")
+            METRICS.failure("embed", f"{len(paths)} {kind}", e)
+
+    while True:
+        item = in_queue.get()
+        if item is None:
+            break
+        kind, payload = item
+        if kind == "conteudo":
+            path, size, mtime_ns, h, chunks = payload
+            manifest_rows.append((path, size, mtime_ns, h))
+            if chunks is not None:  # None: hash igual, conteúdo não mudou
+                replaced.append(path)
+                if chunks:
+                    content_batch.append({'path': path, 'chunks': chunks})
+            if len(content_batch) >= batch_size or len(manifest_rows) >= MANIFEST_FLUSH_SIZE:
+                flush_content()
+        elif kind == "nome":
+            names.append(payload)
+            if len(names) >= BATCH_SIZE_NAME:
+                flush_names(names, False)
+                names = []
+        elif kind == "pasta":
+            folders.append(payload)
+            if len(folders) >= BATCH_SIZE_NAME:
+                flush_names(folders, True)
+                folders = []
+
+    if manifest_rows:
+        flush_content()
+    if names:
+        flush_names(names, False)
+    if folders:
+        flush_names(folders, True)
+    out_queue.put(None)
+
+def store_stage(in_queue, db_manager, manifest_path, summary):
+    """
+    Estágio de gravação: aplica remoções e upserts no banco (e no índice
+    léxico) e atualiza o manifesto (com conexão própria) só depois que o
+    lote foi gravado.
+    """
+    manifest = FileManifest(manifest_path)
+    lexical = LexicalIndex(db_manager.lexical_path) if LEXICAL_ENABLED else None
+    while True:
+        item = in_queue.get()
+        if item is None:
+            break
+        kind = item[0]
+        try:
+            if kind == "conteudo":
+                _, data, replaced, manifest_rows = item
+                with METRICS.timer("delete_seconds", collection=COLLECTION_CONTENT):
+                    db_manager.delete_paths(COLLECTION_CONTENT, replaced)
+                with METRICS.timer("store_seconds", collection=COLLECTION_CONTENT):
+                    db_manager.store_batch(COLLECTION_CONTENT, data)
+                if lexical:
+                    with METRICS.timer("lexical_seconds", collection=COLLECTION_CONTENT):
+                        lexical.delete_paths(COLLECTION_CONTENT, replaced)
+                        lexical.upsert(COLLECTION_CONTENT, data)
+                with METRICS.timer("manifest_seconds"):
+                    manifest.update(manifest_rows)
+                METRICS.inc("rows_stored", len(data), collection=COLLECTION_CONTENT)
+            elif kind in ("files_name", "folders"):
+                if kind == "files_name":
+                    # entradas antigas dos mesmos caminhos (de quando o id era o nome) saem antes do upsert
+                    paths = [row['metadata']['path'] for row in item[1]]
+                    with METRICS.timer("delete_seconds", collection=kind):
+                        db_manager.delete_paths(kind, paths)
+                        if lexical:
+                            lexical.delete_paths(kind, paths)
+                with METRICS.timer("store_seconds", collection=kind):
+                    db_manager.store_batch(kind, item[1])
+                if lexical:
+                    with METRICS.timer("lexical_seconds", collection=kind):
+                        lexical.upsert(kind, item[1])
+                METRICS.inc("rows_stored", len(item[1]), collection=kind)
+                summary["nomes" if kind == "files_name" else "pastas"] += len(item[1])
+            elif kind == "remover":
+                with METRICS.timer("delete_seconds", collection="arquivos_removidos"):
+                    db_manager.delete_paths(COLLECTION_CONTENT, item[1])
+                    db_manager.delete_paths("files_name", item[1])
+                    if lexical:
+                        lexical.delete_paths(COLLECTION_CONTENT, item[1])
+                        lexical.delete_paths("files_name", item[1])
+                    manifest.remove(item[1])
+            elif kind == "remover_pastas":
+                with METRICS.timer("delete_seconds", collection="folders"):
+                    db_manager.delete_paths("folders", item[1])
+                    if lexical:
+                        lexical.delete_paths("folders", item[1])
+        except Exception as e:
+            print(f"Erro ao gravar lote ('{kind}'): {e}")
+            METRICS.failure("store", kind, e)
+    manifest.close()
+    if lexical:
+        lexical.close()
+
+def new_summary():
+    """Contadores de uma execução do pipeline."""
+    return {"total": 0, "alterados": 0, "removidos": 0, "nomes": 0, "pastas": 0}
+
+def run_pipeline(tasks, db_manager, summary, batch_size=32, use_hash=False, executor=None, progress_bar=True):
+    """
+    Executa o pipeline sobre as tarefas geradas por `plan_changes` (ou pelo
+    observador de pastas): extração na janela limitada do ProcessPool,
+    embeddings e gravação em threads próprias.
+    Um `executor` já aberto pode ser reaproveitado entre execuções.
+    """
+    embed_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE * batch_size)
+    store_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    embedder = threading.Thread(target=embed_stage, args=(embed_queue, store_queue, batch_size), daemon=True)
+    writer = threading.Thread(target=store_stage, args=(store_queue, db_manager, MANIFEST_DB_PATH, summary), daemon=True)
+    embedder.start()
+    writer.start()
+
+    def emit(path, size, mtime_ns, h, chunks, complete=True):
+        if not complete:
+            # sem mtime/hash o manifesto não casa com o arquivo e a próxima execução o relê
+            mtime_ns, h = None, None
+        if chunks is not None:
+            ext = os.path.splitext(path)[1].lower()
+            METRICS.inc("files_extracted", ext=ext)
+            METRICS.inc("bytes_read", size, ext=ext)
+            METRICS.inc("chunks", len(chunks), ext=ext)
+        # tempo bloqueado aqui = embeddings mais lentos que a extração
+        with METRICS.timer("embed_queue_wait_seconds"):
+            embed_queue.put(("conteudo", (path, size, mtime_ns, h, chunks)))
+        progress.update(1)
+
+    def forward(future):
+        owner = in_flight.pop(future)
+        if isinstance(owner[0], PendingPDF):
+            # Uma página de OCR terminou; o PDF segue quando todas terminarem
+            doc, page_no, (size, mtime_ns, h) = owner
+            text, error = None, False
+            if future.cancelled():
+                METRICS.inc("ocr_pages_timed_out")
+            else:
+                try:
+                    _, text, started, error, worker_metrics = future.result()
+                    METRICS.merge(worker_metrics)
+                    doc.page_started(started)
+                except Exception as e:
+                    print(f"Erro no OCR da página {page_no + 1} de '{doc.path}': {e}")
+                    METRICS.failure("ocr", f"{doc.path}#p{page_no + 1}", e)
+                    error = True
+            if doc.out_of_time():
+                # o prazo conta do início do OCR do arquivo, não de quando as páginas entraram na fila
+                for other, other_owner in in_flight.items():
+                    if other_owner[0] is doc:
+                        other.cancel()
+            if doc.set_page(page_no, text, error):
+                # só o tempo esgotado faz o arquivo ser relido: um erro do OCR se repetiria a cada execução
+                doc.report(retry=True)
+                emit(doc.path, size, mtime_ns, h, chunk_text(doc.text()), complete=not doc.timed_out)
+            return
+        size, mtime_ns = owner
+        try:
+            path, h, chunks, ok, worker_metrics = future.result()
+            METRICS.merge(worker_metrics)
+        except Exception as e:
+            print(f"Erro no worker de arquivo: {e}")
+            METRICS.failure("worker", None, e)
+            progress.update(1)
+            return
+        if isinstance(chunks, PendingPDF):
+            for page_no, key in chunks.pending:
+                page_future = executor.submit(ocr_page_worker, path, page_no, key)
+                in_flight[page_future] = (chunks, page_no, (size, mtime_ns, h))
+            return
+        emit(path, size, mtime_ns, h, chunks, complete=ok)
+
+    def drain_window(limit):
+        # tempo esperando aqui = extração (workers) é o gargalo
+        with METRICS.timer("extract_wait_seconds"):
+            while len(in_flight) > limit:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    forward(future)
+
+    # future -> (tamanho, mtime_ns) de um arquivo, ou (PendingPDF, página, (tamanho, mtime_ns, hash))
+    in_flight = {}
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=MAX_PROCESS_WORKERS)
+    encoder = get_engine()
+    embed_before = dict(encoder.stats)
+    cache_before = (embed_cache.hits, embed_cache.misses) if embed_cache is not None else None
+    try:
+        with tqdm(desc="Lendo conteúdo dos arquivos", unit="arq", disable=not progress_bar) as progress:
+            for kind, payload in timed_iter(tasks, "walk_seconds"):
+                if kind == "conteudo":
+                    drain_window(MAX_IN_FLIGHT - 1)
+                    path, size, mtime_ns, known_hash = payload
+                    in_flight[executor.submit(process_file_worker, path, known_hash, use_hash)] = (size, mtime_ns)
+                elif kind in ("nome", "pasta"):
+                    embed_queue.put((kind, payload))
+                else:
+                    store_queue.put((kind, payload))
+            # Páginas de OCR entram na janela enquanto ela esvazia
+            drain_window(0)
+    finally:
+        if own_executor:
+            executor.shutdown()
+        embed_queue.put(None)
+        embedder.join()
+        writer.join()
+        METRICS.inc("embed_texts", encoder.stats["docs"] - embed_before["docs"])
+        METRICS.inc("embed_tokens", encoder.stats["tokens"] - embed_before["tokens"])
+        METRICS.observe("embed_model_seconds", encoder.stats["seconds"] - embed_before["seconds"])
+        if cache_before is not None:
+            METRICS.inc("embed_cache_hits", embed_cache.hits - cache_before[0])
+            METRICS.inc("embed_cache_misses", embed_cache.misses - cache_before[1])
+
+def timed_iter(iterable, name):
+    """Repassa os itens somando em `name` o tempo gasto para produzi-los (ex.: varrer a árvore)."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            METRICS.observe(name, time.perf_counter() - start)
+            return
+        METRICS.observe(name, time.perf_counter() - start)
+        yield item
+
+def print_metrics_summary(max_failures=10):
+    """Resumo das métricas da indexação: tempo por etapa, volume e falhas."""
+    seconds = lambda name: METRICS.total(name, kind="timer")
+    print(f"Tempo por etapa: varredura {seconds('walk_seconds'):.1f}s | extração (soma dos workers) "
+          f"{seconds('extract_seconds'):.1f}s | OCR {seconds('ocr_page_seconds') + seconds('ocr_image_seconds'):.1f}s | "
+          f"embeddings {seconds('embed_seconds'):.1f}s | gravação {seconds('store_seconds') + seconds('lexical_seconds'):.1f}s")
+    print(f"Espera: pela extração {seconds('extract_wait_seconds'):.1f}s | pelos embeddings "
+          f"{seconds('embed_queue_wait_seconds'):.1f}s | pela gravação {seconds('store_queue_wait_seconds'):.1f}s")
+    print(f"Lidos {METRICS.total('files_extracted')} arquivos ({METRICS.total('bytes_read') / 1e6:.1f} MB), "
+          f"{METRICS.total('chunks')} trechos, {METRICS.total('embed_tokens')} tokens embeddados, "
+          f"{METRICS.total('ocr_pages')} páginas com OCR ({METRICS.total('ocr_pages_cached')} do cache).")
+    failures = METRICS.snapshot()["failures"]
+    if failures:
+        print(f"{METRICS.total('failures')} falhas:")
+        for f in failures[:max_failures]:
+            print(f"  [{f['stage']}] {f['path']}: {f['reason']}")
 
 # --------- Indexador Principal ----------
-def index_folder(root_folder, batch_size=32, resume=True):
+def index_folder(root_folder, batch_size=32, resume=True, use_hash=False, embed_backend=EMBED_BACKEND,
+                 db_manager=None, metrics_out=METRICS_PATH, metrics_format=METRICS_FORMAT, shard=None):
     """
     Indexa todos os arquivos em um diretório, criando embeddings para conteúdo,
     nomes de arquivos e nomes de pastas.
+
+    Com `resume=True` a árvore é comparada com o manifesto (tamanho/mtime_ns e,
+    com `use_hash=True`, hash do conteúdo): só arquivos novos ou alterados são
+    relidos e embeddados, e arquivos que sumiram do disco saem das três coleções.
+    Se o índice léxico ainda não tem a pasta (instalação anterior a ele), ele
+    é preenchido uma vez com o que já está nas coleções vetoriais.
+    As métricas da execução são exportadas para `metrics_out` (jsonl ou prom), se informado.
+
+    Com `shard`, a pasta é registrada nesse shard e gravada nos bancos dele;
+    sem `shard`, uma pasta que já pertence a um shard continua indo para ele.
     """
-    db_manager = DatabaseManager(use_chroma=True)
-
-    print("Procurando por arquivos...")
-    all_files = [os.path.join(root, fn) for root, _, files in os.walk(root_folder) for fn in files]
-    print(f"Encontrados {len(all_files)} arquivos no total.")
-
-    # Filtrar arquivos já processados (se `resume` for True)
-    if resume:
-        print("Verificando arquivos já indexados...")
-        existing_content_ids = db_manager.get_existing_ids("files_content")
-        files_to_process = [f for f in all_files if make_id(f) not in existing_content_ids]
-        print(f"{len(files_to_process)} novos arquivos para processar.")
-    else:
-        files_to_process = all_files
+    root_folder = os.path.abspath(root_folder)
+    shard = resolve_shard(root_folder, shard)
+    get_engine(embed_backend)
+    db_manager = db_manager or DatabaseManager(use_chroma=True, shard=shard)
+    manifest = FileManifest(MANIFEST_DB_PATH)
+    summary = new_summary()
+    METRICS.reset()  # resumo e falhas só desta execução
+
+    if resume and lexical_needs_backfill(root_folder, manifest, db_manager.lexical_path):
+        print("Aviso: o índice léxico não tem os arquivos desta pasta (índice criado depois da última "
+              "indexação ou apagado). Preenchendo-o a partir das coleções vetoriais...")
+        with METRICS.timer("lexical_backfill_seconds"):
+            total = backfill_lexical(root_folder, db_manager)
+        print(f"{total} trechos, nomes e pastas copiados para o índice léxico.")
+    print("Comparando arquivos com o manifesto e indexando...")
+    try:
+        run_pipeline(plan_changes(root_folder, manifest, resume, summary), db_manager, summary,
+                     batch_size=batch_size, use_hash=use_hash)
+    finally:
+        manifest.close()
+
+    print(f"Encontrados {summary['total']} arquivos no total: {summary['alterados']} novos/alterados, "
+          f"{summary['removidos']} removidos.")
+    print(f"{summary['nomes']} nomes de arquivos e {summary['pastas']} pastas indexados "
+          f"({METRICS.total('names_embedded')} textos distintos embeddados).")
+    print_metrics_summary()
+    if metrics_out:
+        METRICS.write(metrics_out, metrics_format, run="index", root=root_folder, shard=shard, summary=summary)
+        print(f"Métricas gravadas em '{metrics_out}'.")
+    print("\nIndexação finalizada!")
+    return summary
 
-    if not files_to_process:
-        print("Nenhum arquivo novo para indexar.")
-        return
+def lexical_needs_backfill(root_folder, manifest, lexical_path) -> bool:
+    """
+    Indica se a pasta já está no manifesto mas não no índice léxico. Nesse
+    caso a indexação incremental pularia todos os arquivos conhecidos e a
+    busca BM25 e o atalho de identificadores não os encontrariam.
+    """
+    if not LEXICAL_ENABLED or not manifest.known_dirs(root_folder):
+        return False
+    lexical = LexicalIndex(lexical_path)
+    try:
+        return not lexical.has_paths(root_folder)
+    finally:
+        lexical.close()
 
-    # 1. Processar CONTEÚDO dos arquivos
-    content_batch = []
-    with ProcessPoolExecutor(max_workers=MAX_PROCESS_WORKERS) as executor:
-        futures = [executor.submit(process_file_worker, f) for f in files_to_process]
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Lendo conteúdo dos arquivos"):
+def backfill_lexical(root_folder, db_manager, page_size=1000) -> int:
+    """
+    Preenche o índice léxico com os trechos, nomes e pastas de `root_folder`
+    já gravados nas coleções vetoriais (Chroma e lotes do fallback SQLite),
+    sem reextrair os arquivos nem gerar embeddings. Retorna quantas entradas
+    foram indexadas.
+    """
+    prefix = os.path.join(root_folder, "")
+    lexical = LexicalIndex(db_manager.lexical_path)
+    total = 0
+    try:
+        for kind in (COLLECTION_CONTENT, "files_name", "folders"):
+            collections = [db_manager.collections[kind]] if db_manager.using_chroma else []
+            if db_manager.sqlite_store is not None:
+                collections.append(db_manager.sqlite_store.get_or_create_collection(kind))
+            for collection in collections:
+                offset = 0
+                while True:
+                    r = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+                    if not r["ids"]:
+                        break
+                    offset += len(r["ids"])
+                    data = [{'id': id_val, 'document': doc or "", 'metadata': meta or {}}
+                            for id_val, doc, meta in zip(r["ids"], r["documents"], r["metadatas"])
+                            if (meta or {}).get("path", "") == root_folder
+                            or (meta or {}).get("path", "").startswith(prefix)]
+                    if kind == COLLECTION_CONTENT:
+                        restore_excerpts(data)
+                    lexical.upsert(kind, data)
+                    total += len(data)
+    finally:
+        lexical.close()
+    return total
+
+def restore_excerpts(data):
+    """
+    Troca o começo guardado dos trechos resumidos (armazenamento compacto)
+    pelo trecho completo relido do arquivo, sem OCR. Se o arquivo mudou ou
+    não pode ser lido, fica o começo.
+    """
+    extracted = {}
+    for item in data:
+        meta = item['metadata']
+        if not meta.get("excerpt"):
+            continue
+        path, chunk = meta.get("path", ""), meta.get("chunk", 0)
+        if path not in extracted:
             try:
-                path, content = future.result()
-                if content and content.strip():
-                    content_batch.append({'path': path, 'content': content})
-                    if len(content_batch) >= batch_size:
-                        contents = [item['content'] for item in content_batch]
-                        embeddings = embed_texts(contents)
-                        data_to_store = [{
-                            'id': make_id(item['path']),
-                            'embedding': emb,
-                            'document': item['content'],
-                            'metadata': {'path': item['path']}
-                        } for item, emb in zip(content_batch, embeddings)]
-                        db_manager.store_batch("files_content", data_to_store)
-                        content_batch = []
+                extracted[path] = extract_chunks(path, use_ocr=False)
             except Exception as e:
-                print(f"Erro no worker de arquivo: {e}")
-
-    if content_batch:
-        contents = [item['content'] for item in content_batch]
-        embeddings = embed_texts(contents)
-        data_to_store = [{
-            'id': make_id(item['path']),
-            'embedding': emb,
-            'document': item['content'],
-            'metadata': {'path': item['path']}
-        } for item, emb in zip(content_batch, embeddings)]
-        db_manager.store_batch("files_content", data_to_store)
-
-    # 2. Processar NOMES de arquivos e PASTAS (para todos os arquivos, com batches)
-    print("Indexando nomes de arquivos e pastas...")
-
-    # Nomes de arquivos
-    file_names = {os.path.basename(f): f for f in all_files}
-    unique_file_names = list(file_names.keys())
-    BATCH_SIZE_NAME = 5000
-    for i in range(0, len(unique_file_names), BATCH_SIZE_NAME):
-        batch_names = unique_file_names[i:i+BATCH_SIZE_NAME]
-        batch_embeddings = embed_texts(batch_names)
-        data_to_store_names = [{
-            'id': make_id(name),
-            'embedding': emb,
-            'document': name,
-            'metadata': {'path': file_names[name]}
-        } for name, emb in zip(batch_names, batch_embeddings)]
-        db_manager.store_batch("files_name", data_to_store_names)
-
-    print(f"{len(unique_file_names)} nomes de arquivos únicos indexados.")
-
-    # Nomes de pastas
-    folder_paths = {os.path.dirname(f) for f in all_files}
-    unique_folder_paths = list(folder_paths)
-    BATCH_SIZE_FOLDER = 5000
-    for i in range(0, len(unique_folder_paths), BATCH_SIZE_FOLDER):
-        batch_folders = unique_folder_paths[i:i+BATCH_SIZE_FOLDER]
-        batch_embeddings = embed_texts(batch_folders)
-        data_to_store_folders = [{
-            'id': make_id(path),
-            'embedding': emb,
-            'document': path,
-            'metadata': {'path': path}
-        } for path, emb in zip(batch_folders, batch_embeddings)]
-        db_manager.store_batch("folders", data_to_store_folders)
-
-    print(f"{len(unique_folder_paths)} pastas únicas indexadas.")
+                METRICS.failure("lexical_backfill", path, e)
+                extracted[path] = []
+        chunks = extracted[path]
+        if 0 <= chunk < len(chunks) and chunks[chunk][2].startswith(item['document']):
+            item['document'] = chunks[chunk][2]
+
+def resolve_shard(root_folder, shard=None):
+    """Registra `root_folder` em `shard`, se informado; senão, retorna o shard que já contém a pasta (ou None)."""
+    if shard:
+        register_shard(shard, root_folder)
+        return shard
+    return shard_for(root_folder)
+
+def build_shards(names=None, parallel=2, extra_args=()):
+    """
+    Constrói (ou atualiza, de forma incremental) os shards registrados, `parallel`
+    de cada vez, cada um em um processo `index.py` próprio com seu ProcessPool e
+    seu modelo. As raízes de um mesmo shard são indexadas em sequência. A saída
+    de cada processo vai para `build.log` na pasta do shard.
+    Retorna {shard: código de saída} (0 = sucesso).
+    """
+    registry = load_registry()
+    names = names or list(registry)
+    unknown = [name for name in names if name not in registry]
+    if unknown:
+        raise ValueError(f"Shards não registrados: {', '.join(unknown)}")
+
+    def build(name):
+        store_paths(name, registry)  # cria a pasta do shard
+        log_path = os.path.join(registry[name]["dir"], "build.log")
+        start = time.perf_counter()
+        with open(log_path, "a", encoding="utf-8") as log:
+            for root in registry[name]["roots"]:
+                cmd = [sys.executable, os.path.abspath(__file__), root, "--shard", name, *extra_args]
+                code = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT).returncode
+                if code:
+                    print(f"[{name}] falhou ao indexar '{root}' (código {code}); veja '{log_path}'.")
+                    return name, code
+        print(f"[{name}] {len(registry[name]['roots'])} pasta(s) indexada(s) em {time.perf_counter() - start:.1f}s.")
+        return name, 0
+
+    print(f"Construindo {len(names)} shard(s), {parallel} por vez...")
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as pool:
+        return dict(pool.map(build, names))
+
+def benchmark_embeddings(root_folder, samples=500, backends=BACKENDS):
+    """Mede textos/s e tokens/s de cada backend de embeddings com trechos reais da pasta."""
+    texts = []
+    for _, entries in scan_tree(os.path.abspath(root_folder)):
+        for path, _, _ in entries or []:
+            texts.extend(text for _, _, text in chunk_text(read_file_content(path, use_ocr=False)))
+            if len(texts) >= samples:
+                break
+        if len(texts) >= samples:
+            break
+    texts = texts[:samples]
+    if not texts:
+        print("Nenhum texto encontrado para o benchmark.")
+        return {}
+    print(f"Benchmark de embeddings com {len(texts)} trechos...")
+    resultados = benchmark_backends(texts, backends)
+    for backend, r in resultados.items():
+        print(f"{backend:<10} {r['docs_per_sec']:10.1f} textos/s {r['tokens_per_sec']:12.1f} tokens/s")
+    return resultados
+
+def profile_file(path, out=None, top=25):
+    """
+    Extrai um único arquivo neste processo (sem o ProcessPool) sob o cProfile
+    e imprime as funções mais caras. Também serve para o py-spy:
+    `py-spy record -o perfil.svg -- python index.py --profile-file <arquivo>`.
+    """
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        _, _, chunks, _, _ = process_file_worker(path)
+        if isinstance(chunks, PendingPDF):
+            chunks = chunk_text(chunks.run_ocr())
+    finally:
+        profiler.disable()
+    print(f"'{path}': {len(chunks)} trechos em {time.perf_counter() - start:.2f}s")
+    for f in METRICS.snapshot()["failures"]:
+        print(f"  falha [{f['stage']}] {f['reason']}")
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
+    if out:
+        profiler.dump_stats(out)
+        print(f"Perfil gravado em '{out}' (abra com snakeviz ou pstats).")
+
+def watch_main(argv):
+    from config import WATCH_DEBOUNCE_S
+    from watcher import watch_folder
+    parser = argparse.ArgumentParser(prog="index.py watch", description="Observa uma pasta e mantém o índice atualizado.")
+    parser.add_argument("root_folder", type=str, help="O caminho para a pasta raiz que você deseja observar.")
+    parser.add_argument("--batch-size", type=int, default=32, help="Número de arquivos para processar em cada lote.")
+    parser.add_argument("--hash", action="store_true", help="Compara também o hash do conteúdo para ignorar arquivos apenas \"tocados\".")
+    parser.add_argument("--embed-backend", choices=BACKENDS, default=EMBED_BACKEND, help="Backend do modelo de embeddings.")
+    parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_S, help="Segundos sem eventos antes de reindexar um caminho.")
+    parser.add_argument("--shard", help="Shard da pasta (padrão: o shard que já contém a pasta, se houver).")
+    args = parser.parse_args(argv)
 
-    print("\nIndexação finalizada!")
+    if not os.path.isdir(args.root_folder):
+        print(f"Erro: O diretório '{args.root_folder}' não foi encontrado.")
+        return
+    watch_folder(args.root_folder, batch_size=args.batch_size, use_hash=args.hash,
+                 embed_backend=args.embed_backend, debounce=args.debounce, shard=args.shard)
+
+def shards_main(argv):
+    parser = argparse.ArgumentParser(prog="index.py shards", description="Gerencia os shards do índice.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("list", help="Lista os shards registrados.")
+    add = sub.add_parser("add", help="Registra pastas em um shard (sem indexar).")
+    add.add_argument("nome", help="Nome do shard.")
+    add.add_argument("pastas", nargs="+", help="Pastas raiz do shard.")
+    build = sub.add_parser("build", help="Constrói os shards em paralelo, um processo por shard.")
+    build.add_argument("nomes", nargs="*", help="Shards a construir (padrão: todos).")
+    build.add_argument("--parallel", type=int, default=2, help="Shards construídos ao mesmo tempo.")
+    build.add_argument("--no-resume", action="store_true", help="Reindexa todos os arquivos dos shards.")
+    build.add_argument("--hash", action="store_true", help="Compara também o hash do conteúdo.")
+    build.add_argument("--batch-size", type=int, default=32, help="Número de arquivos para processar em cada lote.")
+    args = parser.parse_args(argv)
+
+    if args.comando == "list":
+        registry = load_registry()
+        if not registry:
+            print("Nenhum shard registrado.")
+        for nome, entry in registry.items():
+            print(f"{nome}: {entry['dir']}")
+            for root in entry["roots"]:
+                print(f"  {root}")
+    elif args.comando == "add":
+        for pasta in args.pastas:
+            if not os.path.isdir(pasta):
+                print(f"Erro: O diretório '{pasta}' não foi encontrado.")
+                return
+            try:
+                register_shard(args.nome, pasta)
+            except ValueError as e:
+                print(f"Erro: {e}")
+                sys.exit(1)
+        print(f"Shard '{args.nome}' registrado; construa com: python index.py shards build {args.nome}")
+    else:
+        extra = ["--batch-size", str(args.batch_size)]
+        extra += ["--no-resume"] if args.no_resume else []
+        extra += ["--hash"] if args.hash else []
+        resultados = build_shards(args.nomes, parallel=args.parallel, extra_args=extra)
+        if any(resultados.values()):
+            sys.exit(1)
 
 def main():
+    if sys.argv[1:2] == ["watch"]:
+        watch_main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["shards"]:
+        shards_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(description="Indexador de arquivos para busca semântica.")
-    parser.add_argument("root_folder", type=str, help="O caminho para a pasta raiz que você deseja indexar.")
+    parser.add_argument("root_folder", type=str, nargs="?", help="O caminho para a pasta raiz que você deseja indexar.")
     parser.add_argument("--no-resume", action="store_true", help="Força a reindexação de todos os arquivos, ignorando o cache.")
     parser.add_argument("--batch-size", type=int, default=32, help="Número de arquivos para processar em cada lote.")
+    parser.add_argument("--hash", action="store_true", help="Compara também o hash do conteúdo para ignorar arquivos apenas \"tocados\".")
+    
+    parser.add_argument("--embed-backend", choices=BACKENDS, default=EMBED_BACKEND, help="Backend do modelo de embeddings.")
+    parser.add_argument("--bench-embed", action="store_true", help="Só mede textos/s e tokens/s de cada backend com trechos da pasta.")
+    parser.add_argument("--bench-samples", type=int, default=500, help="Número de trechos usados no benchmark de embeddings.")
+    parser.add_argument("--metrics-out", default=METRICS_PATH, help="Arquivo para exportar as métricas da indexação.")
+    parser.add_argument("--metrics-format", choices=["jsonl", "prom"], default=METRICS_FORMAT, help="Formato das métricas: linha JSON ou texto do Prometheus.")
+    parser.add_argument("--profile-file", help="Perfila (cProfile) a extração de um único arquivo e sai.")
+    parser.add_argument("--profile-out", help="Com --profile-file, grava o perfil .prof neste arquivo.")
+    parser.add_argument("--shard", help="Indexa a pasta no shard informado (bancos próprios em SHARDS_DIR/<shard>).")
     
     args = parser.parse_args()
+
+    if args.profile_file:
+        profile_file(args.profile_file, out=args.profile_out)
+        return
+    if not args.root_folder:
+        parser.error("informe a pasta raiz (ou --profile-file)")
     
     if not os.path.isdir(args.root_folder):
         print(f"Erro: O diretório '{args.root_folder}' não foi encontrado.")
         return
 
-    index_folder(args.root_folder, batch_size=args.batch_size, resume=not args.no_resume)
+    if args.bench_embed:
+        benchmark_embeddings(args.root_folder, samples=args.bench_samples)
+        return
+
+    if args.shard:
+        try:
+            register_shard(args.shard, args.root_folder)
+        except ValueError as e:
+            print(f"Erro: {e}")
+            sys.exit(1)
+
+    index_folder(args.root_folder, batch_size=args.batch_size, resume=not args.no_resume,
+                 use_hash=args.hash, embed_backend=args.embed_backend,
+                 metrics_out=args.metrics_out, metrics_format=args.metrics_format, shard=args.shard)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,148 @@
+import os
+import re
+import sqlite3
+import threading
+
+from highlight import normalizar
+
+# ---------------- ÍNDICE LÉXICO (FTS5 / BM25) ----------------
+# Índice invertido com os mesmos trechos de conteúdo, nomes de arquivos e
+# pastas das coleções vetoriais. Encontra tokens exatos (números de nota,
+# CPF/CNPJ, códigos de arquivo) que a busca semântica costuma perder.
+# `lex_docs` guarda id/caminho/tipo (com índice por caminho para remoções) e
+# `lex_fts` guarda o texto, ligados pelo mesmo rowid.
+
+READ_BATCH_SIZE = 500
+
+# Consulta com cara de identificador: um único "token" com dígitos, como
+# 123.456.789-00, 12.345.678/0001-90, NF-2023-001 ou INV12345.
+IDENTIFICADOR_RE = re.compile(r"^(?=[^\s]*\d)[\w./\\-]{3,}$")
+
+def parece_identificador(consulta: str) -> bool:
+    """Indica se a consulta parece um código/identificador exato."""
+    return bool(IDENTIFICADOR_RE.match(consulta.strip()))
+
+# Filtro por texto da pesquisa: as palavras do filtro em sequência, sem
+# diferenciar maiúsculas e acentos, como a frase no FTS5 (unicode61 com
+# remove_diacritics). O Chroma e o SQLite sem FTS5 usam a expressão regular
+# equivalente. Filtro sem nenhuma palavra não casa com nada.
+VARIANTES = {"a": "aáàâãä", "e": "eéèêë", "i": "iíìîï", "o": "oóòôõö", "u": "uúùûü", "c": "cç", "n": "nñ"}
+
+def termos_do_filtro(filtro: str) -> list:
+    """Palavras do filtro de texto."""
+    return re.findall(r"\w+", filtro or "")
+
+def frase_do_filtro(filtro: str) -> str:
+    """Filtro como frase FTS5, ou "" se não tem palavras."""
+    termos = termos_do_filtro(filtro)
+    return '"' + " ".join(termos) + '"' if termos else ""
+
+def regex_do_filtro(filtro: str) -> str:
+    """Filtro como expressão regular (sintaxe comum ao `re` e ao Chroma), ou "" se não tem palavras."""
+    termos = [normalizar(t) for t in termos_do_filtro(filtro)]
+    if not termos:
+        return ""
+    letras = lambda t: "".join(f"[{VARIANTES[c]}]" if c in VARIANTES else re.escape(c) for c in t)
+    return r"(?i)\b" + r"\W+".join(letras(t) for t in termos) + r"\b"
+
+def montar_match(consulta: str) -> str:
+    """
+    Converte a consulta em expressão FTS5: frase exata para identificadores,
+    ou todos os termos (E lógico) para texto livre.
+    """
+    if parece_identificador(consulta):
+        return '"' + consulta.strip().replace('"', '""') + '"'
+    termos = re.findall(r"\w+", consulta)
+    return " ".join(f'"{t}"' for t in termos)
+
+class LexicalIndex:
+    """Índice léxico em SQLite FTS5, com ranking BM25."""
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS lex_docs (rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+                          "kind TEXT NOT NULL, path TEXT, start INTEGER)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_lex_docs_path ON lex_docs (kind, path)")
+        self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS lex_fts USING fts5("
+                          "text, tokenize='unicode61 remove_diacritics 2')")
+        self.conn.commit()
+
+    def upsert(self, kind, data):
+        """Indexa itens no formato de `store_batch` ({'id', 'document', 'metadata'})."""
+        if not data:
+            return
+        rows = [(item['id'], kind, item['metadata'].get('path', ''), item['metadata'].get('start'))
+                for item in data]
+        with self.lock:
+            self.conn.executemany(
+                "INSERT INTO lex_docs (id, kind, path, start) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET kind=excluded.kind, path=excluded.path, start=excluded.start", rows)
+            texts = {item['id']: item['document'] for item in data}
+            ids = list(texts)
+            for i in range(0, len(ids), READ_BATCH_SIZE):
+                part = ids[i:i+READ_BATCH_SIZE]
+                placeholders = ",".join("?" * len(part))
+                rowids = self.conn.execute(f"SELECT id, rowid FROM lex_docs WHERE id IN ({placeholders})", part)
+                self.conn.executemany("INSERT OR REPLACE INTO lex_fts (rowid, text) VALUES (?, ?)",
+                                      [(rowid, texts[id_val]) for id_val, rowid in rowids])
+            self.conn.commit()
+
+    def delete_paths(self, kind, paths):
+        """Remove as entradas de um tipo ligadas aos caminhos informados."""
+        if not paths:
+            return
+        with self.lock:
+            for i in range(0, len(paths), READ_BATCH_SIZE):
+                part = list(paths[i:i+READ_BATCH_SIZE])
+                placeholders = ",".join("?" * len(part))
+                where = f"kind = ? AND path IN ({placeholders})"
+                self.conn.execute(f"DELETE FROM lex_fts WHERE rowid IN (SELECT rowid FROM lex_docs WHERE {where})",
+                                  [kind] + part)
+                self.conn.execute(f"DELETE FROM lex_docs WHERE {where}", [kind] + part)
+            self.conn.commit()
+
+    def buscar(self, consulta, kind, limit=10, filtro=None):
+        """
+        Retorna até `limit` entradas de um tipo, ordenadas por BM25, como
+        lista de {"id", "path", "score", "offset"} (score: BM25, menor é melhor).
+        `filtro` exige também a frase informada no texto. O texto não vem na
+        resposta: o snippet é montado só quando o resultado é exibido (`texto`).
+        """
+        match = montar_match(consulta)
+        if not match or (filtro and not termos_do_filtro(filtro)):
+            return []
+        if filtro:
+            match += " " + frase_do_filtro(filtro)
+        with self.lock:
+            try:
+                rows = self.conn.execute(
+                    "SELECT d.id, d.path, d.start, bm25(lex_fts) "
+                    "FROM lex_fts JOIN lex_docs d ON d.rowid = lex_fts.rowid "
+                    "WHERE lex_fts MATCH ? AND d.kind = ? ORDER BY bm25(lex_fts) LIMIT ?",
+                    (match, kind, limit)).fetchall()
+            except sqlite3.OperationalError as e:
+                print(f"Erro na busca léxica: {e}")
+                return []
+        return [{"id": id_val, "path": path, "score": score, "offset": start}
+                for id_val, path, start, score in rows]
+
+    def texto(self, id_val):
+        """Texto completo indexado de uma entrada, ou None."""
+        with self.lock:
+            row = self.conn.execute("SELECT f.text FROM lex_fts f JOIN lex_docs d ON d.rowid = f.rowid "
+                                    "WHERE d.id = ?", (id_val,)).fetchone()
+        return row[0] if row else None
+
+    def has_paths(self, root_folder) -> bool:
+        """Indica se há alguma entrada (de qualquer tipo) em `root_folder` ou dentro dela."""
+        prefix = os.path.join(root_folder, "")
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM lex_docs WHERE path = ? OR (path >= ? AND path < ?) LIMIT 1",
+                                    (root_folder, prefix, prefix + "\U0010ffff")).fetchone()
+        return row is not None
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,125 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+# ---------------- MANIFESTO DE ARQUIVOS ----------------
+# Guarda, para cada arquivo indexado, o tamanho, o mtime_ns e (opcionalmente)
+# o hash do conteúdo. A reindexação compara o disco com o manifesto pasta por
+# pasta, então só arquivos novos/alterados são relidos e embeddados.
+
+HASH_BLOCK_SIZE = 1024 * 1024  # leitura em blocos de 1 MB para o hash
+
+def file_hash(path: str) -> str:
+    """Calcula o SHA-1 do conteúdo de um arquivo, lendo em blocos."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def scan_tree(root_folder):
+    """
+    Percorre a árvore de forma preguiçosa, uma pasta por vez.
+    Gera (pasta, [(caminho, tamanho, mtime_ns), ...]) para cada pasta.
+    Se a pasta não puder ser listada, gera (pasta, None) para que o chamador
+    não trate os arquivos dela como removidos.
+    """
+    pending = [root_folder]
+    while pending:
+        current = pending.pop()
+        entries = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file():
+                            st = entry.stat()
+                            entries.append((entry.path, st.st_size, st.st_mtime_ns))
+                    except OSError as e:
+                        print(f"Erro ao ler '{entry.path}': {e}")
+        except OSError as e:
+            print(f"Erro ao listar a pasta '{current}': {e}")
+            yield current, None
+            continue
+        yield current, entries
+
+def list_files(dir_path):
+    """
+    Lista só os arquivos de uma pasta, sem descer nas subpastas.
+    Retorna [(caminho, tamanho, mtime_ns), ...] ou None se a pasta não puder ser listada.
+    """
+    entries = []
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        st = entry.stat()
+                        entries.append((entry.path, st.st_size, st.st_mtime_ns))
+                except OSError as e:
+                    print(f"Erro ao ler '{entry.path}': {e}")
+    except OSError as e:
+        print(f"Erro ao listar a pasta '{dir_path}': {e}")
+        return None
+    return entries
+
+class FileManifest:
+    """
+    Manifesto persistente (SQLite) dos arquivos já indexados.
+    Cada linha guarda caminho, pasta, tamanho, mtime_ns e hash opcional.
+    É compartilhado pelos processos que constroem shards em paralelo (cada um
+    só lê e grava as pastas das suas raízes), por isso espera o lock de escrita.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, dir TEXT NOT NULL, size INTEGER, "
+            "mtime_ns INTEGER, hash TEXT, indexed_at REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_files_dir ON files (dir)")
+        self.conn.commit()
+
+    def known_dirs(self, root_folder) -> set:
+        """Retorna as pastas do manifesto que estão dentro de `root_folder`."""
+        prefix = os.path.join(root_folder, "")
+        # Faixa de prefixo para usar o índice por pasta em vez de varrer a tabela
+        rows = self.conn.execute("SELECT DISTINCT dir FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)",
+                                 (root_folder, prefix, prefix + "\U0010ffff"))
+        return {d for (d,) in rows}
+
+    def has_dir(self, dir_path) -> bool:
+        """Indica se a pasta tem arquivos no manifesto."""
+        return self.conn.execute("SELECT 1 FROM files WHERE dir = ? LIMIT 1", (dir_path,)).fetchone() is not None
+
+    def dir_entries(self, dir_path) -> dict:
+        """Retorna {caminho: (tamanho, mtime_ns, hash)} dos arquivos de uma pasta."""
+        rows = self.conn.execute("SELECT path, size, mtime_ns, hash FROM files WHERE dir = ?", (dir_path,))
+        return {path: (size, mtime_ns, h) for path, size, mtime_ns, h in rows}
+
+    def update(self, rows):
+        """Insere/atualiza linhas (caminho, tamanho, mtime_ns, hash)."""
+        if not rows:
+            return
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO files (path, dir, size, mtime_ns, hash, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(path, os.path.dirname(path), size, mtime_ns, h, now) for path, size, mtime_ns, h in rows]
+        )
+        self.conn.commit()
+
+    def remove(self, paths):
+        """Remove caminhos do manifesto."""
+        if not paths:
+            return
+        self.conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in paths])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# ---------------- MÉTRICAS ----------------
+# Contadores e cronômetros por etapa da indexação e da pesquisa, com rótulos
+# (ex.: extensão do arquivo, coleção). Cada processo tem o seu `METRICS`; os
+# workers do ProcessPool devolvem o que mediram (`drain`) junto com o
+# resultado e o processo principal soma (`merge`).
+# Exporta como uma linha JSON por execução ou como arquivo texto no formato
+# do Prometheus (para o node_exporter textfile collector).
+
+MAX_FAILURES = 1000     # falhas guardadas com motivo (as demais só contam)
+PROM_PREFIX = "guardian_"
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}   # (nome, rótulos) -> valor
+            self.timers = {}     # (nome, rótulos) -> [quantidade, soma, máximo]
+            self.failures = []   # {"stage", "path", "reason"}
+            self.started = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            t = self.timers.setdefault(key, [0, 0.0, 0.0])
+            t[0] += 1
+            t[1] += seconds
+            t[2] = max(t[2], seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Cronometra o bloco e registra em `name` (também quando ele lança exceção)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def failure(self, stage, path, error):
+        """Registra uma falha com o motivo (tipo e mensagem da exceção)."""
+        reason = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+        self.inc("failures", stage=stage)
+        with self.lock:
+            if len(self.failures) < MAX_FAILURES:
+                self.failures.append({"stage": stage, "path": path, "reason": reason})
+
+    # ---------- transporte entre processos ----------
+    def drain(self):
+        """Retorna e zera o que foi medido (usado pelos workers)."""
+        with self.lock:
+            data = (self.counters, self.timers, self.failures)
+            self.counters, self.timers, self.failures = {}, {}, []
+        return data
+
+    def merge(self, data):
+        if not data:
+            return
+        counters, timers, failures = data
+        with self.lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, (count, total, peak) in timers.items():
+                t = self.timers.setdefault(key, [0, 0.0, 0.0])
+                t[0] += count
+                t[1] += total
+                t[2] = max(t[2], peak)
+            self.failures.extend(failures[:max(MAX_FAILURES - len(self.failures), 0)])
+
+    # ---------- leitura e exportação ----------
+    @staticmethod
+    def _prom_labels(labels):
+        if not labels:
+            return ""
+        escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+    @staticmethod
+    def _name(name, labels):
+        if not labels:
+            return name
+        return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+    def total(self, name, kind="counter"):
+        """Soma de um contador (ou do tempo de um cronômetro) em todos os rótulos."""
+        with self.lock:
+            if kind == "counter":
+                return sum(v for (n, _), v in self.counters.items() if n == name)
+            return sum(t[1] for (n, _), t in self.timers.items() if n == name)
+
+    def snapshot(self, **extra):
+        with self.lock:
+            data = {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "elapsed_seconds": round(time.time() - self.started, 3),
+                "counters": {self._name(n, l): v for (n, l), v in sorted(self.counters.items())},
+                "timers": {self._name(n, l): {"count": c, "seconds": round(s, 4), "max_seconds": round(m, 4)}
+                           for (n, l), (c, s, m) in sorted(self.timers.items())},
+                "failures": list(self.failures),
+            }
+        data.update(extra)
+        return data
+
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            by_name = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                by_name.setdefault(name, []).append((labels, value))
+            for name, series in by_name.items():
+                lines.append(f"# TYPE {PROM_PREFIX}{name}_total counter")
+                lines.extend(f"{PROM_PREFIX}{name}_total{self._prom_labels(l)} {v}" for l, v in series)
+            by_name = {}
+            for (name, labels), values in sorted(self.timers.items()):
+                by_name.setdefault(name, []).append((labels, values))
+            for name, series in by_name.items():
+                lines.append(f"# TYPE {PROM_PREFIX}{name} summary")
+                for l, (count, total, _) in series:
+                    lines.append(f"{PROM_PREFIX}{name}_count{self._prom_labels(l)} {count}")
+                    lines.append(f"{PROM_PREFIX}{name}_sum{self._prom_labels(l)} {total:.6f}")
+                lines.append(f"# TYPE {PROM_PREFIX}{name}_max gauge")
+                lines.extend(f"{PROM_PREFIX}{name}_max{self._prom_labels(l)} {m:.6f}" for l, (_, _, m) in series)
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, fmt="jsonl", **extra):
+        """Exporta: `jsonl` acrescenta uma linha ao arquivo; `prom` substitui o arquivo inteiro."""
+        if fmt == "prom":
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp, path)  # o coletor nunca lê um arquivo pela metade
+        else:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.snapshot(**extra), ensure_ascii=False) + "\n")
+
+METRICS = Metrics()
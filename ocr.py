@@ -0,0 +1,231 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+from config import (TESSERACT_CMD_PATH, OCR_DPI, OCR_MIN_PAGE_CHARS, OCR_MAX_PAGES_PER_FILE,
+                    OCR_MAX_SECONDS_PER_FILE, OCR_CACHE_PATH)
+from manifest import file_hash
+from metrics import METRICS
+
+# ---------------- OCR ----------------
+# O OCR é a etapa mais cara da indexação, então as decisões são por página:
+# só vão para o Tesseract as páginas de PDF sem camada de texto, cada uma
+# rasterizada sozinha (na DPI configurada) quando chega a vez dela. O texto
+# reconhecido fica em um cache SQLite indexado pelo hash do conteúdo da página,
+# então reindexar um PDF (ou outra cópia dele) não repete o OCR.
+# Cada arquivo tem um limite de páginas e de tempo de OCR.
+
+_cache = None  # uma conexão por processo (os workers do ProcessPool abrem a sua)
+
+def get_ocr():
+    """Importa o pytesseract sob demanda, configurando o Tesseract se o caminho foi fornecido."""
+    import pytesseract
+    if TESSERACT_CMD_PATH and os.path.exists(TESSERACT_CMD_PATH):
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD_PATH
+    return pytesseract
+
+class OCRCache:
+    """Cache persistente (SQLite) do texto reconhecido, por chave de conteúdo."""
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS ocr_pages (key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL)")
+        self.conn.commit()
+
+    def get_many(self, keys) -> dict:
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            part = keys[i:i+500]
+            placeholders = ",".join("?" * len(part))
+            found.update(self.conn.execute(f"SELECT key, text FROM ocr_pages WHERE key IN ({placeholders})", part))
+        return found
+
+    def put(self, key, text):
+        self.conn.execute("INSERT OR REPLACE INTO ocr_pages (key, text, created_at) VALUES (?, ?, ?)",
+                          (key, text, time.time()))
+        self.conn.commit()
+
+def get_ocr_cache():
+    global _cache
+    if _cache is None:
+        _cache = OCRCache(OCR_CACHE_PATH)
+    return _cache
+
+def needs_ocr(text) -> bool:
+    """Página sem camada de texto (ou só com alguns caracteres soltos)."""
+    return len((text or "").strip()) < OCR_MIN_PAGE_CHARS
+
+def page_fingerprint(page):
+    """
+    Hash do conteúdo de uma página do PDF: o fluxo de desenho mais as imagens
+    que ele usa (em páginas escaneadas o fluxo é igual em todas; a imagem não).
+    Retorna None se a página não puder ser lida.
+    """
+    try:
+        h = hashlib.sha1()
+        contents = page.get_contents()
+        if contents is not None:
+            h.update(contents.get_data())
+        resources = page.get("/Resources")
+        xobjects = resources.get_object().get("/XObject") if resources else None
+        if xobjects:
+            xobjects = xobjects.get_object()
+            for name in sorted(xobjects):
+                h.update(xobjects[name].get_object().get_data())
+        return h.hexdigest()
+    except Exception:
+        return None
+
+def ocr_key(fingerprint) -> str:
+    """Chave do cache: o texto reconhecido depende também da DPI usada."""
+    return hashlib.sha1(f"{OCR_DPI}:{fingerprint}".encode("utf-8")).hexdigest()
+
+def read_pdf_pages(file_path):
+    """
+    Lê a camada de texto de cada página e prepara o OCR das que não têm texto.
+    Retorna (textos por página, [(número da página, chave do cache), ...]);
+    páginas já reconhecidas antes vêm preenchidas do cache e ficam fora da lista.
+    """
+    from PyPDF2 import PdfReader
+    try:
+        reader = PdfReader(file_path)
+        pages = list(reader.pages)
+    except Exception as e:
+        METRICS.failure("extract", file_path, e)
+        return [], []
+
+    texts, pending = [], []
+    whole_file = None
+    for page_no, page in enumerate(pages):
+        try:
+            text = page.extract_text() or ""
+        except Exception as e:
+            METRICS.failure("extract", f"{file_path}#p{page_no + 1}", e)
+            text = ""
+        texts.append(text)
+        if not needs_ocr(text):
+            continue
+        fingerprint = page_fingerprint(page)
+        if fingerprint is None:
+            # Sem o conteúdo da página, usa o hash do arquivo inteiro + número da página
+            whole_file = whole_file or file_hash(file_path)
+            fingerprint = f"{whole_file}#{page_no}"
+        pending.append((page_no, ocr_key(fingerprint)))
+
+    if pending:
+        cached = get_ocr_cache().get_many(key for _, key in pending)
+        for page_no, key in pending:
+            if key in cached:
+                texts[page_no] = cached[key]
+        METRICS.inc("ocr_pages_cached", len(pending) - sum(key not in cached for _, key in pending))
+        pending = [(page_no, key) for page_no, key in pending if key not in cached]
+        if len(pending) > OCR_MAX_PAGES_PER_FILE:
+            print(f"OCR limitado a {OCR_MAX_PAGES_PER_FILE} de {len(pending)} páginas em '{file_path}'.")
+            METRICS.inc("ocr_pages_skipped", len(pending) - OCR_MAX_PAGES_PER_FILE)
+            pending = pending[:OCR_MAX_PAGES_PER_FILE]
+    return texts, pending
+
+class PendingPDF:
+    """PDF já lido pelo worker, com páginas esperando OCR em outros processos."""
+    def __init__(self, path, texts, pending):
+        self.path = path
+        self.texts = texts
+        self.pending = pending
+        self.remaining = len(pending)
+        self.timed_out = False
+        self.errors = 0          # páginas em que o OCR falhou (não são refeitas na próxima execução)
+        self.ocr_started = None  # time.time() em que a primeira página começou o OCR
+
+    def set_page(self, page_no, text, error=False):
+        """
+        Guarda o texto de uma página; retorna True quando todas terminaram.
+        Texto None é página não reconhecida: por erro do OCR (`error`) ou
+        por falta de tempo, o único caso que faz o arquivo ser relido.
+        """
+        if error:
+            self.errors += 1
+        elif text is None:
+            self.timed_out = True
+        else:
+            self.texts[page_no] = text
+        self.remaining -= 1
+        return self.remaining == 0
+
+    def text(self):
+        return "\n".join(self.texts)
+
+    def page_started(self, started):
+        """Registra o início do OCR de uma página; o prazo do arquivo conta da primeira."""
+        self.ocr_started = started if self.ocr_started is None else min(self.ocr_started, started)
+
+    def out_of_time(self):
+        """Indica se o OCR do arquivo passou de OCR_MAX_SECONDS_PER_FILE desde que começou."""
+        return self.ocr_started is not None and time.time() > self.ocr_started + OCR_MAX_SECONDS_PER_FILE
+
+    def run_ocr(self):
+        """Faz o OCR das páginas pendentes em sequência, neste processo, e retorna o texto."""
+        deadline = ocr_deadline()
+        for page_no, key in self.pending:
+            error = False
+            try:
+                _, text = ocr_pdf_page(self.path, page_no, key, deadline)
+            except Exception as e:
+                METRICS.failure("ocr", f"{self.path}#p{page_no + 1}", e)
+                text, error = None, True
+            self.set_page(page_no, text, error)
+        self.report()
+        return self.text()
+
+    def report(self, retry=False):
+        """Avisa das páginas que ficaram sem texto."""
+        if self.timed_out:
+            print(f"OCR incompleto em '{self.path}' (tempo esgotado)"
+                  + ("; será relido na próxima execução." if retry else "."))
+        if self.errors:
+            print(f"OCR falhou em {self.errors} página(s) de '{self.path}'; o arquivo fica sem o texto delas.")
+
+def ocr_pdf_page(file_path, page_no, key, deadline=None):
+    """
+    Rasteriza e reconhece uma única página (numerada a partir de 0).
+    Retorna (página, texto), com texto None se o prazo do arquivo já passou.
+    """
+    if deadline is not None and time.time() > deadline:
+        METRICS.inc("ocr_pages_timed_out")
+        return page_no, None
+    from pdf2image import convert_from_path
+    with METRICS.timer("ocr_rasterize_seconds"):
+        images = convert_from_path(file_path, dpi=OCR_DPI, first_page=page_no + 1, last_page=page_no + 1)
+    with METRICS.timer("ocr_page_seconds"):
+        text = "".join(get_ocr().image_to_string(img) or "" for img in images)
+    METRICS.inc("ocr_pages")
+    get_ocr_cache().put(key, text)
+    return page_no, text
+
+def ocr_deadline():
+    """Prazo (time.time) para terminar o OCR de um arquivo."""
+    return time.time() + OCR_MAX_SECONDS_PER_FILE
+
+def read_pdf(file_path, use_ocr=True):
+    """Lê um PDF inteiro, com OCR página a página (em sequência) onde falta texto."""
+    texts, pending = read_pdf_pages(file_path)
+    if use_ocr and pending:
+        return PendingPDF(file_path, texts, pending).run_ocr()
+    return "\n".join(texts)
+
+def ocr_image(file_path):
+    """Reconhece o texto de uma imagem, usando o cache pelo hash do arquivo."""
+    key = hashlib.sha1(f"img:{file_hash(file_path)}".encode("utf-8")).hexdigest()
+    cache = get_ocr_cache()
+    cached = cache.get_many([key])
+    if key in cached:
+        METRICS.inc("ocr_images_cached")
+        return cached[key]
+    from PIL import Image
+    with Image.open(file_path) as img, METRICS.timer("ocr_image_seconds"):
+        text = get_ocr().image_to_string(img) or ""
+    METRICS.inc("ocr_images")
+    cache.put(key, text)
+    return text
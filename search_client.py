@@ -0,0 +1,56 @@
+import json
+import threading
+import time
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from config import TOP_K_DEFAULT
+
+# ---------------- CLIENTE DO SERVIDOR DE PESQUISA ----------------
+# Mesma interface que a interface gráfica usa de ai_utils (pesquisar_chroma,
+# carregar_snippet, aquecer, esta_pronto, tempos_inicializacao), mas as pesquisas vão para o
+# servidor local (server.py): o cliente não carrega modelo nem índice.
+
+HEALTH_POLL_S = 0.5   # intervalo entre verificações enquanto o servidor carrega
+TIMEOUT_S = 30        # tempo máximo de uma pesquisa
+
+class RemoteSearch:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+        self.pronto = False
+        self.tempos_inicializacao = {}
+
+    def _get(self, path, params=None, timeout=TIMEOUT_S):
+        url = f"{self.url}{path}" + (f"?{urlencode(params)}" if params else "")
+        with urlopen(url, timeout=timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+    def pesquisar_chroma(self, consulta, top_k=TOP_K_DEFAULT, tipo="both", filtro=None):
+        params = {"q": consulta, "top_k": top_k, "tipo": tipo}
+        if filtro:
+            params["filtro"] = filtro
+        return self._get("/search", params)["resultados"]
+
+    def carregar_snippet(self, resultado, consulta):
+        params = {campo: resultado[campo] for campo in ("id", "path", "origem") if resultado.get(campo)}
+        params["q"] = consulta
+        return self._get("/snippet", params)["snippet"]
+
+    def aquecer(self):
+        """Acompanha em segundo plano até o servidor ter modelo e índice carregados."""
+        def acompanhar():
+            while not self.pronto:
+                try:
+                    status = self._get("/health", timeout=2)
+                    self.tempos_inicializacao.update(status.get("tempos", {}))
+                    self.pronto = status.get("pronto", False)
+                except OSError:
+                    pass  # servidor ainda não subiu
+                if not self.pronto:
+                    time.sleep(HEALTH_POLL_S)
+        thread = threading.Thread(target=acompanhar, daemon=True)
+        thread.start()
+        return [thread]
+
+    def esta_pronto(self) -> bool:
+        return self.pronto
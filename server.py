@@ -0,0 +1,221 @@
+import json
+import time
+import queue
+import asyncio
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import ai_utils
+from ai_utils import (pesquisar_chroma, carregar_snippet, get_colecoes, get_lexico, embed_queries, esta_pronto,
+                      tempos_inicializacao)
+from config import (SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_CACHE_SIZE, SERVER_CACHE_TTL_S,
+                    QUERY_BATCH_WINDOW_MS, QUERY_BATCH_MAX, TOP_K_DEFAULT)
+from metrics import METRICS
+
+# ---------------- SERVIDOR LOCAL DE PESQUISA ----------------
+# Um processo mantém o modelo e o índice carregados e atende as pesquisas por
+# HTTP (asyncio, só biblioteca padrão), então as estações não pagam a memória
+# e a partida a frio do modelo. As pesquisas rodam em um pool de threads; as
+# consultas que chegam juntas são embeddadas em uma única chamada ao modelo
+# (QueryBatcher) e resultados repetidos saem de um cache LRU com validade.
+#
+#   GET /search?q=...&top_k=5&tipo=both[&filtro=...]  -> {"resultados", "cache", "segundos"}
+#   GET /snippet?q=...&id=...&path=...&origem=...     -> {"snippet": {"texto", "destaques"}} (ao exibir um resultado)
+#   GET /health                                       -> {"pronto", "tempos", "cache"}
+#   GET /metrics                                      -> métricas no formato do Prometheus
+
+TIPOS = ("arquivo", "pasta", "both", "conteudo", "tudo")
+ORIGENS = ("conteudo", "arquivo", "pasta")
+MAX_TOP_K = 500
+
+class QueryBatcher:
+    """
+    Junta as consultas pedidas por threads diferentes dentro de uma janela
+    curta (ou enquanto o modelo está ocupado) em uma chamada a `encode_fn`.
+    """
+    def __init__(self, encode_fn, window_s=QUERY_BATCH_WINDOW_MS / 1000, max_batch=QUERY_BATCH_MAX):
+        self.encode_fn = encode_fn
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def encode(self, texto):
+        future = Future()
+        self.queue.put((texto, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.window_s
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            textos = list(dict.fromkeys(texto for texto, _ in batch))
+            try:
+                vetores = dict(zip(textos, self.encode_fn(textos)))
+                for texto, future in batch:
+                    future.set_result(vetores[texto])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            METRICS.inc("search_embed_batches")
+            METRICS.inc("search_embed_batched_queries", len(batch))
+
+class ResultCache:
+    """Cache LRU com validade (segundos) dos resultados de pesquisa. Usado só na thread do asyncio."""
+    def __init__(self, max_items=SERVER_CACHE_SIZE, ttl=SERVER_CACHE_TTL_S):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.items = OrderedDict()  # chave -> (expira_em, resultado)
+
+    def get(self, key):
+        item = self.items.get(key)
+        if item is None:
+            return None
+        if item[0] < time.monotonic():
+            del self.items[key]
+            return None
+        self.items.move_to_end(key)
+        return item[1]
+
+    def put(self, key, value):
+        self.items[key] = (time.monotonic() + self.ttl, value)
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+
+class SearchServer:
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, workers=SERVER_WORKERS,
+                 cache_size=SERVER_CACHE_SIZE, cache_ttl=SERVER_CACHE_TTL_S):
+        self.host = host
+        self.port = port
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.cache = ResultCache(cache_size, cache_ttl)
+        self.inflight = {}  # chave -> future da pesquisa em andamento (consultas iguais esperam a mesma)
+        ai_utils.query_batcher = QueryBatcher(embed_queries)
+
+    @staticmethod
+    def warm():
+        """Carrega índice e modelo e faz uma consulta de aquecimento."""
+        get_colecoes()
+        get_lexico()
+        embed_queries(["aquecimento"])
+
+    async def search(self, consulta, top_k, tipo, filtro):
+        key = (consulta, top_k, tipo, filtro)
+        resultado = self.cache.get(key)
+        if resultado is not None:
+            METRICS.inc("server_cache_hits")
+            return resultado, True
+        future = self.inflight.get(key)
+        if future is not None:
+            METRICS.inc("server_coalesced")
+            return await asyncio.shield(future), True
+        METRICS.inc("server_cache_misses")
+        future = asyncio.get_running_loop().run_in_executor(self.pool, pesquisar_chroma, consulta, top_k, tipo, filtro)
+        self.inflight[key] = future
+        try:
+            resultado = await future
+            self.cache.put(key, resultado)
+        finally:
+            self.inflight.pop(key, None)
+        return resultado, False
+
+    async def route(self, method, path, params):
+        """Retorna (status, corpo, content-type)."""
+        if method != "GET":
+            return 405, {"erro": "use GET"}, "application/json"
+        if path == "/health":
+            return 200, {"pronto": esta_pronto(), "tempos": tempos_inicializacao, "cache": len(self.cache.items)}, \
+                "application/json"
+        if path == "/metrics":
+            return 200, METRICS.to_prometheus(), "text/plain; version=0.0.4"
+        if path == "/snippet":
+            return await self.snippet(params)
+        if path != "/search":
+            return 404, {"erro": f"caminho desconhecido: {path}"}, "application/json"
+
+        consulta = params.get("q", [""])[0].strip()
+        tipo = params.get("tipo", ["both"])[0]
+        filtro = params.get("filtro", [None])[0] or None
+        try:
+            top_k = int(params.get("top_k", [TOP_K_DEFAULT])[0])
+        except ValueError:
+            top_k = 0
+        if not consulta or tipo not in TIPOS or not 1 <= top_k <= MAX_TOP_K:
+            return 400, {"erro": f"informe q, tipo ({', '.join(TIPOS)}) e top_k entre 1 e {MAX_TOP_K}"}, \
+                "application/json"
+        inicio = time.perf_counter()
+        with METRICS.timer("server_request_seconds"):
+            resultados, cache = await self.search(consulta, top_k, tipo, filtro)
+        return 200, {"resultados": resultados, "cache": cache,
+                     "segundos": round(time.perf_counter() - inicio, 4)}, "application/json"
+
+    async def snippet(self, params):
+        """Snippet de um resultado de /search, montado só quando a interface o exibe."""
+        resultado = {campo: params[campo][0] for campo in ("id", "path", "origem") if campo in params}
+        consulta = params.get("q", [""])[0].strip()
+        if not consulta or resultado.get("origem", "conteudo") not in ORIGENS or \
+                not ("id" in resultado or "path" in resultado):
+            return 400, {"erro": f"informe q, id ou path e origem ({', '.join(ORIGENS)})"}, "application/json"
+        snippet = await asyncio.get_running_loop().run_in_executor(self.pool, carregar_snippet, resultado, consulta)
+        return 200, {"snippet": snippet}, "application/json"
+
+    async def handle(self, reader, writer):
+        """Uma requisição HTTP/1.1 por conexão (Connection: close)."""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # cabeçalhos não são usados
+            if len(request_line) < 2:
+                status, body, ctype = 400, {"erro": "requisição inválida"}, "application/json"
+            else:
+                url = urlsplit(request_line[1])
+                status, body, ctype = await self.route(request_line[0], url.path, parse_qs(url.query))
+        except Exception as e:
+            print(f"Erro ao atender requisição: {e}")
+            METRICS.failure("server", "", e)
+            status, body, ctype = 500, {"erro": str(e)}, "application/json"
+        if not isinstance(body, str):
+            body = json.dumps(body, ensure_ascii=False, default=float)
+        data = body.encode("utf-8")
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}.get(status, "Error")
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {ctype}; charset=utf-8\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"Servidor de pesquisa em http://{self.host}:{self.port} (carregando modelo e índice...)")
+        inicio = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(self.pool, self.warm)
+        print(f"Pronto em {time.perf_counter() - inicio:.1f}s.")
+        async with server:
+            await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de pesquisa (modelo e índice sempre carregados).")
+    parser.add_argument("--host", default=SERVER_HOST, help="Endereço de escuta.")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="Porta de escuta.")
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Pesquisas executadas ao mesmo tempo.")
+    parser.add_argument("--cache-size", type=int, default=SERVER_CACHE_SIZE, help="Resultados guardados no cache.")
+    parser.add_argument("--cache-ttl", type=float, default=SERVER_CACHE_TTL_S, help="Validade (s) de um resultado no cache.")
+    args = parser.parse_args()
+    servidor = SearchServer(args.host, args.port, args.workers, args.cache_size, args.cache_ttl)
+    try:
+        asyncio.run(servidor.serve())
+    except KeyboardInterrupt:
+        print("\nServidor encerrado.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import os
+import json
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+
+from config import SHARDS_PATH, SHARDS_DIR, CHROMA_DIR, SQLITE_DB_PATH, LEXICAL_DB_PATH
+
+# ---------------- SHARDS ----------------
+# Um shard é um conjunto de pastas raiz indexado em bancos próprios
+# (Chroma, fallback SQLite e índice léxico em SHARDS_DIR/<nome>). Cada shard
+# pode ser construído por um processo ou máquina diferente; o manifesto e o
+# cache de embeddings continuam compartilhados (as chaves são caminhos
+# absolutos e textos). Incluir um novo compartilhamento = construir um shard novo.
+# O registro fica em SHARDS_PATH: {"nome": {"roots": [...], "dir": ...}}.
+# O índice sem shard (CHROMA_DIR etc.) continua sendo o shard "padrão".
+# Na pesquisa, `ShardedCollection` e `ShardedLexicalIndex` consultam todos os
+# shards em paralelo e juntam o top-k pelo score, com a mesma interface de
+# uma coleção/índice único.
+
+DEFAULT_SHARD = "padrão"
+
+_fanout_pool = ThreadPoolExecutor(max_workers=8)
+
+def load_registry(path=SHARDS_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_registry(registry, path=SHARDS_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(registry, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def _inside(path, root):
+    return path == root or path.startswith(os.path.join(root, ""))
+
+def register_shard(name, root, path=SHARDS_PATH) -> dict:
+    """
+    Inclui `root` no shard `name` (criando o shard se preciso) e retorna a entrada.
+    Uma pasta só pode pertencer a um shard: raízes sobrepostas gerariam
+    resultados duplicados e remoções cruzadas no manifesto compartilhado.
+    """
+    root = os.path.abspath(root)
+    registry = load_registry(path)
+    for other, entry in registry.items():
+        if other == name:
+            continue
+        for r in entry["roots"]:
+            if _inside(root, r) or _inside(r, root):
+                raise ValueError(f"'{root}' se sobrepõe a '{r}', que já está no shard '{other}'.")
+    entry = registry.setdefault(name, {"roots": [], "dir": os.path.join(SHARDS_DIR, name)})
+    if root not in entry["roots"]:
+        entry["roots"].append(root)
+        save_registry(registry, path)
+    return entry
+
+def shard_for(path, registry=None):
+    """Nome do shard cujas raízes contêm `path`, ou None."""
+    path = os.path.abspath(path)
+    registry = load_registry() if registry is None else registry
+    for name, entry in registry.items():
+        if any(_inside(path, root) for root in entry["roots"]):
+            return name
+    return None
+
+def store_paths(name=None, registry=None) -> dict:
+    """Caminhos dos bancos de um shard (None ou DEFAULT_SHARD: o índice sem shard)."""
+    if name in (None, DEFAULT_SHARD):
+        return {"chroma": CHROMA_DIR, "sqlite": SQLITE_DB_PATH, "lexical": LEXICAL_DB_PATH}
+    registry = load_registry() if registry is None else registry
+    base = registry[name]["dir"] if name in registry else os.path.join(SHARDS_DIR, name)
+    os.makedirs(base, exist_ok=True)
+    return {"chroma": os.path.join(base, "chroma_db"), "sqlite": os.path.join(base, "embeddings_fallback.db"),
+            "lexical": os.path.join(base, "lexical_index.db")}
+
+def search_shards() -> list:
+    """
+    Shards consultados na pesquisa: os registrados e o índice sem shard, se existir.
+    Sem registro, só o índice sem shard (comportamento de antes dos shards).
+    """
+    registry = load_registry()
+    names = list(registry)
+    default = store_paths(DEFAULT_SHARD)
+    if not names or os.path.isdir(default["chroma"]) or os.path.exists(default["sqlite"]):
+        names.insert(0, DEFAULT_SHARD)
+    return [(name, store_paths(name, registry)) for name in names]
+
+class ShardedCollection:
+    """Coleção formada pela mesma coleção de vários shards (interface de consulta do Chroma)."""
+    def __init__(self, name, collections):
+        self.name = name
+        self.collections = collections
+
+    def count(self) -> int:
+        return sum(c.count() for c in self.collections)
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances"), **kwargs):
+        """Consulta os shards em paralelo e junta, por consulta, os `n_results` de menor distância."""
+        include = list(include)
+        if "distances" not in include:
+            include.append("distances")
+        respostas = list(_fanout_pool.map(
+            lambda c: c.query(query_embeddings=query_embeddings, n_results=n_results, include=include, **kwargs),
+            self.collections))
+        campos = ["ids"] + [c for c in ("documents", "metadatas", "distances") if c in include]
+        resultado = {campo: [] for campo in campos}
+        for i in range(len(query_embeddings)):
+            linhas = [tuple(r[campo][i][j] for campo in campos)
+                      for r in respostas for j in range(len(r["ids"][i]))]
+            melhores = heapq.nsmallest(n_results, linhas, key=lambda linha: linha[-1])
+            for pos, campo in enumerate(campos):
+                resultado[campo].append([linha[pos] for linha in melhores])
+        return resultado
+
+    def get(self, limit=None, offset=None, include=("documents", "metadatas"), **kwargs):
+        """Lê os shards em sequência, com limit/offset sobre o conjunto."""
+        resultado = {"ids": []}
+        pular = offset or 0
+        for c in self.collections:
+            if limit is not None and len(resultado["ids"]) >= limit:
+                break
+            total = c.count()
+            if pular >= total:
+                pular -= total
+                continue
+            restante = None if limit is None else limit - len(resultado["ids"])
+            parte = c.get(limit=restante, offset=pular, include=list(include), **kwargs)
+            pular = 0
+            for campo, valores in parte.items():
+                if campo == "ids" or campo in include:
+                    resultado.setdefault(campo, []).extend(list(valores))
+        return resultado
+
+class ShardedLexicalIndex:
+    """
+    Índices léxicos de vários shards consultados em paralelo. Os scores BM25
+    de índices diferentes usam estatísticas próprias, então a junção pelo
+    score é aproximada; a fusão por RRF só usa a posição.
+    """
+    def __init__(self, indexes):
+        self.indexes = indexes
+
+    def buscar(self, consulta, kind, limit=10, filtro=None):
+        listas = _fanout_pool.map(lambda idx: idx.buscar(consulta, kind, limit, filtro), self.indexes)
+        return heapq.nsmallest(limit, (hit for lista in listas for hit in lista), key=lambda hit: hit["score"])
+
+    def texto(self, id_val):
+        for idx in self.indexes:
+            texto = idx.texto(id_val)
+            if texto is not None:
+                return texto
+        return None
+
+    def close(self):
+        for idx in self.indexes:
+            idx.close()
@@ -0,0 +1,353 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+import numpy as np
+
+from lexical import frase_do_filtro, regex_do_filtro
+
+# ---------------- BANCO VETORIAL EM SQLITE (FALLBACK) ----------------
+# Cada coleção vira uma tabela com o embedding em BLOB e, quando o SQLite
+# tem FTS5, uma tabela de texto completo para filtrar por palavras.
+# Na consulta, os vetores são carregados de uma vez em uma matriz NumPy
+# contígua e a busca é força bruta vetorizada (argpartition) — a mesma
+# distância L2² do Chroma, então os scores são comparáveis.
+#
+# Tipos de vetor (escolhido na criação do banco e gravado nele):
+#   float32 — 4 bytes por dimensão, busca exata;
+#   float16 — 2 bytes por dimensão em disco, convertidos para float32 ao
+#             carregar a matriz (mesma velocidade de busca do float32);
+#   int8    — 1 byte por dimensão (escala por vetor) também na memória, para
+#             achar candidatos; os RERANK_FACTOR x k melhores são reordenados
+#             com a cópia float16 gravada em disco, lida só para esses candidatos.
+
+READ_BATCH_SIZE = 500  # linhas por SELECT ... IN (...)
+DTYPES = ("float32", "float16", "int8")
+RERANK_FACTOR = 4      # candidatos por resultado no modo int8
+SCAN_BLOCK_ROWS = 65536  # linhas convertidas para float32 por vez na busca em int8
+
+def fts5_available(conn) -> bool:
+    """Verifica se o SQLite foi compilado com FTS5."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts5_check USING fts5(x)")
+        conn.execute("DROP TABLE temp._fts5_check")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+def encode_vectors(embeddings, dtype):
+    """
+    Converte um lote de embeddings para gravação. Retorna, por vetor,
+    (blob, escala, norma², blob float16 do re-rank); escala, norma e
+    re-rank só existem no modo int8.
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+    if dtype != "int8":
+        return [(v.astype(dtype).tobytes(), None, None, None) for v in vectors]
+    peaks = np.abs(vectors).max(axis=1)
+    scales = np.where(peaks > 0, peaks / 127.0, 1.0).astype(np.float32)
+    quantized = np.rint(vectors / scales[:, None]).astype(np.int8)
+    norms = np.einsum("ij,ij->i", vectors, vectors)
+    exact = vectors.astype(np.float16)
+    return [(q.tobytes(), float(s), float(n), e.tobytes()) for q, s, n, e in zip(quantized, scales, norms, exact)]
+
+def decode_vector(blob, dtype, exact=None):
+    """Vetor float32 de uma linha (no modo int8, a partir da cópia float16)."""
+    if dtype == "int8":
+        return np.frombuffer(exact, dtype=np.float16).astype(np.float32)
+    return np.frombuffer(blob, dtype=dtype).astype(np.float32)
+
+class SQLiteVectorStore:
+    """
+    Banco de vetores em um arquivo SQLite, com uma tabela por coleção.
+    `dtype` vale para bancos novos (padrão float32); um banco existente
+    mantém o tipo com que foi criado. Com `lexical_path` (índice léxico do
+    mesmo índice, que tem o texto completo), o filtro por texto é resolvido
+    nele, em um JOIN com a tabela de vetores: no armazenamento compacto os
+    trechos guardados aqui são resumidos.
+    """
+    def __init__(self, db_path, dtype=None, lexical_path=None):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.fts = fts5_available(self.conn)
+        if not self.fts:
+            self.conn.create_function("REGEXP", 2, lambda padrao, texto: texto is not None
+                                      and re.search(padrao, texto) is not None, deterministic=True)
+        self.dtype = self._stored_dtype(dtype)
+        self.lexical = bool(lexical_path and self.fts and os.path.exists(lexical_path))
+        if self.lexical:
+            self.conn.execute("ATTACH DATABASE ? AS lex", (lexical_path,))
+        self.collections = {}
+
+    def _stored_dtype(self, dtype):
+        if dtype is not None and dtype not in DTYPES:
+            raise ValueError(f"Tipo de vetor inválido: {dtype} (use {', '.join(DTYPES)})")
+        with self.lock:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS vec_config (key TEXT PRIMARY KEY, value TEXT)")
+            row = self.conn.execute("SELECT value FROM vec_config WHERE key = 'dtype'").fetchone()
+            if row is None:
+                # bancos anteriores a vec_config só tinham float32
+                legacy = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name LIKE 'vec\\_%' "
+                                           "ESCAPE '\\' AND name != 'vec_config'").fetchone()
+                stored = "float32" if legacy or dtype is None else dtype
+                self.conn.execute("INSERT INTO vec_config (key, value) VALUES ('dtype', ?)", (stored,))
+                self.conn.commit()
+            else:
+                stored = row[0]
+        if dtype is not None and stored != dtype:
+            print(f"AVISO: '{self.db_path}' guarda vetores {stored}; ignorando o tipo {dtype} pedido.")
+        return stored
+
+    def get_or_create_collection(self, name):
+        with self.lock:
+            if name not in self.collections:
+                self.collections[name] = SQLiteCollection(self, name)
+            return self.collections[name]
+
+class SQLiteCollection:
+    """
+    Coleção do fallback SQLite. `query` segue a mesma interface do Chroma
+    (query_embeddings, n_results, include, where_document={"$contains": ...}),
+    então a pesquisa usa o fallback sem tratamento especial.
+    """
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.table = f"vec_{name}"
+        self.fts_table = f"vec_{name}_fts"
+        self._matrix = None      # (n, dim) float32 (int8 no modo int8)
+        self._scales = None      # escala de cada linha (int8)
+        self._norms = None       # ||v||² de cada linha
+        self._rowids = None      # rowids ordenados, alinhados com a matriz
+        self._version = None
+        self._dirty = True
+        conn = store.conn
+        with store.lock:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (id TEXT PRIMARY KEY, path TEXT, "
+                         f"document TEXT, metadata TEXT, embedding BLOB NOT NULL, "
+                         f"scale REAL, norm REAL, exact BLOB)")
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")}
+            for column, kind in (("scale", "REAL"), ("norm", "REAL"), ("exact", "BLOB")):
+                if column not in columns:  # tabelas criadas antes dos tipos compactos
+                    conn.execute(f"ALTER TABLE {self.table} ADD COLUMN {column} {kind}")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_path ON {self.table} (path)")
+            if store.fts:
+                conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.fts_table} USING fts5("
+                             f"document, tokenize='unicode61 remove_diacritics 2')")
+            conn.commit()
+
+    # ---------- escrita ----------
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        rows = [(id_val, (meta or {}).get("path", ""), doc, json.dumps(meta or {}, ensure_ascii=False), *vec)
+                for id_val, doc, meta, vec in zip(ids, documents, metadatas,
+                                                  encode_vectors(embeddings, self.store.dtype))]
+        conn = self.store.conn
+        with self.store.lock:
+            # ON CONFLICT mantém o rowid, que também é a chave da tabela FTS
+            conn.executemany(
+                f"INSERT INTO {self.table} (id, path, document, metadata, embedding, scale, norm, exact) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                f"ON CONFLICT(id) DO UPDATE SET path=excluded.path, document=excluded.document, "
+                f"metadata=excluded.metadata, embedding=excluded.embedding, scale=excluded.scale, "
+                f"norm=excluded.norm, exact=excluded.exact", rows)
+            if self.store.fts:
+                for i in range(0, len(ids), READ_BATCH_SIZE):
+                    part = list(ids[i:i+READ_BATCH_SIZE])
+                    placeholders = ",".join("?" * len(part))
+                    conn.execute(f"INSERT OR REPLACE INTO {self.fts_table} (rowid, document) "
+                                 f"SELECT rowid, document FROM {self.table} WHERE id IN ({placeholders})", part)
+            conn.commit()
+            self._dirty = True
+
+    def delete_paths(self, paths):
+        conn = self.store.conn
+        with self.store.lock:
+            for i in range(0, len(paths), READ_BATCH_SIZE):
+                part = list(paths[i:i+READ_BATCH_SIZE])
+                placeholders = ",".join("?" * len(part))
+                if self.store.fts:
+                    conn.execute(f"DELETE FROM {self.fts_table} WHERE rowid IN "
+                                 f"(SELECT rowid FROM {self.table} WHERE path IN ({placeholders}))", part)
+                conn.execute(f"DELETE FROM {self.table} WHERE path IN ({placeholders})", part)
+            conn.commit()
+            self._dirty = True
+
+    # ---------- leitura ----------
+    def get_ids(self) -> set:
+        with self.store.lock:
+            return {row[0] for row in self.store.conn.execute(f"SELECT id FROM {self.table}")}
+
+    def count(self) -> int:
+        with self.store.lock:
+            return self.store.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def get(self, ids=None, limit=None, offset=None, include=("documents", "metadatas")):
+        """Lê entradas pelo id ou em páginas (limit/offset), no formato de resposta do Chroma."""
+        sql = f"SELECT id, document, metadata, embedding, exact FROM {self.table}"
+        params = []
+        if ids is not None:
+            sql += f" WHERE id IN ({','.join('?' * len(ids))})"
+            params += list(ids)
+        sql += " ORDER BY rowid"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else limit, offset or 0]
+        with self.store.lock:
+            rows = self.store.conn.execute(sql, params).fetchall()
+        resposta = {"ids": [r[0] for r in rows]}
+        if "documents" in include:
+            resposta["documents"] = [r[1] for r in rows]
+        if "metadatas" in include:
+            resposta["metadatas"] = [json.loads(r[2]) if r[2] else {} for r in rows]
+        if "embeddings" in include:
+            resposta["embeddings"] = [decode_vector(r[3], self.store.dtype, r[4]) for r in rows]
+        return resposta
+
+    def _load_matrix(self):
+        """
+        (Re)carrega os vetores em uma matriz contígua se a tabela mudou.
+        A contagem e a leitura rodam na mesma transação de leitura (mesmo
+        retrato do WAL), então escritas de outros processos no meio da carga
+        (watch, shards build) não desalinham a matriz.
+        """
+        conn = self.store.conn
+        version = conn.execute("PRAGMA data_version").fetchone()[0]  # muda com escritas de outras conexões
+        if not self._dirty and version == self._version and self._matrix is not None:
+            return
+        dtype = self.store.dtype
+        mem_dtype = np.int8 if dtype == "int8" else np.float32
+        proprio = not conn.in_transaction
+        if proprio:
+            conn.execute("BEGIN")
+        try:
+            n = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            rowids = np.empty(n, dtype=np.int64)
+            scales = np.ones(n, dtype=np.float32)
+            norms = np.empty(n, dtype=np.float32)
+            matrix = None
+            for i, (rowid, blob, scale, norm) in enumerate(
+                    conn.execute(f"SELECT rowid, embedding, scale, norm FROM {self.table} ORDER BY rowid")):
+                vec = np.frombuffer(blob, dtype=dtype)
+                if matrix is None:
+                    matrix = np.empty((n, vec.shape[0]), dtype=mem_dtype)
+                matrix[i] = vec
+                rowids[i] = rowid
+                if dtype == "int8":
+                    scales[i], norms[i] = scale, norm
+        finally:
+            if proprio:
+                conn.execute("COMMIT")
+        self._matrix = matrix if matrix is not None else np.empty((0, 0), dtype=mem_dtype)
+        if dtype != "int8" and n:
+            norms = np.einsum("ij,ij->i", self._matrix, self._matrix)
+        self._scales = scales
+        self._norms = norms
+        self._rowids = rowids
+        self._version = version
+        self._dirty = False
+
+    def _filter_rows(self, where_document):
+        """
+        Índices da matriz cujos documentos contêm as palavras pedidas em
+        sequência (frase no FTS5, ou expressão regular equivalente sem ele).
+        """
+        termo = where_document.get("$contains", "")
+        conn = self.store.conn
+        frase = frase_do_filtro(termo)
+        if not frase:
+            rows = []
+        elif self.store.lexical:
+            rows = conn.execute(f"SELECT v.rowid FROM lex.lex_fts AS f JOIN lex.lex_docs AS d ON d.rowid = f.rowid "
+                                f"JOIN {self.table} AS v ON v.id = d.id WHERE f.lex_fts MATCH ? AND d.kind = ?",
+                                (frase, self.name))
+        elif self.store.fts:
+            rows = conn.execute(f"SELECT rowid FROM {self.fts_table} WHERE {self.fts_table} MATCH ?", (frase,))
+        else:
+            rows = conn.execute(f"SELECT rowid FROM {self.table} WHERE document REGEXP ?", (regex_do_filtro(termo),))
+        matched = np.unique(np.fromiter((r[0] for r in rows), dtype=np.int64))
+        return np.intersect1d(self._rowids, matched, assume_unique=True, return_indices=True)[1]
+
+    def _dots(self, matrix, q):
+        """Produto interno de cada linha com a consulta (int8 convertido para float32 em blocos)."""
+        if matrix.dtype == np.float32:
+            return matrix @ q
+        dots = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SCAN_BLOCK_ROWS):
+            dots[start:start+SCAN_BLOCK_ROWS] = matrix[start:start+SCAN_BLOCK_ROWS].astype(np.float32) @ q
+        return dots
+
+    def _rerank(self, rowids, q):
+        """
+        Distâncias L2² dos candidatos calculadas com os vetores float16 do disco
+        (infinita para linhas apagadas depois da carga da matriz).
+        """
+        exatos = {}
+        conn = self.store.conn
+        for i in range(0, len(rowids), READ_BATCH_SIZE):
+            part = rowids[i:i+READ_BATCH_SIZE]
+            placeholders = ",".join("?" * len(part))
+            for rowid, blob in conn.execute(f"SELECT rowid, exact FROM {self.table} WHERE rowid IN ({placeholders})", part):
+                v = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+                exatos[rowid] = float((v - q) @ (v - q))
+        return np.array([exatos.get(r, np.inf) for r in rowids], dtype=np.float32)
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances"),
+              where_document=None):
+        """
+        Busca top-k por distância L2², no formato de resposta do Chroma.
+        Os documentos só são lidos do banco se pedidos em `include`.
+        """
+        documentos = "documents" in include
+        resposta = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        with self.store.lock:
+            self._load_matrix()
+            candidatos = self._filter_rows(where_document) if where_document else None
+            int8 = self.store.dtype == "int8"
+            for query_emb in query_embeddings:
+                q = np.asarray(query_emb, dtype=np.float32)
+                matrix = self._matrix if candidatos is None else self._matrix[candidatos]
+                norms = self._norms if candidatos is None else self._norms[candidatos]
+                k = min(n_results, len(norms))
+                if k == 0:
+                    for key in resposta:
+                        resposta[key].append([])
+                    continue
+                dots = self._dots(matrix, q)
+                if int8:
+                    dots *= self._scales if candidatos is None else self._scales[candidatos]
+                dist = norms - 2.0 * dots + float(q @ q)
+                kc = min(k * RERANK_FACTOR, len(dist)) if int8 else k
+                top = np.argpartition(dist, kc - 1)[:kc]
+                linhas = top if candidatos is None else candidatos[top]
+                rowids = [int(r) for r in self._rowids[linhas]]
+                distancias = self._rerank(rowids, q) if int8 else dist[top]
+                ordem = np.argsort(distancias)[:k]
+                dados = self._fetch_rows([rowids[i] for i in ordem], documentos)
+                ordem = [i for i in ordem if rowids[i] in dados]  # linhas apagadas depois da carga da matriz
+                rowids = [rowids[i] for i in ordem]
+                resposta["ids"].append([dados[r][0] for r in rowids])
+                resposta["documents"].append([dados[r][1] for r in rowids])
+                resposta["metadatas"].append([dados[r][2] for r in rowids])
+                resposta["distances"].append([max(float(distancias[i]), 0.0) for i in ordem])
+        if not documentos:
+            resposta["documents"] = None  # como no Chroma: campo não pedido
+        return resposta
+
+    def _fetch_rows(self, rowids, documentos=True):
+        """Busca id, documento (se pedido) e metadados das linhas escolhidas."""
+        dados = {}
+        conn = self.store.conn
+        coluna_doc = "document" if documentos else "NULL"
+        for i in range(0, len(rowids), READ_BATCH_SIZE):
+            part = rowids[i:i+READ_BATCH_SIZE]
+            placeholders = ",".join("?" * len(part))
+            for rowid, id_val, doc, meta in conn.execute(
+                    f"SELECT rowid, id, {coluna_doc}, metadata FROM {self.table} WHERE rowid IN ({placeholders})", part):
+                dados[rowid] = (id_val, doc, json.loads(meta) if meta else {})
+        return dados
@@ -0,0 +1,179 @@
+import os
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from config import EMBED_BACKEND, WATCH_DEBOUNCE_S, WATCH_TICK_S, WATCH_POLL_INTERVAL_S, METRICS_PATH, METRICS_FORMAT
+from config import CHROMA_DIR, SHARDS_DIR, SHARDS_PATH, STARTUP_LOG_PATH, SQLITE_DB_PATH, LEXICAL_DB_PATH
+from config import EMBED_CACHE_PATH, OCR_CACHE_PATH
+from metrics import METRICS
+from manifest import FileManifest, list_files
+from index import (DatabaseManager, MANIFEST_DB_PATH, MAX_PROCESS_WORKERS, diff_directory, index_folder,
+                   new_summary, plan_changes, resolve_shard, run_pipeline)
+
+# ---------------- OBSERVADOR DE PASTAS ----------------
+# Mantém o índice atualizado enquanto o processo roda. Os eventos do
+# watchdog só marcam caminhos como pendentes; depois de WATCH_DEBOUNCE_S sem
+# novos eventos, cada caminho vira uma releitura da pasta dele (ou da subárvore,
+# se for uma pasta nova) pelo mesmo pipeline incremental do index_folder.
+# Sem o watchdog instalado, cai para uma varredura incremental periódica.
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# Saídas do próprio indexador que não devem disparar reindexação: os bancos
+# e pastas configurados, que ficam na pasta de trabalho e podem estar dentro
+# da pasta observada. Outros .db do usuário continuam sendo indexados.
+IGNORED_PATHS = (CHROMA_DIR, SQLITE_DB_PATH, LEXICAL_DB_PATH, MANIFEST_DB_PATH, EMBED_CACHE_PATH, OCR_CACHE_PATH,
+                 SHARDS_DIR, SHARDS_PATH, METRICS_PATH, STARTUP_LOG_PATH)
+
+def ignored_prefixes(*extra):
+    """Caminhos absolutos das saídas do indexador (uma pasta vale para tudo dentro dela)."""
+    return tuple(os.path.abspath(p) for p in IGNORED_PATHS + extra if p)
+
+def is_ignored(path, prefixes):
+    """Indica se o evento em `path` vem de uma saída do indexador (incluindo .tmp/-wal ao lado dela)."""
+    path = os.path.abspath(path)
+    return any(path == p or path.startswith((os.path.join(p, ""), p + ".", p + "-")) for p in prefixes)
+
+class PendingPaths:
+    """Caminhos alterados e o horário do último evento de cada um."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.paths = {}
+
+    def add(self, path):
+        with self.lock:
+            self.paths[path] = time.monotonic()
+
+    def pop_quiet(self, debounce):
+        """Retira e retorna os caminhos sem eventos há pelo menos `debounce` segundos."""
+        limit = time.monotonic() - debounce
+        with self.lock:
+            quiet = [p for p, t in self.paths.items() if t <= limit]
+            for p in quiet:
+                del self.paths[p]
+        return quiet
+
+class ChangeHandler(FileSystemEventHandler):
+    """Repassa os eventos do watchdog para a fila de caminhos pendentes."""
+    def __init__(self, pending, ignored=()):
+        super().__init__()
+        self.pending = pending
+        self.ignored = ignored
+
+    def on_any_event(self, event):
+        # "modified" em pasta só indica mudança em um filho, que tem evento próprio
+        if event.is_directory and event.event_type == "modified":
+            return
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            path = os.fsdecode(path) if path else ""
+            if path and not is_ignored(path, self.ignored):
+                self.pending.add(path)
+
+def start_observer(root_folder, pending, ignored=()):
+    """Inicia o watchdog na pasta raiz; retorna None se ele não estiver disponível."""
+    if Observer is None:
+        return None
+    observer = Observer()
+    observer.schedule(ChangeHandler(pending, ignored), root_folder, recursive=True)
+    observer.daemon = True
+    observer.start()
+    return observer
+
+def plan_paths(paths, manifest, summary):
+    """
+    Gera as tarefas do pipeline para os caminhos alterados: pastas existentes
+    são comparadas por inteiro (subárvore), arquivos fazem a pasta deles ser
+    relida sem descer nas subpastas, e pastas que sumiram saem do índice.
+    """
+    trees, flat_dirs, gone_dirs = set(), set(), set()
+    for path in paths:
+        if os.path.isdir(path):
+            trees.add(path)
+        elif not os.path.exists(path) and manifest.known_dirs(path):
+            gone_dirs.add(path)
+        else:
+            flat_dirs.add(os.path.dirname(path))
+
+    def covered(path, roots):
+        return any(path == r or path.startswith(os.path.join(r, "")) for r in roots)
+
+    trees = {t for t in trees if not covered(os.path.dirname(t), trees)}
+    gone_dirs = {g for g in gone_dirs if not covered(os.path.dirname(g), gone_dirs)}
+    for tree in sorted(trees):
+        yield from plan_changes(tree, manifest, True, summary)
+
+    for dir_path in sorted(d for d in flat_dirs if not covered(d, trees) and not covered(d, gone_dirs)):
+        entries = list_files(dir_path) if os.path.isdir(dir_path) else []
+        if entries is None:
+            continue
+        known = manifest.has_dir(dir_path)
+        yield from diff_directory(dir_path, entries, manifest, known, True, summary)
+        if known and not entries:
+            yield "remover_pastas", [dir_path]
+
+    for gone in sorted(gone_dirs):
+        dirs = manifest.known_dirs(gone)
+        for dir_path in dirs:
+            removed = list(manifest.dir_entries(dir_path))
+            summary["removidos"] += len(removed)
+            yield "remover", removed
+        yield "remover_pastas", sorted(dirs)
+
+def watch_folder(root_folder, batch_size=32, use_hash=False, embed_backend=EMBED_BACKEND,
+                 debounce=WATCH_DEBOUNCE_S, poll_interval=WATCH_POLL_INTERVAL_S, shard=None):
+    """
+    Faz uma indexação incremental inicial e depois observa a pasta,
+    reindexando só os caminhos alterados até o processo ser interrompido (Ctrl+C).
+    As alterações vão para o shard da pasta (o informado ou o que já a contém).
+    """
+    root_folder = os.path.abspath(root_folder)
+    shard = resolve_shard(root_folder, shard)
+    db_manager = DatabaseManager(use_chroma=True, shard=shard)
+    index_folder(root_folder, batch_size=batch_size, use_hash=use_hash, embed_backend=embed_backend,
+                 db_manager=db_manager, shard=shard)
+
+    pending = PendingPaths()
+    ignored = ignored_prefixes(db_manager.chroma_dir, db_manager.sqlite_path, db_manager.lexical_path)
+    observer = start_observer(root_folder, pending, ignored)
+    if observer:
+        print(f"Observando '{root_folder}' (Ctrl+C para sair)...")
+    else:
+        print(f"watchdog não instalado: verificando '{root_folder}' a cada {poll_interval}s (Ctrl+C para sair)...")
+
+    manifest = FileManifest(MANIFEST_DB_PATH)
+    executor = ProcessPoolExecutor(max_workers=MAX_PROCESS_WORKERS)
+    try:
+        while True:
+            if observer:
+                time.sleep(WATCH_TICK_S)
+                paths = pending.pop_quiet(debounce)
+                if not paths:
+                    continue
+                tasks = lambda summary: plan_paths(paths, manifest, summary)
+            else:
+                time.sleep(poll_interval)
+                tasks = lambda summary: plan_changes(root_folder, manifest, True, summary)
+
+            summary = new_summary()
+            METRICS.reset()  # cada lote exporta só as próprias métricas e falhas
+            run_pipeline(tasks(summary), db_manager, summary, batch_size=batch_size, use_hash=use_hash,
+                         executor=executor, progress_bar=False)
+            if summary["alterados"] or summary["removidos"]:
+                print(f"[{time.strftime('%H:%M:%S')}] {summary['alterados']} arquivos novos/alterados, "
+                      f"{summary['removidos']} removidos.")
+                if METRICS_PATH:
+                    METRICS.write(METRICS_PATH, METRICS_FORMAT, run="watch", root=root_folder, summary=summary)
+    except KeyboardInterrupt:
+        print("\nObservador encerrado.")
+    finally:
+        if observer:
+            observer.stop()
+            observer.join()
+        executor.shutdown()
+        manifest.close()